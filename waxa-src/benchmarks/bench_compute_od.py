@@ -0,0 +1,87 @@
+"""Micro-benchmark for waxa.image_processing.compute_OD.
+
+Compares the fused, blocked OD kernel (float64 and float32 output) against the
+previous one-shot implementation on a synthetic stack of absorption images,
+reporting wall time and peak traced memory.
+
+Usage:
+    python benchmarks/bench_compute_od.py [--shots 1000] [--px 256] [--repeat 3]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from waxa.image_processing.compute_ODs import compute_OD
+from waxa.config.img_types import img_types as img
+
+
+def compute_OD_legacy(atoms, light, dark, imaging_type=img.ABSORPTION):
+    # The compute_OD implementation before the blocked kernel, for reference.
+    new_dtype = np.int16 if atoms.dtype == np.dtype('uint8') else np.int32
+    atoms_only = atoms.astype(new_dtype) - dark.astype(new_dtype)
+    light_only = light.astype(new_dtype) - dark.astype(new_dtype)
+    atoms_only[atoms_only < 0] = 0
+    light_only[light_only < 0] = 0
+    It_over_I0 = np.divide(atoms_only, light_only,
+                           out=np.zeros(atoms_only.shape, dtype=float),
+                           where=light_only != 0)
+    if imaging_type == img.ABSORPTION:
+        OD = -np.log(It_over_I0,
+                     out=np.zeros(atoms_only.shape, dtype=float),
+                     where=It_over_I0 != 0)
+        OD[OD < 0] = 0
+    else:
+        OD = It_over_I0
+    return OD
+
+
+def make_stack(n_shots, px, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:px, 0:px]
+    cloud = np.exp(-((xx - px / 2) ** 2 + (yy - px / 2) ** 2) / (2 * (px / 8) ** 2))
+    dark = rng.poisson(100, (n_shots, px, px)).astype(np.uint16)
+    light = (dark + rng.poisson(2000, (n_shots, px, px))).astype(np.uint16)
+    atoms = (dark + (light - dark) * np.exp(-cloud)).astype(np.uint16)
+    return atoms, light, dark
+
+
+def bench(label, func, repeat):
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        out = func()
+        times.append(time.perf_counter() - t0)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del out
+    print(f"{label:<28s} best {min(times)*1e3:9.1f} ms | peak {peak/2**20:9.1f} MiB")
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shots', type=int, default=1000)
+    parser.add_argument('--px', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    atoms, light, dark = make_stack(args.shots, args.px)
+    print(f"{args.shots} shots of {args.px}x{args.px} uint16 "
+          f"({atoms.nbytes/2**20:.1f} MiB per stack)")
+
+    t_legacy = bench("legacy (float64)", lambda: compute_OD_legacy(atoms, light, dark), args.repeat)
+    t_64 = bench("blocked (float64)", lambda: compute_OD(atoms, light, dark), args.repeat)
+    t_32 = bench("blocked (float32)", lambda: compute_OD(atoms, light, dark, dtype=np.float32), args.repeat)
+
+    od_legacy = compute_OD_legacy(atoms, light, dark)
+    assert np.array_equal(od_legacy, compute_OD(atoms, light, dark))
+    assert np.allclose(od_legacy, compute_OD(atoms, light, dark, dtype=np.float32), atol=1e-5)
+    print(f"speedup: float64 x{t_legacy/t_64:.2f}, float32 x{t_legacy/t_32:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark of the HDF5 storage layouts for the images dataset of run files.
+
+Writes a synthetic run of absorption images (atoms, light and dark frames per
+shot, written one frame at a time as the camera delivers them) with each layout
+of waxa.data.image_layout and reports write throughput, file size, the time to
+read every image back (atomdata._load_data) and the time to read an ROI window
+of every image (LazyImages.read, the lite-copy builders).
+
+Usage:
+    python benchmarks/bench_hdf5_layout.py [--shots 200] [--px 512] [--roi 64] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from waxa.data.image_layout import create_image_dataset
+
+LAYOUTS = (
+    ('contiguous', None, None),
+    ('frame', 'frame', None),
+    ('shot', 'shot', None),
+    ('frame + gzip', 'frame', 'gzip'),
+    ('frame + lzf', 'frame', 'lzf'),
+    ('frame + shuffle_gzip', 'frame', 'shuffle_gzip'),
+)
+
+
+def make_frames(n_shots, px, frames_per_shot, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:px, 0:px]
+    cloud = np.exp(-((xx - px / 2) ** 2 + (yy - px / 2) ** 2) / (2 * (px / 8) ** 2))
+    beam = 2000 * np.exp(-((xx - px / 2) ** 2 + (yy - px / 2) ** 2) / (2 * (px / 2) ** 2))
+    frames = np.empty((n_shots * frames_per_shot, px, px), dtype=np.uint16)
+    for shot in range(n_shots):
+        dark = rng.poisson(100, (px, px))
+        light = dark + rng.poisson(beam)
+        atoms = dark + rng.poisson(beam * np.exp(-cloud))
+        i = shot * frames_per_shot
+        frames[i:i + frames_per_shot - 2] = atoms
+        frames[i + frames_per_shot - 2] = light
+        frames[i + frames_per_shot - 1] = dark
+    return frames
+
+
+def write_run(path, frames, chunking, compression, frames_per_shot):
+    with h5py.File(path, 'w') as f:
+        dset = create_image_dataset(f.create_group('data'), 'images',
+                                    shape=frames.shape, dtype=frames.dtype,
+                                    chunking=chunking, compression=compression,
+                                    frames_per_shot=frames_per_shot)
+        for i in range(len(frames)):
+            dset[i] = frames[i]
+
+
+def read_all(path):
+    with h5py.File(path, 'r') as f:
+        return f['data']['images'][()]
+
+
+def read_roi(path, r0, r1, c0, c1):
+    with h5py.File(path, 'r') as f:
+        return f['data']['images'][:, r0:r1, c0:c1]
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shots', type=int, default=200)
+    parser.add_argument('--px', type=int, default=512)
+    parser.add_argument('--nps', type=int, default=1, help='atoms images per shot')
+    parser.add_argument('--roi', type=int, default=64, help='side of the square ROI window')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dir', default=None, help='directory for the test files')
+    args = parser.parse_args()
+
+    frames_per_shot = args.nps + 2
+    frames = make_frames(args.shots, args.px, frames_per_shot)
+    raw_mib = frames.nbytes / 2**20
+    r0 = c0 = (args.px - args.roi) // 2
+    r1 = c1 = r0 + args.roi
+    print(f"{len(frames)} frames of {args.px}x{args.px} uint16 ({raw_mib:.1f} MiB), "
+          f"ROI {args.roi}x{args.roi}")
+    print(f"{'layout':<22s} {'write MiB/s':>11s} {'size MiB':>9s} {'ratio':>6s} "
+          f"{'read all ms':>11s} {'read ROI ms':>11s}")
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for label, chunking, compression in LAYOUTS:
+            path = os.path.join(tmp, 'run.hdf5')
+            t_write = best_time(lambda: write_run(path, frames, chunking, compression,
+                                                  frames_per_shot), args.repeat)
+            size_mib = os.path.getsize(path) / 2**20
+            t_all = best_time(lambda: read_all(path), args.repeat)
+            t_roi = best_time(lambda: read_roi(path, r0, r1, c0, c1), args.repeat)
+            assert np.array_equal(read_all(path), frames)
+            print(f"{label:<22s} {raw_mib/t_write:11.1f} {size_mib:9.1f} "
+                  f"{raw_mib/size_mib:6.2f} {t_all*1e3:11.1f} {t_roi*1e3:11.1f}")
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Micro-benchmark for waxa.base.Dealer.stack_linear_data_ndarray.
+
+Compares the vectorized implementation against the previous loop over shots
+for shot-linear scalar data (e.g. image timestamps) and small images, on 1D
+and 2D scans of 10^4 - 10^5 shots.
+
+Usage:
+    python benchmarks/bench_stack_linear.py [--shots 10000 100000] [--px 8] [--nps 1] [--repeat 3]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from waxa.base.dealer import Dealer
+
+
+def stack_linear_legacy(dealer, pwa, pwoa, dark):
+    # The stack_linear_data_ndarray implementation before vectorization.
+    Ns = dealer.params.N_shots_with_repeats
+    Nps = dealer.params.N_pwa_per_shot
+    N_img = Ns*(Nps+2)
+    ndarray = np.empty((Ns,Nps+2)+pwa.shape[(dealer.N_xvars+1):], dtype=pwa.dtype)
+    sh = pwa.shape
+    pwa = pwa.reshape((Ns,Nps)+pwa.shape[(dealer.N_xvars+1):])
+    pwoa = pwoa.reshape((Ns,Nps)+pwoa.shape[(dealer.N_xvars+1):])
+    dark = dark.reshape((Ns,Nps)+dark.shape[(dealer.N_xvars+1):])
+    for shot_idx in range(Ns):
+        ndarray[shot_idx][:Nps] = pwa[shot_idx]
+        ndarray[shot_idx][Nps] = pwoa[shot_idx][0]
+        ndarray[shot_idx][Nps+1] = dark[shot_idx][0]
+    return ndarray.reshape((N_img,)+sh[(dealer.N_xvars+1):])
+
+
+def make_dealer(xvardims, nps):
+    dealer = Dealer()
+    dealer.params.N_shots_with_repeats = int(np.prod(xvardims))
+    dealer.params.N_pwa_per_shot = nps
+    dealer.xvardims = list(xvardims)
+    dealer.N_xvars = len(xvardims)
+    return dealer
+
+
+def bench(label, func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    print(f"  {label:<12s} best {min(times)*1e3:9.2f} ms")
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shots', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--px', type=int, default=8)
+    parser.add_argument('--nps', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_shots in args.shots:
+        n2 = int(np.sqrt(n_shots))
+        for xvardims in [(n_shots,), (n_shots // n2, n2)]:
+            dealer = make_dealer(xvardims, args.nps)
+            n_img = dealer.params.N_shots_with_repeats * (args.nps + 2)
+            for name, tail in [("scalars", ()), (f"{args.px}x{args.px} images", (args.px, args.px))]:
+                linear = rng.random((n_img,) + tail)
+                pwa, pwoa, dark = dealer.deal_data_ndarray(linear)
+                print(f"{dealer.params.N_shots_with_repeats} shots, xvardims={xvardims}, {name}")
+                t_legacy = bench("legacy", lambda: stack_linear_legacy(dealer, pwa, pwoa, dark), args.repeat)
+                t_new = bench("vectorized", lambda: dealer.stack_linear_data_ndarray(pwa, pwoa, dark), args.repeat)
+                out = dealer.stack_linear_data_ndarray(pwa, pwoa, dark)
+                assert np.array_equal(out, linear)
+                assert np.array_equal(out, stack_linear_legacy(dealer, pwa, pwoa, dark))
+                print(f"  speedup x{t_legacy/t_new:.1f}")
+
+
+if __name__ == '__main__':
+    main()
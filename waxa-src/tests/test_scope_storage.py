@@ -0,0 +1,95 @@
+import h5py
+import numpy as np
+import pytest
+
+from waxa.data.scope_storage import (encode_trace, read_scope_data,
+                                     write_scope_data, write_scope_shot)
+
+BITS = (8, 12, 16)
+DTYPES = (np.float32, np.float64)
+
+
+def make_trace(bits, dtype, n_pts=200_000, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, 2**bits, n_pts)
+    gain = 2 / 2**bits * 1.0003
+    return codes, gain, (codes * gain - 1).astype(dtype)
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+@pytest.mark.parametrize('bits', BITS)
+def test_encode_trace_recovers_codes(bits, dtype):
+    codes, gain, v = make_trace(bits, dtype)
+    enc = encode_trace(v)
+    assert enc is not None
+    enc_codes, enc_gain, enc_offset = enc
+    np.testing.assert_array_equal(enc_codes, codes - codes.min())
+    tol = max(0.01 * gain, 4 * np.finfo(dtype).eps)
+    assert np.abs(enc_codes * enc_gain + enc_offset - v).max() <= tol
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+@pytest.mark.parametrize('bits', BITS)
+def test_encode_trace_sparse_levels(bits, dtype):
+    # few samples of a fine grid: either the codes are recovered or the trace
+    # is left to the float layout, never an error
+    for seed in range(50):
+        codes, gain, v = make_trace(bits, dtype, n_pts=1000, seed=seed)
+        enc = encode_trace(v)
+        if enc is not None:
+            np.testing.assert_array_equal(enc[0], codes - codes.min())
+
+
+def test_encode_trace_rejects_continuous():
+    v = np.random.default_rng(0).normal(size=1000)
+    assert encode_trace(v) is None
+    assert encode_trace(v.astype(np.float32)) is None
+
+
+def make_scope_data(bits, dtype, xvardims=(3, 2), n_ch=2, n_pts=5000):
+    rng = np.random.default_rng(1)
+    codes = rng.integers(0, 2**bits, xvardims + (n_ch, n_pts))
+    data = np.empty(xvardims + (n_ch, 2, n_pts), dtype=dtype)
+    data[..., 0, :] = 1e-3 + 1e-7 * np.arange(n_pts)
+    data[..., 1, :] = codes * (2 / 2**bits) - 1
+    return data
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+@pytest.mark.parametrize('bits', BITS)
+def test_write_scope_data_roundtrip(tmp_path, bits, dtype):
+    data = make_scope_data(bits, dtype)
+    with h5py.File(tmp_path / 'run.hdf5', 'w') as f:
+        write_scope_data(f.create_group('scope_data'), 's', data)
+        grp = f['scope_data']['s']
+        assert 'codes' in grp
+        t, v = read_scope_data(grp)
+    np.testing.assert_allclose(t, data[..., 0, 0, :], rtol=1e-6)
+    np.testing.assert_allclose(v, data[..., 1, :], atol=1e-6)
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+def test_write_scope_shot_matches_run(tmp_path, dtype):
+    data = make_scope_data(12, dtype)
+    xvardims = data.shape[:-3]
+    with h5py.File(tmp_path / 'run.hdf5', 'w') as f:
+        whole = f.create_group('whole')
+        streamed = f.create_group('streamed')
+        write_scope_data(whole, 's', data)
+        for idx in np.ndindex(xvardims):
+            write_scope_shot(streamed, 's', xvardims, idx, data[idx])
+        for key in whole['s']:
+            np.testing.assert_array_equal(whole['s'][key][()], streamed['s'][key][()])
+
+
+def test_write_scope_shot_falls_back_to_float(tmp_path):
+    data = make_scope_data(8, np.float32)
+    xvardims = data.shape[:-3]
+    data[-1, -1, :, 1] = np.random.default_rng(2).normal(size=data.shape[-1])
+    with h5py.File(tmp_path / 'run.hdf5', 'w') as f:
+        grp = f.create_group('scope_data')
+        for idx in np.ndindex(xvardims):
+            write_scope_shot(grp, 's', xvardims, idx, data[idx])
+        assert 'codes' not in grp['s']
+        t, v = read_scope_data(grp['s'])
+    np.testing.assert_allclose(v, data[..., 1, :], atol=1e-6)
@@ -1,8 +1,6 @@
 import numpy as np
 
 from waxa.image_processing.compute_ODs import compute_OD
-from waxa.image_processing.compute_gaussian_cloud_params import fit_gaussian_sum_dist
-from waxa.config.img_types import img_types as img
 
 from waxa.data.server_talk import server_talk as st
 from waxa.atomdata_base import atomdata_base, atom_number_apd, unpack_group
@@ -41,6 +39,11 @@ class atomdata(atomdata_base):
         avg_repeats=False,
         ignore_images=False,
         server_talk=st(),
+        lazy_images=False,
+        roi_first=False,
+        roi_margin_px=0,
+        analysis_cache=False,
+        analysis_mode='fit',
     ):
         super().__init__(
             idx=idx,
@@ -52,6 +55,11 @@ class atomdata(atomdata_base):
             avg_repeats=avg_repeats,
             ignore_images=ignore_images,
             server_talk=server_talk,
+            lazy_images=lazy_images,
+            roi_first=roi_first,
+            roi_margin_px=roi_margin_px,
+            analysis_cache=analysis_cache,
+            analysis_mode=analysis_mode,
         )
 
     # User-facing operations: thin wrappers over parent implementations.
@@ -111,69 +119,6 @@ class atomdata(atomdata_base):
 
     ### Analysis methods
 
-    def _initial_analysis(self, transpose_idx, avg_repeats):
-        if not getattr(self, '_has_images', True):
-            # No camera images were captured for this run; skip all
-            # image-based analysis and set image-derived attrs to None.
-            self._clear_image_analysis_attrs()
-            self._refresh_repeat_statistics()
-            return
-        import time as _time
-        t0 = _time.perf_counter()
-
-        t_stage = _time.perf_counter()
-        self._sort_images()
-        self._timing['initial_analysis_sort_images_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        if transpose_idx:
-            self._analysis_tags.transposed = True
-            self.transpose_data(transpose_idx=False, reanalyze=False)
-        self._timing['initial_analysis_transpose_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        self.compute_raw_ods()
-        self._timing['initial_analysis_compute_raw_ods_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        if avg_repeats:
-            self.avg_repeats(reanalyze=False)
-        self._timing['initial_analysis_avg_repeats_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        self.analyze_ods()
-        self._timing['initial_analysis_analyze_ods_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        self._refresh_repeat_statistics()
-        self._timing['initial_analysis_refresh_repeat_stats_s'] = _time.perf_counter() - t_stage
-
-        self._timing['initial_analysis_total_s'] = _time.perf_counter() - t0
-
-        if self._timing_enabled:
-            print(
-                "[atomdata timing] initial_analysis total={:.3f}s | sort_images={:.3f}s | "
-                "transpose={:.3f}s | compute_raw_ods={:.3f}s | avg_repeats={:.3f}s | "
-                "analyze_ods={:.3f}s | refresh_repeat_stats={:.3f}s".format(
-                    self._timing['initial_analysis_total_s'],
-                    self._timing['initial_analysis_sort_images_s'],
-                    self._timing['initial_analysis_transpose_s'],
-                    self._timing['initial_analysis_compute_raw_ods_s'],
-                    self._timing['initial_analysis_avg_repeats_s'],
-                    self._timing['initial_analysis_analyze_ods_s'],
-                    self._timing['initial_analysis_refresh_repeat_stats_s'],
-                )
-            )
-
-    def analyze(self):
-        if not getattr(self, '_has_images', True):
-            self._clear_image_analysis_attrs()
-            self._refresh_repeat_statistics()
-            return
-        self.compute_raw_ods()
-        self.analyze_ods()
-        self._refresh_repeat_statistics()
-
     def compute_raw_ods(self):
         """Computes OD (or normalized transmission for non-absorption imaging)."""
         self.od_raw = compute_OD(
@@ -183,58 +128,6 @@ class atomdata(atomdata_base):
             imaging_type=self._analysis_tags.imaging_type,
         )
 
-    def analyze_ods(self):
-        """Crop ODs, build projections, fit Gaussians, and map fit results."""
-        import time as _time
-        t0 = _time.perf_counter()
-
-        t_stage = _time.perf_counter()
-        self.od = self.roi.crop(self.od_raw)
-        self._timing['analyze_ods_roi_crop_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        self.sum_od_x = np.sum(self.od, self.od.ndim - 2)
-        self.sum_od_y = np.sum(self.od, self.od.ndim - 1)
-        self._timing['analyze_ods_sum_projections_s'] = _time.perf_counter() - t_stage
-
-        self.axis_camera_px_x = np.arange(self.sum_od_x.shape[-1])
-        self.axis_camera_px_y = np.arange(self.sum_od_y.shape[-1])
-        self.axis_camera_x = self.camera_params.pixel_size_m * self.axis_camera_px_x
-        self.axis_camera_y = self.camera_params.pixel_size_m * self.axis_camera_px_y
-        self.axis_x = self.axis_camera_x / self.camera_params.magnification
-        self.axis_y = self.axis_camera_y / self.camera_params.magnification
-
-        t_stage = _time.perf_counter()
-        self.cloudfit_x = fit_gaussian_sum_dist(self.sum_od_x, self.camera_params)
-        self._timing['analyze_ods_fit_x_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        self.cloudfit_y = fit_gaussian_sum_dist(self.sum_od_y, self.camera_params)
-        self._timing['analyze_ods_fit_y_s'] = _time.perf_counter() - t_stage
-
-        t_stage = _time.perf_counter()
-        self._remap_fit_results()
-        self.compute_apd_atom_number()
-        if self._analysis_tags.imaging_type == img.ABSORPTION:
-            self.compute_atom_number()
-        self.integrated_od = np.sum(np.sum(self.od, -2), -1)
-        self._timing['analyze_ods_postfit_s'] = _time.perf_counter() - t_stage
-
-        self._timing['analyze_ods_total_s'] = _time.perf_counter() - t0
-
-        if self._timing_enabled:
-            print(
-                "[atomdata timing] analyze_ods total={:.3f}s | roi_crop={:.3f}s | "
-                "sum_projections={:.3f}s | fit_x={:.3f}s | fit_y={:.3f}s | postfit={:.3f}s".format(
-                    self._timing['analyze_ods_total_s'],
-                    self._timing['analyze_ods_roi_crop_s'],
-                    self._timing['analyze_ods_sum_projections_s'],
-                    self._timing['analyze_ods_fit_x_s'],
-                    self._timing['analyze_ods_fit_y_s'],
-                    self._timing['analyze_ods_postfit_s'],
-                )
-            )
-
     def compute_apd_atom_number(self):
         if 'post_shot_absorption' in self.data.keys:
             v = self.data.post_shot_absorption
@@ -271,61 +164,3 @@ class atomdata(atomdata_base):
         v_apd_all_up = v_apd_all_up if v_apd_all_up is not None else self.p.v_apd_all_up
         v_apd_all_down = v_apd_all_down if v_apd_all_down is not None else self.p.v_apd_all_down
         return 2 * v_apd_std / ( v_apd_all_up - v_apd_all_down )
-
-    def _sort_images(self):
-        imgs_tuple = self._dealer.deal_data_ndarray(self.images)
-        self.img_atoms = imgs_tuple[0]
-        self.img_light = imgs_tuple[1]
-        self.img_dark = imgs_tuple[2]
-
-        img_timestamp_tuple = self._dealer.deal_data_ndarray(self.image_timestamps)
-        self.img_timestamp_atoms = img_timestamp_tuple[0]
-        self.img_timestamp_light = img_timestamp_tuple[1]
-        self.img_timestamp_dark = img_timestamp_tuple[2]
-
-        if self.params.N_pwa_per_shot > 1:
-            self.xvarnames = np.append(self.xvarnames, 'idx_pwa')
-            self.xvars.append(np.arange(self.params.N_pwa_per_shot))
-            self.xvardims = np.append(self.xvardims, self.params.N_pwa_per_shot)
-            self.Nvars += 1
-            np.append(self.sort_idx, np.arange(self.params.N_pwa_per_shot))
-            if not self.params.N_pwa_per_shot in self.sort_N:
-                np.append(self.sort_N, self.params.N_pwa_per_shot)
-        else:
-            self.img_atoms = self._dealer.strip_shot_idx_axis(self.img_atoms)[0]
-            self.img_light = self._dealer.strip_shot_idx_axis(self.img_light)[0]
-            self.img_dark = self._dealer.strip_shot_idx_axis(self.img_dark)[0]
-
-            self.img_timestamp_atoms = self._dealer.strip_shot_idx_axis(self.img_timestamp_atoms)[0]
-            self.img_timestamp_light = self._dealer.strip_shot_idx_axis(self.img_timestamp_light)[0]
-            self.img_timestamp_dark = self._dealer.strip_shot_idx_axis(self.img_timestamp_dark)[0]
-
-    def compute_atom_number(self):
-        self.atom_cross_section = 5.878324268151581e-13
-        dx_pixel = self.camera_params.pixel_size_m / self.camera_params.magnification
-
-        self.atom_number_fit_area_x = self.fit_area_x * dx_pixel / self.atom_cross_section
-        self.atom_number_fit_area_y = self.fit_area_y * dx_pixel / self.atom_cross_section
-
-        self.atom_number_density = self.od * dx_pixel**2 / self.atom_cross_section
-        self.atom_number = np.sum(np.sum(self.atom_number_density, -2), -1)
-
-    def _remap_fit_results(self):
-        try:
-            fits_x = self.cloudfit_x
-            self.fit_sd_x = self._extract_attr(fits_x, 'sigma')
-            self.fit_center_x = self._extract_attr(fits_x, 'x_center')
-            self.fit_amp_x = self._extract_attr(fits_x, 'amplitude')
-            self.fit_offset_x = self._extract_attr(fits_x, 'y_offset')
-            self.fit_area_x = self._extract_attr(fits_x, 'area')
-
-            fits_y = self.cloudfit_y
-            self.fit_sd_y = self._extract_attr(fits_y, 'sigma')
-            self.fit_center_y = self._extract_attr(fits_y, 'x_center')
-            self.fit_amp_y = self._extract_attr(fits_y, 'amplitude')
-            self.fit_offset_y = self._extract_attr(fits_y, 'y_offset')
-            self.fit_area_y = self._extract_attr(fits_y, 'area')
-
-        except Exception as e:
-            print(e)
-            print("Unable to extract fit parameters. The gaussian fit must have failed")
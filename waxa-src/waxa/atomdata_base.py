@@ -2,14 +2,19 @@ import numpy as np
 import datetime
 import h5py
 import os
-import time
 
 from waxa.image_processing.compute_ODs import compute_OD
-from waxa.image_processing.compute_gaussian_cloud_params import fit_gaussian_sum_dist
+from waxa.image_processing.compute_gaussian_cloud_params import fit_gaussian_sum_dist, moments_gaussian_sum_dist
+from waxa.fitting.fit_results import GaussianFitResults
 from waxa.roi import ROI
 from waxa.data.data_saver import DataSaver
-from waxa.base import Dealer, xvar
+from waxa.base import Dealer, xvar, AnalysisStages
 from waxa.data.server_talk import server_talk as st
+from waxa.data.lazy_images import LazyImages
+from waxa.data.source_store import embed_source_texts, read_source_texts
+from waxa.data.scope_storage import read_scope_data, copy_scope_group
+from waxa.data.analysis_cache import AnalysisCache, analysis_cache_key
+from waxa.profiling import profiler
 from waxa.helper.datasmith import *
 from waxa.data.run_info import RunInfo
 from waxa.config.expt_params import ExptParams
@@ -260,10 +265,10 @@ def format_scope_data(dataset, old_method=False):
                 this_scope_data[ch] = ScopeTraceArray(scope_key, ch, t, v)
             scope_dict[scope_key] = this_scope_data
         if not old_method:
-            # New format: separate 't' and 'v' datasets
-            t = dataset[scope_key]['t'][()]  # Materialize now
+            # New format: separate 't' and 'v' datasets, or ADC codes with
+            # gain/offset and an implicit time axis (see waxa.data.scope_storage)
             # Materialize once while the HDF5 file is open; channel axis is -2.
-            v_data = dataset[scope_key]['v'][()]
+            t, v_data = read_scope_data(dataset[scope_key])
             n_channels = v_data.shape[-2]
 
             for ch in range(n_channels):
@@ -290,6 +295,20 @@ def unpack_group(file,group_key,obj):
     for k in keys:
         vars(obj)[k] = g[k][()]
 
+ANALYSIS_MODES = ('fit', 'moments')
+
+# Attributes dealt from the images, which are only computed on first access
+# when the analysis is restored from the analysis cache.
+_DEFERRED_IMAGE_ATTRS = ('img_atoms', 'img_light', 'img_dark',
+                         'img_timestamp_atoms', 'img_timestamp_light',
+                         'img_timestamp_dark')
+
+def _check_analysis_mode(analysis_mode):
+    if analysis_mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis_mode '{analysis_mode}'. "
+                         f"Use one of {ANALYSIS_MODES}.")
+    return analysis_mode
+
 class analysis_tags():
     """A simple container to hold analysis tags for analysis logic.
     """    
@@ -335,6 +354,11 @@ class atomdata_base():
     Use to store and do basic analysis on data for every experiment.
     '''
 
+    # Absorption cross section used for the atom number, from
+    # kamo.Potassium39.get_cross_section. Set on an instance to recalibrate;
+    # the next analyze_ods only redoes the atom number.
+    atom_cross_section = 5.878324268151581e-13
+
     # Class-level annotation purely for IDE autocompletion. Resolves to
     # kexp.config.data_vault.DataVault when kexp is installed, otherwise the
     # name remains unresolved (no runtime effect — see TYPE_CHECKING block).
@@ -350,7 +374,12 @@ class atomdata_base():
                 transpose_idx = [],
                 avg_repeats = False,
                 ignore_images = False,
-                server_talk = st()):
+                server_talk = st(),
+                lazy_images = False,
+                roi_first = False,
+                roi_margin_px = 0,
+                analysis_cache = False,
+                analysis_mode = 'fit'):
         '''
         Returns the atomdata stored in the `idx`th newest file at `path`.
 
@@ -372,6 +401,31 @@ class atomdata_base():
             as dictated by `idx`.
         skip_saved_roi: bool
             If true, ignore saved ROI in the data file.
+        lazy_images: bool
+            If true, camera images are not read when the file is loaded.
+            Instead, only the rows and columns spanned by the ROI are read
+            from disk when the ODs are first computed.
+        roi_first: bool
+            If true, the atoms/light/dark images are cropped to the ROI before
+            the ODs are computed, so od_raw only covers the ROI window. Use
+            compute_full_frame_od to get the full-frame OD.
+        roi_margin_px: int
+            Number of pixels around the ROI to keep in od_raw when lazy_images
+            or roi_first is set. A margin lets small recrops reuse od_raw.
+        analysis_cache: bool or str
+            If true, od, sum_od_x/y and the Gaussian fits are stored in an
+            analysis cache file next to the data file after they are computed,
+            and read back instead of recomputed when the run is loaded again
+            with the same ROI, lite flag and analysis code. If a str, the
+            cache file is kept in that directory instead. On a cache hit,
+            od_raw is only computed when it is first accessed. Not used with
+            transpose_idx or avg_repeats.
+        analysis_mode: str
+            'fit' (default) fits a Gaussian to each sum_od_x/y. 'moments'
+            instead estimates the fit_* attributes from the moments of the
+            sum_ods (see moments_gaussian_sum_dist), which is much faster but
+            approximate; the results are marked with cloudfit_x.estimate.
+            The analysis cache is only used in 'fit' mode.
 
         Returns
         -------
@@ -380,15 +434,16 @@ class atomdata_base():
 
         self._lite = lite
         self._ignore_images = ignore_images
+        self._lazy_images = lazy_images
+        self._roi_first = roi_first
+        self._roi_margin_px = roi_margin_px
+        self._analysis_cache = analysis_cache
+        self._analysis_mode = _check_analysis_mode(analysis_mode)
         # When loading lite data, ignore any passed roi_id since lite files
         # are already pre-cropped to a specific ROI at creation time.
         if lite:
             roi_id = None
 
-        # Lightweight profiling aid for load/analysis latency investigations.
-        self._timing_enabled = True
-        self._timing = {}
-
         # for syntax highlighting, overloaded later. The type annotations
         # below let IDEs surface kexp's ExptParams / DataVault attributes
         # when kexp is installed (see TYPE_CHECKING block at top of file);
@@ -410,58 +465,36 @@ class atomdata_base():
 
         self.server_talk = server_talk
 
-        t_init = time.perf_counter()
-        t_stage = time.perf_counter()
-        self._load_data(idx, path, lite=lite, roi_id=roi_id, ignore_images=ignore_images)
-        self._timing['init_load_data_s'] = time.perf_counter() - t_stage
+        with profiler.span('atomdata'):
+            with profiler.span('load_data'):
+                self._load_data(idx, path, lite=lite, roi_id=roi_id, ignore_images=ignore_images)
+
+            ### Helper objects
+            with profiler.span('setup_helpers_roi'):
+                self._ds = DataSaver(data_dir=self._regular_data_dir(), server_talk=self.server_talk)
+                self._dealer = self._init_dealer()
+                self._analysis_tags = analysis_tags(roi_id,self.run_info.imaging_type)
+                if self._has_images:
+                    self.roi = ROI(run_id = self.run_info.run_id,
+                                   roi_id = roi_id,
+                                   use_saved_roi = not skip_saved_roi,
+                                   lite = self._lite,
+                                   server_talk=self.server_talk,
+                                   current_file_path=self._data_file_path,
+                                   current_saved_roi=self._saved_roi_from_file,
+                                   images=self.images,
+                                   imaging_type=self.run_info.imaging_type)
+                else:
+                    self.roi = None
+
+            with profiler.span('unshuffle_old_data'):
+                self._unshuffle_old_data()
 
-        ### Helper objects
-        t_stage = time.perf_counter()
-        self._ds = DataSaver(data_dir=self._regular_data_dir(), server_talk=self.server_talk)
-        self._dealer = self._init_dealer()
-        self._analysis_tags = analysis_tags(roi_id,self.run_info.imaging_type)
-        if self._has_images:
-            self.roi = ROI(run_id = self.run_info.run_id,
-                           roi_id = roi_id,
-                           use_saved_roi = not skip_saved_roi,
-                           lite = self._lite,
-                           server_talk=self.server_talk,
-                           current_file_path=self._data_file_path,
-                           current_saved_roi=self._saved_roi_from_file,
-                           images=self.images,
-                           imaging_type=self.run_info.imaging_type)
-        else:
-            self.roi = None
-        self._timing['init_setup_helpers_roi_s'] = time.perf_counter() - t_stage
-
-        t_stage = time.perf_counter()
-        self._unshuffle_old_data()
-        self._timing['init_unshuffle_old_data_s'] = time.perf_counter() - t_stage
-
-        t_stage = time.perf_counter()
-        self._initial_analysis(transpose_idx,avg_repeats)
-        self._timing['init_initial_analysis_s'] = time.perf_counter() - t_stage
-        self._timing['init_total_s'] = time.perf_counter() - t_init
-
-        if self._timing_enabled:
-            print(
-                (
-                    "[atomdata timing] init total={:.3f}s | load_data={:.3f}s | "
-                    "setup+roi={:.3f}s | unshuffle_old={:.3f}s | initial_analysis={:.3f}s"
-                ).format(
-                    self._timing['init_total_s'],
-                    self._timing['init_load_data_s'],
-                    self._timing['init_setup_helpers_roi_s'],
-                    self._timing['init_unshuffle_old_data_s'],
-                    self._timing['init_initial_analysis_s'],
-                )
-            )
+            with profiler.span('initial_analysis'):
+                self._initial_analysis(transpose_idx,avg_repeats)
 
     ###
     def recrop(self,roi_id=None,use_saved=False):
-        if not getattr(self, '_has_images', True):
-            print("no images in dataset, no roi to crop")
-            return
         """Selects a new ROI and re-runs the analysis. Uses the same logic as
         kexp.ROI.load_roi.
 
@@ -479,6 +512,11 @@ class atomdata_base():
             use_saved (bool): If False, ignores saved ROI and forces creation of
             a new one. Default is False.
         """
+        if not getattr(self, '_has_images', True):
+            print("no images in dataset, no roi to crop")
+            return
+        # the recrop paths depend on the window the ODs were computed in
+        self._undefer_images()
         if self._lite:
             # Get new ROI (prompts GUI if roi_id is None and no saved ROI).
             self.roi.load_roi(roi_id, use_saved)
@@ -498,7 +536,24 @@ class atomdata_base():
             self.compute_raw_ods()
             self.analyze_ods()
             self._refresh_repeat_statistics()
+        elif self._od_window is not None:
+            # od_raw only covers the old ROI window. The ROI creator draws
+            # from the full images, and the ODs are recomputed only if the
+            # new ROI does not fit in the current window.
+            self.roi.load_roi(roi_id, use_saved)
+            if not self._roi_in_window(self._od_window):
+                if self._image_window is not None:
+                    self._reload_image_window()
+                else:
+                    self._check_untransformed("The new ROI extends past od_raw")
+                # the xvars (including idx_pwa) are already set up
+                self._deal_images()
+                self.compute_raw_ods()
+            self.analyze_ods()
+            self._refresh_repeat_statistics()
         else:
+            # od_raw is the full frame, so only the crop and later stages are
+            # redone. The crop is a view into od_raw, so no pixels are copied.
             od_flat = self.od_raw.reshape(-1, *self.od_raw.shape[-2:])
             self.roi.load_roi(roi_id, use_saved, display_ods=od_flat)
             self.analyze_ods()
@@ -623,7 +678,12 @@ class atomdata_base():
                     images=self.images,
                     imaging_type=self.run_info.imaging_type,
                 )
-            cropped_images = crop_roi.crop(images_ush)
+            if self._image_window is not None and not self._roi_in_image_window(crop_roi):
+                raise ValueError(
+                    "save_lite_copy: the requested ROI extends past the image "
+                    "window read by lazy loading. Pass force_reread=True."
+                )
+            cropped_images = crop_roi.crop(images_ush, origin=self._image_origin())
             px = int(np.diff(crop_roi.roix)[0])
             py = int(np.diff(crop_roi.roiy)[0])
 
@@ -634,7 +694,10 @@ class atomdata_base():
             # data group
             data_grp = f_lite.create_group('data')
             if has_images:
-                data_grp.create_dataset('images', data=cropped_images)
+                self._ds.create_images_dataset(
+                    data_grp, data=cropped_images,
+                    frames_per_shot=int(getattr(self.params, 'N_pwa_per_shot', 1)) + 2,
+                )
                 data_grp.create_dataset('image_timestamps', data=ts_ush)
 
             # DataVault keys — already in memory, unshuffle on the fly.
@@ -665,14 +728,7 @@ class atomdata_base():
             if 'data' in f_src and 'scope_data' in f_src['data']:
                 scope_grp = data_grp.create_group('scope_data')
                 for scope_label, scope_item in f_src['data']['scope_data'].items():
-                    this_scope = scope_grp.create_group(scope_label)
-                    for ch_key in scope_item.keys():
-                        arr = scope_item[ch_key][()]
-                        if arr.dtype == np.float64:
-                            arr = arr.astype(np.float32)
-                        this_scope.create_dataset(
-                            ch_key, data=arr, compression='gzip', compression_opts=4
-                        )
+                    copy_scope_group(scope_item, scope_grp, scope_label)
 
             # params / camera_params / run_info groups — rebuild from in-memory
             # objects via the existing DataSaver helper.
@@ -703,6 +759,10 @@ class atomdata_base():
             f_lite.attrs['has_images'] = has_images
             f_lite.attrs['run_complete'] = True
 
+            # source texts, resolved from the data root's source store, as
+            # file attrs so that the lite copy is self-contained
+            embed_source_texts(f_src, f_lite, self._data_file_path)
+
         print(f'Lite version of run {self.run_info.run_id} saved at {lite_path}.')
 
     # Alias: create_lite_copy and save_lite_copy do the same thing.
@@ -715,6 +775,102 @@ class atomdata_base():
             ignore_images=ignore_images,
         )
 
+    ### Analysis cache
+
+    def _analysis_cache_store(self):
+        setting = getattr(self, '_analysis_cache', False)
+        if (not setting or self._data_file_path is None
+                or getattr(self, '_analysis_mode', 'fit') != 'fit'):
+            return None
+        cache_root = setting if isinstance(setting, str) else None
+        return AnalysisCache(self._data_file_path, cache_root=cache_root)
+
+    def _analysis_cache_key(self):
+        source = getattr(self, '_image_source', None)
+        image_shape = source.shape if source is not None else np.shape(self.images)
+        return analysis_cache_key(
+            run_id=int(self.run_info.run_id),
+            run_datetime=self.run_info.run_datetime,
+            lite=bool(self._lite),
+            roix=[int(v) for v in self.roi.roix],
+            roiy=[int(v) for v in self.roi.roiy],
+            image_shape=image_shape,
+            xvardims=self.xvardims,
+            imaging_type=self._analysis_tags.imaging_type,
+            xvars_shuffled=bool(self._analysis_tags.xvars_shuffled),
+            # the fits are in meters
+            calibration=self._calibration_key(),
+        )
+
+    def _load_cached_analysis(self):
+        """Restores od, sum_od_x/y and the Gaussian fits from the analysis
+        cache, then derives the remaining analysis attributes from them.
+        Returns False on a cache miss."""
+        cache = self._analysis_cache_store()
+        if cache is None:
+            return False
+        entry = cache.load(self._analysis_cache_key())
+        if entry is None:
+            return False
+
+        self.od = entry['od']
+        self.sum_od_x = entry['sum_od_x']
+        self.sum_od_y = entry['sum_od_y']
+        # od_raw is recomputed from the sorted images on first access.
+        self.__dict__.pop('od_raw', None)
+        self._od_raw_deferred = True
+
+        self.axis_camera_px_x = np.arange(self.sum_od_x.shape[-1])
+        self.axis_camera_px_y = np.arange(self.sum_od_y.shape[-1])
+        self.axis_camera_x = self.camera_params.pixel_size_m * self.axis_camera_px_x
+        self.axis_camera_y = self.camera_params.pixel_size_m * self.axis_camera_px_y
+        self.axis_x = self.axis_camera_x / self.camera_params.magnification
+        self.axis_y = self.axis_camera_y / self.camera_params.magnification
+
+        self.cloudfit_x = GaussianFitResults(self.axis_x, self.sum_od_x,
+                                             entry['fit_x_popt'],
+                                             entry['fit_x_pcov'],
+                                             entry['fit_x_success'])
+        self.cloudfit_y = GaussianFitResults(self.axis_y, self.sum_od_y,
+                                             entry['fit_y_popt'],
+                                             entry['fit_y_pcov'],
+                                             entry['fit_y_success'])
+        self._remap_fit_results()
+        self.compute_apd_atom_number()
+        if self._analysis_tags.imaging_type == img.ABSORPTION:
+            self.compute_atom_number()
+        self.integrated_od = np.sum(np.sum(self.od,-2),-1)
+        return True
+
+    def _save_cached_analysis(self):
+        cache = self._analysis_cache_store()
+        if cache is None or not isinstance(getattr(self, 'cloudfit_x', None), GaussianFitResults):
+            return
+        cache.save(self._analysis_cache_key(), {
+            'od': self.od,
+            'sum_od_x': self.sum_od_x,
+            'sum_od_y': self.sum_od_y,
+            'fit_x_popt': self.cloudfit_x.popt,
+            'fit_x_pcov': self.cloudfit_x.pcov,
+            'fit_x_success': self.cloudfit_x.success,
+            'fit_y_popt': self.cloudfit_y.popt,
+            'fit_y_pcov': self.cloudfit_y.pcov,
+            'fit_y_success': self.cloudfit_y.success,
+        })
+
+    def __getattr__(self, name):
+        # Only reached when normal lookup fails: computes the od_raw and the
+        # img_* attributes that were skipped because the analysis was restored
+        # from the analysis cache.
+        if name == 'od_raw' and self.__dict__.get('_od_raw_deferred', False):
+            self._od_raw_deferred = False
+            self.compute_raw_ods()
+            return self.__dict__['od_raw']
+        if name in _DEFERRED_IMAGE_ATTRS and self.__dict__.get('_images_deferred', False):
+            self._deal_images()
+            return self.__dict__[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
     ### Analysis
 
     def _clear_image_analysis_attrs(self):
@@ -739,64 +895,46 @@ class atomdata_base():
             self._refresh_repeat_statistics()
             return
 
-        t0 = time.perf_counter()
-
-        t_stage = time.perf_counter()
-        self._sort_images()
-        t_sort = time.perf_counter() - t_stage
-
-        if transpose_idx:
-            self._analysis_tags.transposed = True
-            t_stage = time.perf_counter()
-            self.transpose_data(transpose_idx=False,reanalyze=False)
-            t_transpose = time.perf_counter() - t_stage
+        # The analysis cache only holds untransformed analyses. It is checked
+        # before the images are read and dealt, so that a cache hit does not
+        # touch the pixels: img_* and od_raw are computed on first access.
+        use_cache = (not transpose_idx and not avg_repeats
+                     and bool(getattr(self, '_analysis_cache', False)))
+        cached = False
+        if use_cache:
+            self._add_pwa_xvar()
+            with profiler.span('load_cached_analysis'):
+                cached = self._load_cached_analysis()
+            if cached:
+                self._images_deferred = True
+            else:
+                with profiler.span('sort_images'):
+                    self._deal_images()
         else:
-            t_transpose = 0.0
+            with profiler.span('sort_images'):
+                self._sort_images()
 
-        t_stage = time.perf_counter()
-        self.compute_raw_ods()
-        t_compute_raw = time.perf_counter() - t_stage
+            if transpose_idx:
+                self._analysis_tags.transposed = True
+                with profiler.span('transpose'):
+                    self.transpose_data(transpose_idx=False,reanalyze=False)
 
-        if avg_repeats:
-            t_stage = time.perf_counter()
-            self.avg_repeats(reanalyze=False)
-            t_avg_repeats = time.perf_counter() - t_stage
-        else:
-            t_avg_repeats = 0.0
+        if not cached:
+            with profiler.span('compute_raw_ods'):
+                self.compute_raw_ods()
 
-        t_stage = time.perf_counter()
-        self.analyze_ods()
-        t_analyze_ods = time.perf_counter() - t_stage
+            if avg_repeats:
+                with profiler.span('avg_repeats'):
+                    self.avg_repeats(reanalyze=False)
 
-        t_stage = time.perf_counter()
-        self._refresh_repeat_statistics()
-        t_repeat_stats = time.perf_counter() - t_stage
-        t_total = time.perf_counter() - t0
-
-        self._timing['initial_analysis_sort_images_s'] = t_sort
-        self._timing['initial_analysis_transpose_s'] = t_transpose
-        self._timing['initial_analysis_compute_raw_ods_s'] = t_compute_raw
-        self._timing['initial_analysis_avg_repeats_s'] = t_avg_repeats
-        self._timing['initial_analysis_analyze_ods_s'] = t_analyze_ods
-        self._timing['initial_analysis_refresh_repeat_stats_s'] = t_repeat_stats
-        self._timing['initial_analysis_total_s'] = t_total
-
-        if self._timing_enabled:
-            print(
-                (
-                    "[atomdata timing] initial_analysis total={:.3f}s | sort_images={:.3f}s | "
-                    "transpose={:.3f}s | compute_raw_ods={:.3f}s | avg_repeats={:.3f}s | "
-                    "analyze_ods={:.3f}s | refresh_repeat_stats={:.3f}s"
-                ).format(
-                    t_total,
-                    t_sort,
-                    t_transpose,
-                    t_compute_raw,
-                    t_avg_repeats,
-                    t_analyze_ods,
-                    t_repeat_stats,
-                )
-            )
+            with profiler.span('analyze_ods'):
+                self.analyze_ods()
+            if use_cache:
+                with profiler.span('save_cached_analysis'):
+                    self._save_cached_analysis()
+
+        with profiler.span('refresh_repeat_stats'):
+            self._refresh_repeat_statistics()
 
     def analyze(self):
         if not getattr(self, '_has_images', True):
@@ -804,38 +942,15 @@ class atomdata_base():
             self._refresh_repeat_statistics()
             return
 
-        t0 = time.perf_counter()
-
-        t_stage = time.perf_counter()
-        self.compute_raw_ods()
-        t_compute_raw = time.perf_counter() - t_stage
+        with profiler.span('analyze'):
+            with profiler.span('compute_raw_ods'):
+                self.compute_raw_ods()
 
-        t_stage = time.perf_counter()
-        self.analyze_ods()
-        t_analyze_ods = time.perf_counter() - t_stage
+            with profiler.span('analyze_ods'):
+                self.analyze_ods()
 
-        t_stage = time.perf_counter()
-        self._refresh_repeat_statistics()
-        t_repeat_stats = time.perf_counter() - t_stage
-        t_total = time.perf_counter() - t0
-
-        self._timing['analyze_compute_raw_ods_s'] = t_compute_raw
-        self._timing['analyze_analyze_ods_s'] = t_analyze_ods
-        self._timing['analyze_refresh_repeat_stats_s'] = t_repeat_stats
-        self._timing['analyze_total_s'] = t_total
-
-        if self._timing_enabled:
-            print(
-                (
-                    "[atomdata timing] analyze total={:.3f}s | compute_raw_ods={:.3f}s | "
-                    "analyze_ods={:.3f}s | refresh_repeat_stats={:.3f}s"
-                ).format(
-                    t_total,
-                    t_compute_raw,
-                    t_analyze_ods,
-                    t_repeat_stats,
-                )
-            )
+            with profiler.span('refresh_repeat_stats'):
+                self._refresh_repeat_statistics()
 
     def compute_raw_ods(self):
         """Computes the ODs. If not absorption analysis, OD = (pwa - dark)/(pwoa - dark).
@@ -846,16 +961,83 @@ class atomdata_base():
     def analyze_ods(self):
         """Crops ODs, computes sum_ods, gaussian fits to sum_ods, and populates
         fit results.
+
+        The stages are memoized (see waxa.base.AnalysisStages): a stage is
+        only recomputed if its inputs changed since it last ran. A new ROI
+        redoes the crop and everything after it, while a new
+        atom_cross_section or imaging_type only redoes the atom number.
+        Stages compare their input arrays by identity, so after editing od_raw
+        or od in place, call invalidate_analysis first.
         """
+        stages = self._analysis_stages()
+        with profiler.span('roi_crop'):
+            self._crop_stage(stages)
+        with profiler.span('sum_projections'):
+            self._sums_stage(stages)
+
+        self._compute_axes()
+
+        self._fits_stage(stages)
+
+        with profiler.span('postfit'):
+            self.compute_apd_atom_number()
+            self._atom_number_stage(stages)
+
+    def invalidate_analysis(self, stage=None):
+        """Marks analysis stages as stale, so that the next analyze_ods
+        recomputes them. Needed after editing an array in place, e.g.
+        ``ad.od[0] = 0``, which the stages do not notice by themselves.
+
+        Args:
+            stage (str or None): the first stale stage, one of 'crop' (od_raw
+                edited), 'sums' (od edited), 'fits' (sum_ods edited) or
+                'atom_number'. Later stages are invalidated too. If None,
+                every stage is.
+        """
+        self._analysis_stages().invalidate(stage)
+
+    ### Analysis stages
+    def _analysis_stages(self):
+        stages = self.__dict__.get('_stages')
+        if stages is None:
+            stages = self._stages = AnalysisStages()
+        return stages
+
+    def _calibration_key(self):
+        return (float(self.camera_params.pixel_size_m),
+                float(self.camera_params.magnification))
+
+    def _crop_stage(self, stages):
         # Lite files store images already cropped to an ROI during creation.
         # Avoid applying ROI cropping a second time on load.
+        od_raw = self.od_raw
+        origin = self._window_origin(getattr(self, '_od_window', None))
+        inputs = (bool(self._lite),
+                  tuple(int(v) for v in self.roi.roix),
+                  tuple(int(v) for v in self.roi.roiy),
+                  tuple(int(v) for v in origin),
+                  od_raw)
+        if stages.fresh('crop', inputs + (self.__dict__.get('od'),)):
+            profiler.count('reused')
+            return
         if self._lite:
-            self.od = self.od_raw
+            self.od = od_raw
         else:
-            self.od = self.roi.crop(self.od_raw)
+            self.od = self._crop_od(od_raw)
+        stages.store('crop', inputs + (self.od,))
+
+    def _sums_stage(self, stages):
+        inputs = (self.od,)
+        outputs = ('sum_od_x', 'sum_od_y', 'integrated_od')
+        if stages.fresh('sums', inputs + tuple(self.__dict__.get(k) for k in outputs)):
+            profiler.count('reused')
+            return
         self.sum_od_x = np.sum(self.od,self.od.ndim-2)
         self.sum_od_y = np.sum(self.od,self.od.ndim-1)
+        self.integrated_od = np.sum(self.sum_od_x,-1)
+        stages.store('sums', inputs + tuple(getattr(self, k) for k in outputs))
 
+    def _compute_axes(self):
         self.axis_camera_px_x = np.arange(self.sum_od_x.shape[-1])
         self.axis_camera_px_y = np.arange(self.sum_od_y.shape[-1])
 
@@ -865,17 +1047,72 @@ class atomdata_base():
         self.axis_x = self.axis_camera_x / self.camera_params.magnification
         self.axis_y = self.axis_camera_y / self.camera_params.magnification
 
-        self.cloudfit_x = fit_gaussian_sum_dist(self.sum_od_x,self.camera_params)
-        self.cloudfit_y = fit_gaussian_sum_dist(self.sum_od_y,self.camera_params)
-
+    def _fits_stage(self, stages):
+        # The fits are in meters, so they depend on the camera calibration.
+        mode = getattr(self, '_analysis_mode', 'fit')
+        inputs = (mode,) + self._calibration_key() + (self.sum_od_x, self.sum_od_y)
+        outputs = ('cloudfit_x', 'cloudfit_y')
+        if stages.fresh('fits', inputs + tuple(self.__dict__.get(k) for k in outputs)):
+            profiler.count('reused')
+            return
+        if mode == 'moments':
+            with profiler.span('moments'):
+                self.cloudfit_x = moments_gaussian_sum_dist(self.sum_od_x,self.camera_params)
+                self.cloudfit_y = moments_gaussian_sum_dist(self.sum_od_y,self.camera_params)
+        else:
+            with profiler.span('fit_x'):
+                self.cloudfit_x = fit_gaussian_sum_dist(self.sum_od_x,self.camera_params)
+            with profiler.span('fit_y'):
+                self.cloudfit_y = fit_gaussian_sum_dist(self.sum_od_y,self.camera_params)
         self._remap_fit_results()
-
-        self.compute_apd_atom_number()
-
+        stages.store('fits', inputs + tuple(getattr(self, k) for k in outputs))
+
+    def _atom_number_stage(self, stages):
+        inputs = ((self._analysis_tags.imaging_type,
+                   float(self.atom_cross_section)) + self._calibration_key()
+                  + (self.od, self.cloudfit_x, self.cloudfit_y))
+        output = self.__dict__.get('atom_number')
+        if stages.fresh('atom_number', inputs + (output,)):
+            profiler.count('reused')
+            return
         if self._analysis_tags.imaging_type == img.ABSORPTION:
             self.compute_atom_number()
+        stages.store('atom_number', inputs + (self.__dict__.get('atom_number'),))
 
-        self.integrated_od = np.sum(np.sum(self.od,-2),-1)
+    def set_analysis_mode(self, analysis_mode):
+        """Switches between Gaussian fits ('fit') and moment estimates
+        ('moments') of the sum_ods, and redoes the fits and atom number.
+
+        Args:
+            analysis_mode (str): 'fit' or 'moments'.
+        """
+        self._analysis_mode = _check_analysis_mode(analysis_mode)
+        if getattr(self, '_has_images', True):
+            self.analyze_ods()
+            self._refresh_repeat_statistics()
+
+    def set_imaging_type(self, imaging_type):
+        """Changes the imaging type used by the analysis and reanalyzes.
+
+        The OD is only recomputed if the new imaging type changes how it is
+        computed from the images (absorption ODs are -log of the transmission).
+        Otherwise only the atom number is redone.
+
+        Args:
+            imaging_type (int): One of waxa.config.img_types.
+        """
+        old_type = self._analysis_tags.imaging_type
+        self._analysis_tags.imaging_type = imaging_type
+        if not getattr(self, '_has_images', True):
+            return
+        if (old_type == img.ABSORPTION) != (imaging_type == img.ABSORPTION):
+            self._check_untransformed("Changing the OD formula")
+            if getattr(self, 'img_atoms', None) is None:
+                raise ValueError("Changing the OD formula requires the images, "
+                                 "which are not available. Reload the run.")
+            self.compute_raw_ods()
+        self.analyze_ods()
+        self._refresh_repeat_statistics()
 
     def compute_apd_atom_number(self):
         if 'post_shot_absorption' in self.data.keys:
@@ -904,7 +1141,14 @@ class atomdata_base():
             self.atom_number_apd = atom_number_apd(number_up, number_down)
 
     def _sort_images(self):
-        print(self.images.shape)
+        self._deal_images()
+        self._add_pwa_xvar()
+
+    def _deal_images(self):
+        """Splits the images (and their timestamps) into img_atoms, img_light
+        and img_dark, reading them from disk first if they are lazy."""
+        self._images_deferred = False
+        self._materialize_images()
         imgs_tuple = self._dealer.deal_data_ndarray(self.images)
         self.img_atoms = imgs_tuple[0]
         self.img_light = imgs_tuple[1]
@@ -914,7 +1158,21 @@ class atomdata_base():
         self.img_timestamp_atoms = img_timestamp_tuple[0]
         self.img_timestamp_light = img_timestamp_tuple[1]
         self.img_timestamp_dark = img_timestamp_tuple[2]
-        
+
+        if self.params.N_pwa_per_shot == 1:
+            self.img_atoms = self._dealer.strip_shot_idx_axis(self.img_atoms)[0]
+            self.img_light = self._dealer.strip_shot_idx_axis(self.img_light)[0]
+            self.img_dark = self._dealer.strip_shot_idx_axis(self.img_dark)[0]
+
+            self.img_timestamp_atoms = self._dealer.strip_shot_idx_axis(self.img_timestamp_atoms)[0]
+            self.img_timestamp_light = self._dealer.strip_shot_idx_axis(self.img_timestamp_light)[0]
+            self.img_timestamp_dark = self._dealer.strip_shot_idx_axis(self.img_timestamp_dark)[0]
+
+        self._window_sorted_images()
+
+    def _add_pwa_xvar(self):
+        """With several atoms images per shot, adds their index as the last
+        xvar ('idx_pwa')."""
         if self.params.N_pwa_per_shot > 1:
             self.xvarnames = np.append(self.xvarnames,'idx_pwa')
             self.xvars.append(np.arange(self.params.N_pwa_per_shot))
@@ -923,18 +1181,15 @@ class atomdata_base():
             np.append(self.sort_idx,np.arange(self.params.N_pwa_per_shot))
             if not self.params.N_pwa_per_shot in self.sort_N:
                 np.append(self.sort_N,self.params.N_pwa_per_shot)
-        else:
-            self.img_atoms = self._dealer.strip_shot_idx_axis(self.img_atoms)[0]
-            self.img_light = self._dealer.strip_shot_idx_axis(self.img_light)[0]
-            self.img_dark = self._dealer.strip_shot_idx_axis(self.img_dark)[0]
 
-            self.img_timestamp_atoms = self._dealer.strip_shot_idx_axis(self.img_timestamp_atoms)[0]
-            self.img_timestamp_light = self._dealer.strip_shot_idx_axis(self.img_timestamp_light)[0]
-            self.img_timestamp_dark = self._dealer.strip_shot_idx_axis(self.img_timestamp_dark)[0]
+    def _undefer_images(self):
+        """Deals the images if that was skipped because the analysis was
+        restored from the analysis cache."""
+        if self.__dict__.get('_images_deferred', False):
+            self._deal_images()
 
     ### Physics
     def compute_atom_number(self):
-        self.atom_cross_section = 5.878324268151581e-13 # from kamo.Potassium39.get_cross_section
         dx_pixel = self.camera_params.pixel_size_m / self.camera_params.magnification
         
         self.atom_number_fit_area_x = self.fit_area_x * dx_pixel / self.atom_cross_section
@@ -1268,6 +1523,7 @@ class atomdata_base():
         """
         from copy import deepcopy
 
+        self._undefer_images()
         ad = object.__new__(self.__class__)
 
         # Metadata — deep-copied so mutations in the slice are independent.
@@ -1305,8 +1561,6 @@ class atomdata_base():
         ad._ds = self._ds
         ad.server_talk = self.server_talk
         ad._dealer = self._dealer
-        ad._timing_enabled = False
-        ad._timing = {}
         ad.avg = None
         ad.std = None
         ad.sem = None
@@ -1317,6 +1571,13 @@ class atomdata_base():
         ad._data_file_path = self._data_file_path
         ad._saved_roi_from_file = self._saved_roi_from_file
         ad._has_images = getattr(self, '_has_images', True)
+        ad._lazy_images = getattr(self, '_lazy_images', False)
+        ad._image_source = getattr(self, '_image_source', None)
+        ad._image_window = getattr(self, '_image_window', None)
+        ad._od_window = getattr(self, '_od_window', None)
+        ad._roi_first = getattr(self, '_roi_first', False)
+        ad._roi_margin_px = getattr(self, '_roi_margin_px', 0)
+        ad._analysis_mode = getattr(self, '_analysis_mode', 'fit')
 
         for attr in (
             'experiment_code', 'atom_cross_section',
@@ -1403,6 +1664,10 @@ class atomdata_base():
         ad_out._dealer = None
         ad_out.images = self.images
         ad_out.image_timestamps = self.image_timestamps
+        ad_out._lazy_images = getattr(self, '_lazy_images', False)
+        ad_out._image_source = getattr(self, '_image_source', None)
+        ad_out._image_window = getattr(self, '_image_window', None)
+        ad_out._od_window = getattr(self, '_od_window', None)
         ad_out.experiment_code = self.experiment_code
 
         ad_out.params = deepcopy(self.params)
@@ -1432,6 +1697,12 @@ class atomdata_base():
         ad_out._repeat_sem_source = None
         ad_out._repeat_sem_divisor = None
 
+        # Repeat statistics of a deferred od_raw (or deferred images) are not
+        # available: computing it from the averaged images would not give the
+        # averaged od_raw.
+        ad_out._od_raw_deferred = False
+        ad_out._images_deferred = False
+
         ad_out._analysis_tags = analysis_tags(self._analysis_tags.roi_id, self._analysis_tags.imaging_type)
         ad_out._analysis_tags.xvars_shuffled = False
         ad_out._analysis_tags.transposed = self._analysis_tags.transposed
@@ -1693,6 +1964,7 @@ class atomdata_base():
 
         old_xvardims = np.array(self.xvardims, dtype=int)
         if getattr(self, '_has_images', True):
+            self._undefer_images()
             keys = [
                 'img_atoms', 'img_light', 'img_dark',
                 'img_timestamp_atoms', 'img_timestamp_light', 'img_timestamp_dark'
@@ -1950,6 +2222,7 @@ class atomdata_base():
                         reorder_ndarraylike(self.scope_data[k][ch],['t','v'])
 
         if getattr(self, '_has_images', True):
+            self._undefer_images()
             ndarraylike_keys = ['img_atoms','img_light','img_dark']
             reorder_ndarraylike(self,ndarraylike_keys)
         reorder_ndarraylike(self.data,self.data.keys)
@@ -1988,6 +2261,8 @@ class atomdata_base():
             print("Unable to extract fit parameters. The gaussian fit must have failed")
 
     def _extract_attr(self,ndarray,attr):
+        if isinstance(ndarray, GaussianFitResults):
+            return ndarray.get(attr)
         linarray = np.reshape(ndarray,np.size(ndarray))
         vals = [vars(y)[attr] for y in linarray]
         out = np.reshape(vals,ndarray.shape+(-1,))
@@ -2025,7 +2300,8 @@ class atomdata_base():
     ## Unshuffling
 
     def _shuff(self, reshuffle_bool):
-        if getattr(self, 'images', None) is not None and np.asarray(self.images).size > 0:
+        if getattr(self, 'images', None) is not None and np.size(self.images) > 0:
+            self._materialize_images()
             self.images = self._dealer.unscramble_images(reshuffle=reshuffle_bool)
         self._dealer._unshuffle_struct(self, reshuffle=reshuffle_bool)
         self._dealer._unshuffle_struct(self.params, reshuffle=reshuffle_bool)
@@ -2041,7 +2317,7 @@ class atomdata_base():
             raise ValueError("Cannot reshuffle after repeats have been reassigned.")
         if self._analysis_tags.xvars_shuffled == False:
             self._shuff(reshuffle_bool=True)
-            _has_images = getattr(self, 'images', None) is not None and np.asarray(self.images).size > 0
+            _has_images = getattr(self, 'images', None) is not None and np.size(self.images) > 0
             if _has_images:
                 self._sort_images()
             self.analyze()
@@ -2053,7 +2329,7 @@ class atomdata_base():
         if self._analysis_tags.xvars_shuffled == True:
             self._shuff(reshuffle_bool=False)
             if reanalyze:
-                _has_images = getattr(self, 'images', None) is not None and np.asarray(self.images).size > 0
+                _has_images = getattr(self, 'images', None) is not None and np.size(self.images) > 0
                 if _has_images:
                     self._sort_images()
                 self.analyze()
@@ -2107,67 +2383,200 @@ class atomdata_base():
         dealer.N_xvars = len(self.xvardims)
         return dealer
 
-    def _load_data(self, idx=0, path = "", lite=False, roi_id=None, _allow_lite_autocreate=True, ignore_images=False):
-        t_load_total = time.perf_counter()
-        timing = {}
+    ### ROI windows (lazy images / ROI-first ODs)
 
-        def _regenerate_lite_from_regular():
-            t_stage = time.perf_counter()
-            self._load_data(
-                idx,
-                path,
-                lite=False,
-                roi_id=roi_id,
-                _allow_lite_autocreate=False,
-                ignore_images=ignore_images,
+    def _image_window_for_roi(self, roi=None, margin=0):
+        '''
+        Returns the (row_start, row_stop, col_start, col_stop) camera pixel
+        window covering the ROI grown by `margin` pixels on each side (clipped
+        to the sensor), or None if the ROI is not set.
+        '''
+        roi = self.roi if roi is None else roi
+        if roi is None:
+            return None
+        y0, y1 = (int(v) for v in roi.roiy)
+        x0, x1 = (int(v) for v in roi.roix)
+        if min(y0, x0) < 0 or y1 <= y0 or x1 <= x0:
+            return None
+        source = getattr(self, '_image_source', None)
+        ny, nx = source.shape[-2:] if source is not None else np.shape(self.images)[-2:]
+        margin = int(margin)
+        return (max(y0 - margin, 0), min(y1 + margin, ny),
+                max(x0 - margin, 0), min(x1 + margin, nx))
+
+    @staticmethod
+    def _window_origin(window):
+        if window is None:
+            return (0, 0)
+        return (window[0], window[2])
+
+    def _image_origin(self):
+        return self._window_origin(getattr(self, '_image_window', None))
+
+    def _roi_in_window(self, window, roi=None):
+        if window is None:
+            return True
+        needed = self._image_window_for_roi(roi)
+        if needed is None:
+            return False
+        return (needed[0] >= window[0] and needed[1] <= window[1]
+                and needed[2] >= window[2] and needed[3] <= window[3])
+
+    def _roi_in_image_window(self, roi=None):
+        return self._roi_in_window(getattr(self, '_image_window', None), roi)
+
+    def _crop_od(self, od):
+        """Crops an OD array (full frame or ROI window) to the ROI. Returns a
+        view into od (see ROI.crop)."""
+        return self.roi.crop(od, origin=self._window_origin(getattr(self, '_od_window', None)))
+
+    def _materialize_images(self):
+        """Replaces a lazy image source with the images read from disk: only
+        the pixels inside the ROI window with lazy_images, the full frames
+        otherwise (the source is lazy because of the analysis cache). Does
+        nothing if the images are already in memory.
+        """
+        if not isinstance(self.images, LazyImages):
+            return
+        window = None
+        if getattr(self, '_lazy_images', False):
+            window = self._image_window_for_roi(margin=getattr(self, '_roi_margin_px', 0))
+        if window is None:
+            self.images = self.images.read()
+        else:
+            self.images = self.images.read(rows=window[:2], cols=window[2:])
+        self._image_window = window
+        if getattr(self, '_dealer', None) is not None:
+            self._dealer.images = self.images
+
+    def _window_sorted_images(self):
+        """Crops the sorted images to the ROI window before the ODs are
+        computed (ROI-first mode), so that only the analyzed pixels enter
+        compute_OD. Slicing keeps these as views of self.images.
+        """
+        self._od_window = getattr(self, '_image_window', None)
+        if not getattr(self, '_roi_first', False) or self._od_window is not None:
+            return
+        window = self._image_window_for_roi(margin=getattr(self, '_roi_margin_px', 0))
+        if window is None:
+            return
+        y0, y1, x0, x1 = window
+        self.img_atoms = self.img_atoms[..., y0:y1, x0:x1]
+        self.img_light = self.img_light[..., y0:y1, x0:x1]
+        self.img_dark = self.img_dark[..., y0:y1, x0:x1]
+        self._od_window = window
+
+    def _check_untransformed(self, msg):
+        tags = self._analysis_tags
+        if tags.averaged or tags.transposed or tags.repeats_reassigned:
+            raise ValueError(
+                f"{msg}, and the data has been averaged / transposed / had "
+                "repeats reassigned. Reload the run to do this."
             )
-            timing['fallback_full_load_s'] = time.perf_counter() - t_stage
 
-            t_stage = time.perf_counter()
-            # Build the minimal helper state save_lite_copy() needs.
-            # __init__ will re-create these after _load_data returns;
-            # that's fine — they're cheap.
-            self._ds = DataSaver(data_dir=self._regular_data_dir(), server_talk=self.server_talk)
-            self._dealer = self._init_dealer()
-            self._analysis_tags = analysis_tags(roi_id, self.run_info.imaging_type)
-            if getattr(self, '_has_images', True):
-                self.roi = ROI(
-                    run_id=self.run_info.run_id,
-                    roi_id=roi_id,
-                    use_saved_roi=True,
-                    lite=False,
-                    printouts=False,
-                    server_talk=self.server_talk,
-                    current_file_path=self._data_file_path,
-                    current_saved_roi=self._saved_roi_from_file,
-                    images=self.images,
-                    imaging_type=self.run_info.imaging_type,
-                )
-            # self._lite is still True from __init__ (the user asked for
-            # lite); flip it temporarily so save_lite_copy() sees the full
-            # uncropped data we just loaded. If ignore_images=True,
-            # save_lite_copy writes only non-image datasets and skips ROI.
-            _saved_lite_flag = self._lite
-            self._lite = False
+    def _read_source_images(self, window=None):
+        """Reads images from the lazy image source in the in-memory shot
+        order (data taken before 2024/10/02 is stored shuffled on disk)."""
+        if window is None:
+            images = self._image_source.read()
+        else:
+            images = self._image_source.read(rows=window[:2], cols=window[2:])
+        shuffled_on_disk = datetime.datetime(*self.run_info.run_datetime[:3]) < datetime.datetime(2024,10,2)
+        if shuffled_on_disk != self._analysis_tags.xvars_shuffled:
+            _saved_imgs = self._dealer.images
             try:
-                self.save_lite_copy(ignore_images=ignore_images)
+                self._dealer.images = images
+                images = self._dealer.unscramble_images(reshuffle=self._analysis_tags.xvars_shuffled)
             finally:
-                self._lite = _saved_lite_flag
-            timing['fallback_create_lite_copy_s'] = time.perf_counter() - t_stage
+                self._dealer.images = _saved_imgs
+        return images
 
-            t_stage = time.perf_counter()
-            regenerated_file, regenerated_rid = self.server_talk.get_data_file(
-                self.run_info.run_id, "", lite=True
-            )
-            timing['get_data_file_retry_lite_s'] = time.perf_counter() - t_stage
+    def _reload_image_window(self):
+        """Re-reads the image window from disk for the current ROI."""
+        self._check_untransformed(
+            "The new ROI extends past the image window that was read from disk")
+        window = self._image_window_for_roi(margin=getattr(self, '_roi_margin_px', 0))
+        self.images = self._read_source_images(window)
+        self._image_window = window
+        self._dealer.images = self.images
+
+    def compute_full_frame_od(self):
+        """Returns the OD over the full camera frame.
+
+        With lazy_images or roi_first, od_raw only covers the ROI window; this
+        builds the full-frame OD on request (reading the images from disk if
+        needed). Otherwise, returns od_raw.
+
+        Returns:
+            np.ndarray: the full-frame OD, shaped like od_raw apart from the
+            last two (pixel) axes.
+        """
+        if getattr(self, '_od_window', None) is None:
+            return self.od_raw
+        self._check_untransformed("od_raw only covers the ROI window")
+        if getattr(self, '_image_window', None) is not None:
+            images = self._read_source_images()
+        else:
+            images = self.images
+        atoms, light, dark = self._dealer.deal_data_ndarray(images)
+        if self.params.N_pwa_per_shot == 1:
+            atoms, light, dark = self._dealer.strip_shot_idx_axis(atoms, light, dark)
+        return compute_OD(atoms, light, dark,
+                          imaging_type=self._analysis_tags.imaging_type)
+
+    def _load_data(self, idx=0, path = "", lite=False, roi_id=None, _allow_lite_autocreate=True, ignore_images=False):
+        def _regenerate_lite_from_regular():
+            with profiler.span('fallback_full_load'):
+                self._load_data(
+                    idx,
+                    path,
+                    lite=False,
+                    roi_id=roi_id,
+                    _allow_lite_autocreate=False,
+                    ignore_images=ignore_images,
+                )
+
+            with profiler.span('fallback_create_lite_copy'):
+                # Build the minimal helper state save_lite_copy() needs.
+                # __init__ will re-create these after _load_data returns;
+                # that's fine — they're cheap.
+                self._ds = DataSaver(data_dir=self._regular_data_dir(), server_talk=self.server_talk)
+                self._dealer = self._init_dealer()
+                self._analysis_tags = analysis_tags(roi_id, self.run_info.imaging_type)
+                if getattr(self, '_has_images', True):
+                    self.roi = ROI(
+                        run_id=self.run_info.run_id,
+                        roi_id=roi_id,
+                        use_saved_roi=True,
+                        lite=False,
+                        printouts=False,
+                        server_talk=self.server_talk,
+                        current_file_path=self._data_file_path,
+                        current_saved_roi=self._saved_roi_from_file,
+                        images=self.images,
+                        imaging_type=self.run_info.imaging_type,
+                    )
+                # self._lite is still True from __init__ (the user asked for
+                # lite); flip it temporarily so save_lite_copy() sees the full
+                # uncropped data we just loaded. If ignore_images=True,
+                # save_lite_copy writes only non-image datasets and skips ROI.
+                _saved_lite_flag = self._lite
+                self._lite = False
+                try:
+                    self.save_lite_copy(ignore_images=ignore_images)
+                finally:
+                    self._lite = _saved_lite_flag
+
+            with profiler.span('get_data_file_retry_lite'):
+                regenerated_file, regenerated_rid = self.server_talk.get_data_file(
+                    self.run_info.run_id, "", lite=True
+                )
             return regenerated_file, regenerated_rid
 
         try:
-            t_stage = time.perf_counter()
-            file, rid = self.server_talk.get_data_file(idx, path, lite)
-            timing['get_data_file_initial_s'] = time.perf_counter() - t_stage
+            with profiler.span('get_data_file'):
+                file, rid = self.server_talk.get_data_file(idx, path, lite)
         except ValueError as e:
-            timing['get_data_file_initial_s'] = time.perf_counter() - t_stage
             msg = str(e)
             lite_missing = ("was not found" in msg or "lite copy does not exist" in msg)
             if lite and _allow_lite_autocreate and lite_missing:
@@ -2196,179 +2605,132 @@ class atomdata_base():
         self._saved_roi_from_file = False
         self.scope_data = {}
 
-        t_stage = time.perf_counter()
         with h5py.File(file,'r') as f:
-            timing['h5_open_s'] = time.perf_counter() - t_stage
-
-            t_stage = time.perf_counter()
-            self.params = ExptParams()
-            self.p = self.params
-            self.camera_params = CameraParams()
-            self.run_info = RunInfo()
-
-            unpack_group(f,'params',self.params)
-            unpack_group(f,'camera_params',self.camera_params)
-            unpack_group(f,'run_info',self.run_info)
-
-            # N_repeats must always be an int. HDF5 may store it as a
-            # 0-d array, a 1-element array, a multi-element array, or a
-            # list — normalise here. Multi-element arrays are reduced by
-            # taking the product (e.g. [2, 3] → 6).
-            _nr = self.params.N_repeats
-            if hasattr(_nr, '__len__'):
-                _nr_arr = np.asarray(_nr).ravel()
-                _nr = int(np.prod(_nr_arr)) if _nr_arr.size > 1 else int(_nr_arr[0])
-            self.params.N_repeats = int(_nr)
-            timing['h5_unpack_headers_s'] = time.perf_counter() - t_stage
+            with profiler.span('unpack_headers'):
+                self.params = ExptParams()
+                self.p = self.params
+                self.camera_params = CameraParams()
+                self.run_info = RunInfo()
+
+                unpack_group(f,'params',self.params)
+                unpack_group(f,'camera_params',self.camera_params)
+                unpack_group(f,'run_info',self.run_info)
+
+                # N_repeats must always be an int. HDF5 may store it as a
+                # 0-d array, a 1-element array, a multi-element array, or a
+                # list — normalise here. Multi-element arrays are reduced by
+                # taking the product (e.g. [2, 3] → 6).
+                _nr = self.params.N_repeats
+                if hasattr(_nr, '__len__'):
+                    _nr_arr = np.asarray(_nr).ravel()
+                    _nr = int(np.prod(_nr_arr)) if _nr_arr.size > 1 else int(_nr_arr[0])
+                self.params.N_repeats = int(_nr)
 
             print(self.run_info.run_id)
 
-            t_stage = time.perf_counter()
-            # has_images=False means no camera images were captured (e.g.
-            # save_data=True but setup_camera=False).  Old files that pre-date
-            # this attribute always have images, so we default to whether the
-            # 'images' dataset actually exists in the file.
-            self._has_images = bool(f.attrs.get('has_images', 'images' in f['data']))
-            if ignore_images:
-                self._has_images = False
-            if self._has_images:
-                self.images = f['data']['images'][()]
-                self.image_timestamps = f['data']['image_timestamps'][()]
-            else:
-                self.images = np.array([])
-                self.image_timestamps = np.array([])
-            self.xvarnames = f.attrs['xvarnames'][()]
-            self.xvars = self._unpack_xvars()
-            timing['h5_read_core_arrays_s'] = time.perf_counter() - t_stage
+            with profiler.span('read_core_arrays'):
+                # has_images=False means no camera images were captured (e.g.
+                # save_data=True but setup_camera=False).  Old files that pre-date
+                # this attribute always have images, so we default to whether the
+                # 'images' dataset actually exists in the file.
+                self._has_images = bool(f.attrs.get('has_images', 'images' in f['data']))
+                if ignore_images:
+                    self._has_images = False
+                self._image_source = None
+                self._image_window = None
+                self._od_window = None
+                if self._has_images:
+                    # with the analysis cache, the images are only read if
+                    # the cache misses
+                    if getattr(self, '_lazy_images', False) or getattr(self, '_analysis_cache', False):
+                        self._image_source = LazyImages(file)
+                        self.images = self._image_source
+                    else:
+                        self.images = f['data']['images'][()]
+                        profiler.count('bytes_read', self.images.nbytes)
+                    self.image_timestamps = f['data']['image_timestamps'][()]
+                else:
+                    self.images = np.array([])
+                    self.image_timestamps = np.array([])
+                self.xvarnames = f.attrs['xvarnames'][()]
+                self.xvars = self._unpack_xvars()
 
-            t_stage = time.perf_counter()
-            if 'roix' in f.attrs and 'roiy' in f.attrs:
-                self._saved_roi_from_file = [f.attrs['roix'], f.attrs['roiy']]
-            timing['h5_saved_roi_attrs_s'] = time.perf_counter() - t_stage
+            with profiler.span('saved_roi_attrs'):
+                if 'roix' in f.attrs and 'roiy' in f.attrs:
+                    self._saved_roi_from_file = [f.attrs['roix'], f.attrs['roiy']]
 
             class DataVault():
                 def __init__(self):
                     self.keys = []
             self.data = DataVault()
 
-            t_stage = time.perf_counter()
-            all_keys = list(f['data'].keys())
-            filtered_keys = [k for k in all_keys if k not in ['images', 'image_timestamps', 'sort_N', 'sort_idx', 'scope_data', 'timestamp_shot_end']]
+            with profiler.span('read_datavault'):
+                all_keys = list(f['data'].keys())
+                filtered_keys = [k for k in all_keys if k not in ['images', 'image_timestamps', 'sort_N', 'sort_idx', 'scope_data', 'timestamp_shot_end']]
 
-            for k in filtered_keys:
-                data_k = f['data'][k][()]
-                data_k: np.ndarray
+                for k in filtered_keys:
+                    data_k = f['data'][k][()]
+                    data_k: np.ndarray
 
-                vars(self.data)[k] = data_k
-                self.data.keys.append(k)
-            timing['h5_read_datavault_s'] = time.perf_counter() - t_stage
+                    vars(self.data)[k] = data_k
+                    self.data.keys.append(k)
+                    profiler.count('bytes_read', np.asarray(data_k).nbytes)
 
-            t_stage = time.perf_counter()
-            if 'timestamp_shot_end' in all_keys:
-                self.timestamp_shot_end = f['data']['timestamp_shot_end'][()]
-            else:
-                self.timestamp_shot_end = np.array([])
-            timing['h5_read_timestamp_shot_end_s'] = time.perf_counter() - t_stage
+            with profiler.span('read_timestamp_shot_end'):
+                if 'timestamp_shot_end' in all_keys:
+                    self.timestamp_shot_end = f['data']['timestamp_shot_end'][()]
+                else:
+                    self.timestamp_shot_end = np.array([])
 
-            t_stage = time.perf_counter()
-            try:
-                attrs = f.attrs
-
-                def _attr_text(key, default=""):
-                    val = attrs.get(key, default)
-                    if val is None:
-                        return default
-                    if isinstance(val, bytes):
-                        return val.decode("utf-8", errors="replace")
-                    if isinstance(val, np.ndarray):
-                        if val.shape == ():
-                            scalar = val.item()
-                            if isinstance(scalar, bytes):
-                                return scalar.decode("utf-8", errors="replace")
-                            return str(scalar)
-                        return str(val)
-                    return str(val)
-
-                experiment_text = _attr_text('expt_file', "")
-                params_text = _attr_text('params_file', "")
-
-                # Legacy keys are preserved for older files; new files store
-                # all base-class sources under base_class_<module_name>.
-                base_files = {}
-                for attr_key in attrs.keys():
-                    if attr_key.startswith('base_class_'):
-                        base_files[attr_key] = _attr_text(attr_key, "")
-
-                cooling_text = _attr_text('cooling_file', _attr_text('base_class_cooling', ""))
-                imaging_text = _attr_text('imaging_file', _attr_text('base_class_image', ""))
-                control_text = _attr_text('control_file', _attr_text('base_class_control', ""))
-            except Exception:
-                experiment_text = ""
-                params_text = ""
-                cooling_text = ""
-                imaging_text = ""
-                control_text = ""
-                base_files = {}
-            self.experiment_code = expt_code(experiment_text,
-                                                params_text,
-                                                cooling_text,
-                                                imaging_text,
-                                                control_text,
-                                                base_files=base_files)
-            timing['h5_read_experiment_text_s'] = time.perf_counter() - t_stage
-
-            t_stage = time.perf_counter()
-            if 'sort_idx' in all_keys and 'sort_N' in all_keys:
-                self.sort_idx = f['data']['sort_idx'][()]
-                self.sort_N = f['data']['sort_N'][()]
-            else:
-                self.sort_idx = np.array([])
-                self.sort_N = np.array([])
-            timing['h5_read_sort_metadata_s'] = time.perf_counter() - t_stage
+            with profiler.span('read_experiment_text'):
+                try:
+                    # Texts of newer runs are stored by hash in the data
+                    # root's source store; older runs keep them as attrs.
+                    texts = read_source_texts(f, self._data_file_path)
 
-            t_stage = time.perf_counter()
-            try:
-                if 'scope_data' in all_keys:
-                    d = f['data']['scope_data']
-                    SCOPE_DATA_CHANGE_EPOCH = datetime.datetime(2026,1,16,0)
-                    old_method_bool = datetime.datetime(*self.run_info.run_datetime[:4]) < SCOPE_DATA_CHANGE_EPOCH
-
-                    self.scope_data = format_scope_data(d, old_method=old_method_bool)
-            except Exception as e:
-                print(e)
-            timing['h5_read_scope_data_s'] = time.perf_counter() - t_stage
-
-        timing['load_total_s'] = time.perf_counter() - t_load_total
-        self._timing.update({f'load_{k}': v for k, v in timing.items()})
-
-        if self._timing_enabled:
-            print(
-                (
-                    "[atomdata timing] load total={:.3f}s | get_data_file(initial)={:.3f}s | "
-                    "h5_open={:.3f}s | headers={:.3f}s | core_arrays={:.3f}s | "
-                    "datavault={:.3f}s | scope_data={:.3f}s"
-                ).format(
-                    timing.get('load_total_s', 0.0),
-                    timing.get('get_data_file_initial_s', 0.0),
-                    timing.get('h5_open_s', 0.0),
-                    timing.get('h5_unpack_headers_s', 0.0),
-                    timing.get('h5_read_core_arrays_s', 0.0),
-                    timing.get('h5_read_datavault_s', 0.0),
-                    timing.get('h5_read_scope_data_s', 0.0),
-                )
-            )
+                    experiment_text = texts.get('expt_file', "")
+                    params_text = texts.get('params_file', "")
 
-            if 'get_data_file_retry_lite_s' in timing or 'fallback_create_lite_copy_s' in timing:
-                print(
-                    (
-                        "[atomdata timing] load fallback | full_load={:.3f}s | "
-                        "create_lite_copy={:.3f}s | get_data_file(retry_lite)={:.3f}s"
-                    ).format(
-                        timing.get('fallback_full_load_s', 0.0),
-                        timing.get('fallback_create_lite_copy_s', 0.0),
-                        timing.get('get_data_file_retry_lite_s', 0.0),
-                    )
-                )
+                    # Legacy keys are preserved for older files; new files store
+                    # all base-class sources under base_class_<module_name>.
+                    base_files = {k: v for k, v in texts.items()
+                                  if k.startswith('base_class_')}
+
+                    cooling_text = texts.get('cooling_file', texts.get('base_class_cooling', ""))
+                    imaging_text = texts.get('imaging_file', texts.get('base_class_image', ""))
+                    control_text = texts.get('control_file', texts.get('base_class_control', ""))
+                except Exception:
+                    experiment_text = ""
+                    params_text = ""
+                    cooling_text = ""
+                    imaging_text = ""
+                    control_text = ""
+                    base_files = {}
+                self.experiment_code = expt_code(experiment_text,
+                                                    params_text,
+                                                    cooling_text,
+                                                    imaging_text,
+                                                    control_text,
+                                                    base_files=base_files)
+
+            with profiler.span('read_sort_metadata'):
+                if 'sort_idx' in all_keys and 'sort_N' in all_keys:
+                    self.sort_idx = f['data']['sort_idx'][()]
+                    self.sort_N = f['data']['sort_N'][()]
+                else:
+                    self.sort_idx = np.array([])
+                    self.sort_N = np.array([])
+
+            with profiler.span('read_scope_data'):
+                try:
+                    if 'scope_data' in all_keys:
+                        d = f['data']['scope_data']
+                        SCOPE_DATA_CHANGE_EPOCH = datetime.datetime(2026,1,16,0)
+                        old_method_bool = datetime.datetime(*self.run_info.run_datetime[:4]) < SCOPE_DATA_CHANGE_EPOCH
+
+                        self.scope_data = format_scope_data(d, old_method=old_method_bool)
+                except Exception as e:
+                    print(e)
 
     def __getattribute__(self, name):
         if name in ['_repeat_sem_source',
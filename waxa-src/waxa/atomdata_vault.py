@@ -37,7 +37,11 @@ Limitations:
 """
 
 import copy
+import threading
+import time
 import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, TYPE_CHECKING
 
 import numpy as np
@@ -46,13 +50,24 @@ from waxa.atomdata import atomdata
 from waxa.atomdata_base import (
     atomdata_base,
     analysis_tags,
+    _check_analysis_mode,
 )
 from waxa.roi import ROI
+from waxa.data.server_talk import server_talk as st
+from waxa.fitting.fit_results import GaussianFitResults
+from waxa.helper.grouping import GroupReducer
+from waxa.profiling import profiler
 
 if TYPE_CHECKING:
     # Used only for Pylance autocomplete on .avg / .std / .sem.
     _AvgType = atomdata_base
 
+# Number of threads used to load run-ids. 1 loads them one after another.
+VAULT_LOAD_WORKERS = 4
+# Loaded runs that have not yet been handed to the vault are capped at this
+# many per worker, which bounds memory when loading many runs.
+VAULT_LOAD_WINDOW_PER_WORKER = 2
+
 
 def _flatten_inputs(inputs):
     """Flatten a scalar / range / list / tuple / ndarray into a list."""
@@ -79,6 +94,102 @@ def _decode_xvarname(name):
     return str(name)
 
 
+def load_runs_parallel(run_ids, n_workers=VAULT_LOAD_WORKERS,
+                       max_in_flight=None, progress=False,
+                       server_talk=None, **atomdata_kwargs):
+    """Load run-ids as atomdata on a thread pool, yielding them in order.
+
+    HDF5 reads, file lookups and the per-run analysis of different runs
+    overlap across the worker threads. Runs are yielded in the order of
+    ``run_ids`` regardless of which finishes first, and at most
+    ``max_in_flight`` runs are loading or waiting to be consumed at any time,
+    so a slow consumer (or a long run list) does not pull every run into
+    memory at once.
+
+    Parameters
+    ----------
+    run_ids : iterable of int
+    n_workers : int
+        Number of loader threads. ``1`` loads in the calling thread.
+    max_in_flight : int or None
+        Cap on submitted-but-unconsumed runs. Defaults to
+        ``VAULT_LOAD_WINDOW_PER_WORKER * n_workers``.
+    progress : bool
+        If True, print one line per run with its load time.
+    server_talk : server_talk or None
+        Template for the per-thread ``server_talk`` (``server_talk`` switches
+        its data directory between regular and lite, so threads cannot share
+        one). If None, each thread uses a default ``server_talk()``.
+    **atomdata_kwargs
+        Forwarded to ``atomdata(run_id, ...)``.
+
+    Yields
+    ------
+    (run_id, atomdata or Exception, float)
+        The run-id, the loaded atomdata (or the exception its load raised),
+        and the load time in seconds.
+    """
+    run_ids = [int(rid) for rid in run_ids]
+    n_runs = len(run_ids)
+    n_workers = max(1, int(n_workers or 1))
+    if max_in_flight is None:
+        max_in_flight = VAULT_LOAD_WINDOW_PER_WORKER * n_workers
+    max_in_flight = max(1, int(max_in_flight))
+
+    local = threading.local()
+
+    def _load(rid):
+        st_local = server_talk
+        if n_workers > 1:
+            st_local = getattr(local, 'server_talk', None)
+            if st_local is None:
+                if server_talk is None:
+                    st_local = st()
+                else:
+                    st_local = copy.copy(server_talk)
+                    # The run index is lock-protected; share it across threads.
+                    st_local._run_indices = server_talk._run_indices
+                local.server_talk = st_local
+        kwargs = dict(atomdata_kwargs)
+        if st_local is not None:
+            kwargs['server_talk'] = st_local
+        t0 = time.perf_counter()
+        try:
+            out = atomdata(rid, **kwargs)
+        except Exception as e:
+            out = e
+        return out, time.perf_counter() - t0
+
+    def _report(i, rid, out, dt):
+        if not progress:
+            return
+        status = 'loaded' if not isinstance(out, Exception) else f'failed ({out})'
+        print(f"[AtomdataVault] run {rid} {status} in {dt:.2f} s ({i + 1}/{n_runs})")
+
+    if n_workers == 1 or n_runs <= 1:
+        for i, rid in enumerate(run_ids):
+            out, dt = _load(rid)
+            _report(i, rid, out, dt)
+            yield rid, out, dt
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(n_workers, n_runs))
+    pending = deque()
+    next_idx = 0
+    try:
+        for i, rid in enumerate(run_ids):
+            while next_idx < n_runs and len(pending) < max_in_flight:
+                pending.append(executor.submit(_load, run_ids[next_idx]))
+                next_idx += 1
+            out, dt = pending.popleft().result()
+            _report(i, rid, out, dt)
+            yield rid, out, dt
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
 class _VaultDataVault():
     """Mimics the ``DataVault`` shape used by atomdata_base (a ``keys`` list
     plus arbitrary array attributes)."""
@@ -146,6 +257,22 @@ class AtomdataVault(atomdata_base):
         after loading. If given, this takes precedence over ``structure``.
     flatten_xvar : str, int, or None
         Structured xvar key/index to flatten automatically after any promotion.
+    n_workers : int
+        Number of threads used to load run-id inputs after the first (see
+        ``load_runs_parallel``). ``1`` loads them one after another.
+    load_progress : bool
+        If True, print a line per loaded run with its load time. Load times are
+        kept in ``vault.run_load_times`` either way.
+    analysis_mode : {'fit', 'moments'}
+        ``'fit'`` (default) fits Gaussians to the sum_ods. ``'moments'``
+        estimates the ``fit_*`` attributes from the sum_od moments instead of
+        fitting, both for the vault and for the runs it loads (see
+        ``atomdata``).
+    server_talk : server_talk or None
+        ``server_talk`` used to load run-id inputs. Loader threads work on
+        copies of it that share its run index. If None, the runs use the
+        ``atomdata`` default and the loader threads copy the first loaded
+        run's ``server_talk``.
     """
 
     def __init__(self,
@@ -162,14 +289,17 @@ class AtomdataVault(atomdata_base):
                  structure='auto',
                  xvar_mode='pad',
                  promote_xvar=None,
-                 flatten_xvar=None):
+                 flatten_xvar=None,
+                 n_workers=VAULT_LOAD_WORKERS,
+                 load_progress=False,
+                 analysis_mode='fit',
+                 server_talk=None):
 
         # Lightweight book-keeping expected by inherited helpers.
         self._lite = lite
         self._ignore_images = bool(ignore_images)
-        self._timing_enabled = False
-        self._timing = {}
-        self.server_talk = None
+        self._analysis_mode = _check_analysis_mode(analysis_mode)
+        self.server_talk = server_talk
 
         # Vault-specific configuration.
         self._merge_overlap = bool(merge_overlap)
@@ -196,6 +326,10 @@ class AtomdataVault(atomdata_base):
             xvar_mode=xvar_mode,
             promote_xvar=promote_xvar,
             flatten_xvar=flatten_xvar,
+            n_workers=n_workers,
+            load_progress=load_progress,
+            analysis_mode=analysis_mode,
+            server_talk=server_talk,
         )
 
         self.avg: Optional[atomdata_base] = None
@@ -212,12 +346,21 @@ class AtomdataVault(atomdata_base):
         self.source_param_values = {}
         self._shot_param_values = {}
         self._structured_xvars = False
+        # run_id -> seconds spent loading it (run-id inputs only).
+        self.run_load_times = {}
 
         # 1. Normalize and materialize inputs.
         raw_inputs = _flatten_inputs(inputs)
         if len(raw_inputs) == 0:
             raise ValueError("AtomdataVault requires at least one input.")
 
+        for item in raw_inputs:
+            if not isinstance(item, (atomdata_base, int, np.integer)):
+                raise TypeError(
+                    f"AtomdataVault inputs must be atomdata objects or "
+                    f"run_id ints, got {type(item).__name__}."
+                )
+
         # Memory guard: when many run-ids are requested, default to loading the
         # pre-cropped lite datasets unless the caller explicitly opted out.
         n_int_inputs = sum(
@@ -237,22 +380,28 @@ class AtomdataVault(atomdata_base):
             self._lite = True
             self._build_kwargs['lite'] = True
 
-        # Load run-ids sequentially so that only the first load can trigger
-        # the ROI selection GUI. After the first run is loaded (or if the
-        # first input is an already-loaded atomdata), its run_id is used as
-        # the roi_id for all subsequent int loads, ensuring one consistent ROI
-        # is reused rather than opening a new selector for each chunk.
+        # Load the first run-id on its own so that only the first load can
+        # trigger the ROI selection GUI. After the first run is loaded (or if
+        # the first input is an already-loaded atomdata), its run_id is used
+        # as the roi_id for all subsequent int loads, ensuring one consistent
+        # ROI is reused rather than opening a new selector for each chunk.
+        # The subsequent int loads then run on a thread pool.
         ads = []
         _first_run_id = None  # run_id of the first materialized atomdata
         _has_subsequent_int_loads = any(
             isinstance(item, (int, np.integer)) for item in raw_inputs[1:]
         )
+        _loader = None
+        _st_kwargs = {} if server_talk is None else {'server_talk': server_talk}
+        _loader_st = server_talk
 
         for item in raw_inputs:
             if isinstance(item, atomdata_base):
                 ads.append(item)
                 if _first_run_id is None:
                     _first_run_id = int(item.run_info.run_id)
+                    if _loader_st is None:
+                        _loader_st = getattr(item, 'server_talk', None)
                     # Save the ROI so subsequent int loads (and lite-dataset
                     # creation) can look it up by run_id.
                     if (not self._ignore_images) and (_has_subsequent_int_loads or lite):
@@ -262,23 +411,41 @@ class AtomdataVault(atomdata_base):
                 # Subsequent int loads: reuse the first run's roi_id so no
                 # additional GUI opens.
                 if _first_run_id is None:
+                    t0 = time.perf_counter()
                     ad = atomdata(int(item), roi_id=roi_id, lite=lite,
-                                  ignore_images=self._ignore_images)
+                                  ignore_images=self._ignore_images,
+                                  analysis_mode=analysis_mode,
+                                  **_st_kwargs)
+                    self.run_load_times[int(item)] = time.perf_counter() - t0
                     _first_run_id = int(ad.run_info.run_id)
+                    if _loader_st is None:
+                        _loader_st = getattr(ad, 'server_talk', None)
                     # Persist the ROI so subsequent int loads (and lite-dataset
                     # creation for each run) can find it by run_id.
                     if (not self._ignore_images) and (_has_subsequent_int_loads or lite):
                         ad.save_roi_h5()
                 else:
-                    _roi = roi_id if roi_id is not None else _first_run_id
-                    ad = atomdata(int(item), roi_id=_roi, lite=lite,
-                                  ignore_images=self._ignore_images)
+                    if _loader is None:
+                        later_ids = [
+                            int(x) for x in raw_inputs[len(ads):]
+                            if isinstance(x, (int, np.integer))
+                        ]
+                        _loader = load_runs_parallel(
+                            later_ids,
+                            n_workers=n_workers,
+                            progress=load_progress,
+                            roi_id=roi_id if roi_id is not None else _first_run_id,
+                            lite=lite,
+                            ignore_images=self._ignore_images,
+                            analysis_mode=analysis_mode,
+                            server_talk=_loader_st,
+                        )
+                    rid, ad, dt = next(_loader)
+                    if isinstance(ad, Exception):
+                        _loader.close()
+                        raise ad
+                    self.run_load_times[rid] = dt
                 ads.append(ad)
-            else:
-                raise TypeError(
-                    f"AtomdataVault inputs must be atomdata objects or "
-                    f"run_id ints, got {type(item).__name__}."
-                )
 
         # 2. Validate compatibility. N_repeats may differ across inputs when
         #    merge_overlap is on (grouped statistics handle ragged counts).
@@ -288,108 +455,110 @@ class AtomdataVault(atomdata_base):
             ignore_images=self._ignore_images,
         )
 
-        # 3. Unshuffle each chunk so the per-shot arrays are in xvar order on
-        #    axis 0. Only chunks that actually need unshuffling are deep-copied
-        #    (unshuffle mutates in place); already-ordered chunks are used
-        #    by-reference and only read from, which avoids duplicating large
-        #    image stacks for the common many-run / lite case.
-        chunks = []
-        for ad in ads:
-            if getattr(ad._analysis_tags, 'xvars_shuffled', False):
-                ad_copy = copy.deepcopy(ad)
-                ad_copy.unshuffle(reanalyze=False)
-                if getattr(ad_copy, '_has_images', True):
-                    ad_copy._sort_images()
-                chunks.append(ad_copy)
-            else:
-                chunks.append(ad)
-
-        # 4. Assemble vault state from chunks.
-        first = chunks[0]
-        xvarname = _decode_xvarname(first.xvarnames[0])
-        self.source_run_ids = [int(c.run_info.run_id) for c in chunks]
-        self._source_atomdata_by_run_id = {
-            int(c.run_info.run_id): c for c in chunks
-        }
-
-        # params: deep-copy first, then patch the scanned attribute below.
-        self.params = copy.deepcopy(first.params)
-        self.p = self.params
-        self.camera_params = copy.deepcopy(first.camera_params)
-        self.run_info = copy.deepcopy(first.run_info)
-        self.run_info.run_id = list(self.source_run_ids)
-        self.experiment_code = getattr(first, 'experiment_code', None)
-        self._has_images = (
-            False if self._ignore_images
-            else bool(getattr(first, '_has_images', True))
-        )
-
-        self._warn_param_mismatches(chunks)
-
-        # Concatenate xvar values (axis 0).
-        xvar_values = np.concatenate(
-            [np.asarray(c.xvars[0]) for c in chunks], axis=0
-        )
+        with profiler.span('vault_merge'):
+            profiler.count('runs', len(ads))
+            # 3. Unshuffle each chunk so the per-shot arrays are in xvar order on
+            #    axis 0. Only chunks that actually need unshuffling are deep-copied
+            #    (unshuffle mutates in place); already-ordered chunks are used
+            #    by-reference and only read from, which avoids duplicating large
+            #    image stacks for the common many-run / lite case.
+            chunks = []
+            for ad in ads:
+                if getattr(ad._analysis_tags, 'xvars_shuffled', False):
+                    ad_copy = copy.deepcopy(ad)
+                    ad_copy.unshuffle(reanalyze=False)
+                    if getattr(ad_copy, '_has_images', True):
+                        ad_copy._sort_images()
+                    chunks.append(ad_copy)
+                else:
+                    chunks.append(ad)
+
+            # 4. Assemble vault state from chunks.
+            first = chunks[0]
+            xvarname = _decode_xvarname(first.xvarnames[0])
+            self.source_run_ids = [int(c.run_info.run_id) for c in chunks]
+            self._source_atomdata_by_run_id = {
+                int(c.run_info.run_id): c for c in chunks
+            }
 
-        # Per-shot provenance: which source run each concatenated shot came
-        # from. Carried through the sort/reindex below so it always lines up
-        # with the analyzed arrays.
-        self.shot_run_id = np.concatenate([
-            np.full(int(np.asarray(c.xvars[0]).shape[0]),
-                    int(c.run_info.run_id), dtype=np.int64)
-            for c in chunks
-        ])
-        self._build_shot_param_values(chunks)
-
-        # Concatenate images / timestamps if present.
-        # Keep a reference to the first chunk's raw images so the ROI GUI
-        # shows a representative frame from the first run only (not all runs).
-        if self._has_images:
-            _first_chunk_images = np.asarray(chunks[0].images)
-            self.images = np.concatenate(
-                [np.asarray(c.images) for c in chunks], axis=0
-            )
-            self.image_timestamps = np.concatenate(
-                [np.asarray(c.image_timestamps) for c in chunks], axis=0
+            # params: deep-copy first, then patch the scanned attribute below.
+            self.params = copy.deepcopy(first.params)
+            self.p = self.params
+            self.camera_params = copy.deepcopy(first.camera_params)
+            self.run_info = copy.deepcopy(first.run_info)
+            self.run_info.run_id = list(self.source_run_ids)
+            self.experiment_code = getattr(first, 'experiment_code', None)
+            self._has_images = (
+                False if self._ignore_images
+                else bool(getattr(first, '_has_images', True))
             )
-        else:
-            _first_chunk_images = None
-            self.images = np.array([])
-            self.image_timestamps = np.array([])
-
-        # Concatenate DataVault containers (union across chunks; NaN-pad
-        # missing entries).
-        self.data = self._concat_data_vaults(chunks)
 
-        # Concatenate scope_data only if every chunk has it (and contains the
-        # same scope/channel keys). Otherwise emit a warning and skip.
-        self._maybe_concat_scope_data(chunks, mode=self._scope_merge)
+            self._warn_param_mismatches(chunks)
 
-        # Patch the scanned param to the concatenated array.
-        setattr(self.params, xvarname, xvar_values)
+            # Concatenate xvar values (axis 0).
+            xvar_values = np.concatenate(
+                [np.asarray(c.xvars[0]) for c in chunks], axis=0
+            )
 
-        # Update shot-count params so the dealer reshapes the concatenated
-        # images correctly. For a 1-D scan, len(xvar_values) is the total
-        # per-shot count including repeats.
-        total_shots = int(len(xvar_values))
-        self.params.N_shots_with_repeats = total_shots
-        if hasattr(self.params, 'N_shots'):
-            nrep = int(getattr(self.params, 'N_repeats', 1) or 1)
-            self.params.N_shots = total_shots // nrep if nrep > 0 else total_shots
+            # Per-shot provenance: which source run each concatenated shot came
+            # from. Carried through the sort/reindex below so it always lines up
+            # with the analyzed arrays.
+            self.shot_run_id = np.concatenate([
+                np.full(int(np.asarray(c.xvars[0]).shape[0]),
+                        int(c.run_info.run_id), dtype=np.int64)
+                for c in chunks
+            ])
+            self._build_shot_param_values(chunks)
+
+            # Concatenate images / timestamps if present.
+            # Keep a reference to the first chunk's raw images so the ROI GUI
+            # shows a representative frame from the first run only (not all runs).
+            if self._has_images:
+                _first_chunk_images = np.asarray(chunks[0].images)
+                self.images = np.concatenate(
+                    [np.asarray(c.images) for c in chunks], axis=0
+                )
+                self.image_timestamps = np.concatenate(
+                    [np.asarray(c.image_timestamps) for c in chunks], axis=0
+                )
+            else:
+                _first_chunk_images = None
+                self.images = np.array([])
+                self.image_timestamps = np.array([])
+
+            # Concatenate DataVault containers (union across chunks; NaN-pad
+            # missing entries).
+            self.data = self._concat_data_vaults(chunks)
+
+            # Concatenate scope_data only if every chunk has it (and contains the
+            # same scope/channel keys). Otherwise emit a warning and skip.
+            self._maybe_concat_scope_data(chunks, mode=self._scope_merge)
+
+            # Patch the scanned param to the concatenated array.
+            setattr(self.params, xvarname, xvar_values)
+
+            # Update shot-count params so the dealer reshapes the concatenated
+            # images correctly. For a 1-D scan, len(xvar_values) is the total
+            # per-shot count including repeats.
+            total_shots = int(len(xvar_values))
+            self.params.N_shots_with_repeats = total_shots
+            if hasattr(self.params, 'N_shots'):
+                nrep = int(getattr(self.params, 'N_repeats', 1) or 1)
+                self.params.N_shots = total_shots // nrep if nrep > 0 else total_shots
 
-        # xvar scaffolding for the (single) scan axis.
-        self.xvarnames = [xvarname]
-        self.xvars = [xvar_values]
-        self.xvardims = np.array([total_shots], dtype=int)
-        self.Nvars = 1
+            # xvar scaffolding for the (single) scan axis.
+            self.xvarnames = [xvarname]
+            self.xvars = [xvar_values]
+            self.xvardims = np.array([total_shots], dtype=int)
+            self.Nvars = 1
 
-        # Vault is permanently unshuffled.
-        self.sort_idx = np.array([])
-        self.sort_N = np.array([])
+            # Vault is permanently unshuffled.
+            self.sort_idx = np.array([])
+            self.sort_N = np.array([])
 
-        # 5. Optional sort along the merged axis.
-        if sort:
-            self._sort_axis0_by_xvar()
+            # 5. Optional sort along the merged axis.
+            if sort:
+                self._sort_axis0_by_xvar()
 
         # 6. Build helper objects expected by _initial_analysis.
         from waxa.data.data_saver import DataSaver
@@ -436,20 +605,21 @@ class AtomdataVault(atomdata_base):
         else:
             self.roi = None
 
-        # 7. Run the standard initial analysis pipeline.
-        self._initial_analysis(transpose_idx=[], avg_repeats=False)
+        with profiler.span('vault_analysis'):
+            # 7. Run the standard initial analysis pipeline.
+            self._initial_analysis(transpose_idx=[], avg_repeats=False)
 
-        if promote_xvar is not None:
-            self.set_xvar(
-                promote_xvar,
-                xvar_mode=xvar_mode,
-                refresh_statistics=flatten_xvar is None,
-            )
-        else:
-            self._maybe_structure_from_param_disagreements(structure, xvar_mode)
+            if promote_xvar is not None:
+                self.set_xvar(
+                    promote_xvar,
+                    xvar_mode=xvar_mode,
+                    refresh_statistics=flatten_xvar is None,
+                )
+            else:
+                self._maybe_structure_from_param_disagreements(structure, xvar_mode)
 
-        if flatten_xvar is not None:
-            self.flatten_xvar(flatten_xvar)
+            if flatten_xvar is not None:
+                self.flatten_xvar(flatten_xvar)
 
         # 8. Optionally free the raw image stack now that derived quantities
         #    (od, atom_number, fits, ...) have been computed.
@@ -893,7 +1063,7 @@ class AtomdataVault(atomdata_base):
         for key, val in list(vars(self).items()):
             if key in _skip or key.startswith('_'):
                 continue
-            if isinstance(val, np.ndarray) and val.ndim >= 1 and val.shape[0] == n_old:
+            if isinstance(val, (np.ndarray, GaussianFitResults)) and val.ndim >= 1 and val.shape[0] == n_old:
                 vars(self)[key] = val[order]
 
         # Update shot-count bookkeeping (matters when n_new != n_old).
@@ -904,6 +1074,10 @@ class AtomdataVault(atomdata_base):
             self.params.N_shots = n_new // nrep if nrep > 0 else n_new
 
     def _reshape_axis0_to_first_xvar(self, arr, order, new_shape):
+        if isinstance(arr, GaussianFitResults):
+            if arr.ndim < 1 or arr.shape[0] != len(order):
+                return arr
+            return arr[np.asarray(order, dtype=int)].reshape(*new_shape)
         arr = np.asarray(arr)
         if arr.ndim < 1 or arr.shape[0] != len(order):
             return arr
@@ -979,7 +1153,7 @@ class AtomdataVault(atomdata_base):
         for key, val in list(vars(self).items()):
             if key in _skip or key.startswith('_'):
                 continue
-            if isinstance(val, np.ndarray) and val.ndim >= 1 and val.shape[0] == n_old:
+            if isinstance(val, (np.ndarray, GaussianFitResults)) and val.ndim >= 1 and val.shape[0] == n_old:
                 vars(self)[key] = self._reshape_axis0_to_first_xvar(
                     val, order, new_shape
                 )
@@ -1222,6 +1396,10 @@ class AtomdataVault(atomdata_base):
         return self
 
     def _flatten_structured_ndarray(self, arr, old_dims):
+        if isinstance(arr, GaussianFitResults):
+            if tuple(arr.shape[:len(old_dims)]) != tuple(old_dims):
+                return arr
+            return arr.reshape(int(np.prod(old_dims)), *arr.shape[len(old_dims):])
         arr = np.asarray(arr)
         if arr.ndim < len(old_dims):
             return arr
@@ -1398,7 +1576,7 @@ class AtomdataVault(atomdata_base):
         for key, val in list(vars(self).items()):
             if key in _skip or key.startswith('_'):
                 continue
-            if isinstance(val, np.ndarray):
+            if isinstance(val, (np.ndarray, GaussianFitResults)):
                 vars(self)[key] = self._flatten_structured_ndarray(val, old_dims)
 
         keep_name = self.xvarnames[keep_idx]
@@ -1442,38 +1620,16 @@ class AtomdataVault(atomdata_base):
             'xvars', 'xvarnames', 'xvardims',
         }
 
-    @staticmethod
-    def _grouped_mean_std(arr, inverse, n_groups, counts):
-        """NaN-aware group mean/std along axis 0 by ``inverse`` group labels.
-
-        Returns population std (ddof=0), matching the base atomdata repeat
-        statistics. NaN entries (e.g. from NaN-padded DataVault keys that are
-        absent in some runs) are ignored per element.
-        """
-        arr = np.asarray(arr, dtype=np.float64)
-        trailing = arr.shape[1:]
-        shp = (n_groups,) + trailing
-        finite = np.isfinite(arr)
-        vals = np.where(finite, arr, 0.0)
-        csum = np.zeros(shp, dtype=np.float64)
-        sqsum = np.zeros(shp, dtype=np.float64)
-        ncnt = np.zeros(shp, dtype=np.float64)
-        np.add.at(csum, inverse, vals)
-        np.add.at(sqsum, inverse, vals * vals)
-        np.add.at(ncnt, inverse, finite.astype(np.float64))
-        with np.errstate(invalid='ignore', divide='ignore'):
-            mean = csum / ncnt
-            var = sqsum / ncnt - mean * mean
-        var = np.clip(var, 0.0, None)
-        std = np.sqrt(var)
-        return mean, std
-
-    @staticmethod
-    def _sem_from_std(std, counts):
-        n = np.asarray(counts, dtype=np.float64)
-        shp = (std.shape[0],) + (1,) * (std.ndim - 1)
-        with np.errstate(invalid='ignore', divide='ignore'):
-            return std / np.sqrt(n).reshape(shp)
+    def _xvar_groups(self):
+        """The GroupReducer over the (single) xvar's values, rebuilt only
+        when the xvar changes. Every grouped statistic of the vault shares
+        it, so the xvar is sorted once rather than once per attribute."""
+        xvar = np.asarray(self.xvars[0])
+        groups = getattr(self, '_xvar_group_reducer', None)
+        if groups is None or not groups.matches(xvar):
+            groups = GroupReducer(xvar)
+            self._xvar_group_reducer = groups
+        return groups
 
     def _copy_metadata_to_ragged_sibling(self, ad_out, unique_xvar):
         """Populate a stat-sibling object (avg/std/sem) with metadata whose
@@ -1520,12 +1676,8 @@ class AtomdataVault(atomdata_base):
         """Build eager avg/std/sem siblings by grouping shots by unique xvar
         value. Handles ragged repeat counts (overlapping ranges) and uses each
         point's own count for SEM."""
-        xvar = np.asarray(self.xvars[0])
-        unique, inverse, counts = np.unique(
-            xvar, return_inverse=True, return_counts=True
-        )
-        inverse = np.asarray(inverse).ravel()
-        n_groups = unique.size
+        groups = self._xvar_groups()
+        unique = groups.unique
 
         ad_avg = object.__new__(self.__class__)
         ad_std = object.__new__(self.__class__)
@@ -1536,9 +1688,8 @@ class AtomdataVault(atomdata_base):
         skip = self._stat_skip_keys()
 
         def _reduce(value):
-            mean, std = self._grouped_mean_std(value, inverse, n_groups, counts)
-            sem = self._sem_from_std(std, counts)
-            return mean, std, sem
+            out = groups.reduce(value, ('mean', 'std', 'sem'))
+            return out['mean'], out['std'], out['sem']
 
         # Top-level scan-shaped arrays (od, od_raw, atom_number, fits, ...).
         for key, value in vars(self).items():
@@ -1631,26 +1782,20 @@ class AtomdataVault(atomdata_base):
             print('AtomdataVault is already collapsed to unique xvar values.')
             return self
 
-        xvar = np.asarray(self.xvars[0])
-        unique, inverse, counts = np.unique(
-            xvar, return_inverse=True, return_counts=True
-        )
-        inverse = np.asarray(inverse).ravel()
-        n_groups = unique.size
+        groups = self._xvar_groups()
+        unique, n_groups = groups.unique, groups.n_groups
 
         skip = self._stat_skip_keys()
         for key, value in list(vars(self).items()):
             if key in skip or key.startswith('_'):
                 continue
             if self._is_scan_shaped_numeric_array(value):
-                mean, _ = self._grouped_mean_std(value, inverse, n_groups, counts)
-                vars(self)[key] = mean
+                vars(self)[key] = groups.reduce(value, 'mean')
 
         for key in self.data.keys:
             value = vars(self.data)[key]
             if self._is_scan_shaped_numeric_array(value):
-                mean, _ = self._grouped_mean_std(value, inverse, n_groups, counts)
-                vars(self.data)[key] = mean
+                vars(self.data)[key] = groups.reduce(value, 'mean')
 
         if hasattr(self, 'scope_data'):
             for scope_key, ch_dict in self.scope_data.items():
@@ -1658,17 +1803,15 @@ class AtomdataVault(atomdata_base):
                     for ax in ('t', 'v'):
                         val = np.asarray(getattr(trace, ax))
                         if self._is_scan_shaped_numeric_array(val):
-                            mean, _ = self._grouped_mean_std(
-                                val, inverse, n_groups, counts)
-                            setattr(trace, ax, mean)
+                            setattr(trace, ax, groups.reduce(val, 'mean'))
 
         # Collapse provenance to the set of runs contributing to each point.
         if hasattr(self, 'shot_run_id') and np.asarray(self.shot_run_id).dtype != object:
             rid = np.asarray(self.shot_run_id)
-            self.shot_run_id = np.array(
-                [np.unique(rid[inverse == g]) for g in range(n_groups)],
-                dtype=object,
-            )
+            rid_sorted = rid[groups.order]
+            self.shot_run_id = np.empty(n_groups, dtype=object)
+            for g, (start, count) in enumerate(zip(groups.starts, groups.counts)):
+                self.shot_run_id[g] = np.unique(rid_sorted[start:start + count])
 
         # Raw images no longer line up with the collapsed axis.
         if self._has_images:
@@ -1821,43 +1964,81 @@ class AtomdataVault(atomdata_base):
     # ------------------------------------------------------------------
     @classmethod
     def from_run_range(cls, start_id, stop_id, experiment_name=None,
-                       skip_missing=True, roi_id=None, lite=True, **kwargs):
+                       skip_missing=True, roi_id=None, lite=True,
+                       n_workers=VAULT_LOAD_WORKERS, load_progress=False,
+                       **kwargs):
         """Build a vault from a contiguous run-id range ``[start_id, stop_id]``.
 
         Missing/aborted run-ids are skipped (``skip_missing``). If
         ``experiment_name`` is given, only runs whose experiment class or
         filepath contains that substring are kept -- handy for an experiment
         builder that interleaves several experiment types. Subsequent runs
-        reuse the first loaded run's ROI so the selector opens at most once.
+        reuse the first loaded run's ROI so the selector opens at most once,
+        and are loaded on ``n_workers`` threads (see ``load_runs_parallel``).
+        A ``server_talk`` keyword is used for every load, as in the
+        constructor.
         """
+        analysis_mode = kwargs.get('analysis_mode', 'fit')
+        server_talk = kwargs.get('server_talk', None)
+        st_kwargs = {} if server_talk is None else {'server_talk': server_talk}
         start_id, stop_id = int(start_id), int(stop_id)
         if stop_id < start_id:
             start_id, stop_id = stop_id, start_id
 
         ads, skipped = [], []
+        load_times = {}
+
+        def _keep(rid, ad):
+            if experiment_name is not None:
+                name = str(getattr(ad.run_info, 'expt_class', '') or '')
+                fpath = str(getattr(ad.run_info, 'experiment_filepath', '') or '')
+                target = experiment_name.lower()
+                if target not in name.lower() and target not in fpath.lower():
+                    skipped.append(rid)
+                    return
+            ads.append(ad)
+
+        # Load one run at a time until the first succeeds: it fixes the ROI
+        # (possibly via the selector GUI) that every later run reuses.
         anchor_roi = roi_id
-        for rid in range(start_id, stop_id + 1):
+        rid = start_id
+        while rid <= stop_id and anchor_roi is None:
+            t0 = time.perf_counter()
             try:
-                ad = atomdata(rid, roi_id=anchor_roi, lite=lite)
+                ad = atomdata(rid, roi_id=anchor_roi, lite=lite,
+                              analysis_mode=analysis_mode, **st_kwargs)
             except Exception:
                 if skip_missing:
                     skipped.append(rid)
+                    rid += 1
                     continue
                 raise
-            if anchor_roi is None:
-                anchor_roi = int(ad.run_info.run_id)
-                try:
-                    ad.save_roi_h5()
-                except Exception:
-                    pass
-            if experiment_name is not None:
-                name = str(getattr(ad.run_info, 'expt_class', '') or '')
-                fpath = str(getattr(ad.run_info, 'experiment_filepath', '') or '')
-                target = experiment_name.lower()
-                if target not in name.lower() and target not in fpath.lower():
-                    skipped.append(rid)
+            load_times[rid] = time.perf_counter() - t0
+            anchor_roi = int(ad.run_info.run_id)
+            if server_talk is None:
+                server_talk = getattr(ad, 'server_talk', None)
+            try:
+                ad.save_roi_h5()
+            except Exception:
+                pass
+            _keep(rid, ad)
+            rid += 1
+
+        loader = load_runs_parallel(range(rid, stop_id + 1),
+                                    n_workers=n_workers,
+                                    progress=load_progress,
+                                    roi_id=anchor_roi, lite=lite,
+                                    analysis_mode=analysis_mode,
+                                    server_talk=server_talk)
+        for this_rid, ad, dt in loader:
+            if isinstance(ad, Exception):
+                if skip_missing:
+                    skipped.append(this_rid)
                     continue
-            ads.append(ad)
+                loader.close()
+                raise ad
+            load_times[this_rid] = dt
+            _keep(this_rid, ad)
 
         if not ads:
             raise ValueError(
@@ -1873,7 +2054,13 @@ class AtomdataVault(atomdata_base):
                 f'({preview}{more}).',
                 stacklevel=2,
             )
-        return cls(ads, roi_id=roi_id, lite=lite, **kwargs)
+        vault = cls(ads, roi_id=roi_id, lite=lite, n_workers=n_workers,
+                    load_progress=load_progress, **kwargs)
+        vault.run_load_times = {
+            rid: dt for rid, dt in load_times.items()
+            if rid in vault._source_atomdata_by_run_id
+        }
+        return vault
 
     @classmethod
     def from_builder(cls, start_id, stop_id, experiment_name, **kwargs):
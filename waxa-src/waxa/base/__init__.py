@@ -1,3 +1,5 @@
 from .dealer import Dealer
 from .xvar import xvar
-from .scribe import Scribe
\ No newline at end of file
+from .scribe import Scribe
+from .unshuffle import UnshufflePlan, get_unshuffle_plan
+from .stages import AnalysisStages
\ No newline at end of file
@@ -1,6 +1,7 @@
 import numpy as np
 from typing import TYPE_CHECKING
 from waxa.base.xvar import xvar
+from waxa.base.unshuffle import get_unshuffle_plan
 from waxa.config.data_vault import DataContainer, DataVault
 if TYPE_CHECKING:
     from waxx.config.data_vault import DataContainer, DataVault  # noqa: F811
@@ -126,62 +127,72 @@ class Dealer():
                 self.sort_idx.append(elem[1])
 
     def unscramble_images(self,reshuffle=False):
-
-        pwa, pwoa, dark = self.deal_data_ndarray(self.images)
-        
-        pwa = self._unshuffle_ndarray(pwa,exclude_dims=3,
-                                        reshuffle=reshuffle)
-        pwoa = self._unshuffle_ndarray(pwoa,exclude_dims=3,
-                                        reshuffle=reshuffle)
-        dark = self._unshuffle_ndarray(dark,exclude_dims=3,
-                                        reshuffle=reshuffle)
-
-        self.images = self.stack_linear_data_ndarray(pwa,pwoa,dark)
-
+        """Unshuffles self.images by moving each shot's pwa, pwoa and dark
+        frames together, in one gather."""
+        self.images = self._unshuffle_plan().apply_images(
+            self.images, self.xvardims, self.params.N_pwa_per_shot,
+            reshuffle=reshuffle)
         return self.images
 
     def _unscramble_timestamps(self,reshuffle=False):
-
-        t_pwa, t_pwoa, t_dark = self.deal_data_ndarray(self.image_timestamps)
-
-        t_pwa = self._unshuffle_ndarray(t_pwa,reshuffle=reshuffle)
-        t_pwoa = self._unshuffle_ndarray(t_pwoa,reshuffle=reshuffle)
-        t_dark = self._unshuffle_ndarray(t_dark,reshuffle=reshuffle)
-
-        self.image_timestamps = self.stack_linear_data_ndarray(t_pwa,t_pwoa,t_dark)
-
+        self.image_timestamps = self._unshuffle_plan().apply_images(
+            self.image_timestamps, self.xvardims, self.params.N_pwa_per_shot,
+            reshuffle=reshuffle)
         return self.image_timestamps
     
     def stack_linear_data_ndarray(self,pwa,pwoa,dark):
+        """The inverse of deal_data_ndarray: interleaves the atoms, light and
+        dark arrays back into one shot-ordered array, with N_pwa_per_shot + 2
+        entries per shot.
+
+        Each input is written with one strided copy (no loop over shots).
+        pwoa and dark may be the broadcast views from deal_data_ndarray; only
+        the first pwa index of each shot is read from them.
+
+        Args:
+            pwa, pwoa, dark (np.ndarray): Arrays of shape
+            (n1,n2,...,nN,N_pwa_per_shot,...).
+
+        Returns:
+            np.ndarray: An array of shape (N_img,...).
+        """
         Ns = self.params.N_shots_with_repeats
         Nps = self.params.N_pwa_per_shot
         N_img = Ns*(Nps+2)
+        tail = pwa.shape[(self.N_xvars+1):]
 
-        ndarray = np.empty((Ns,Nps+2)+pwa.shape[(self.N_xvars+1):],
-                            dtype=pwa.dtype)
-        
-        sh = pwa.shape
-        
-        pwa = pwa.reshape((Ns,Nps)+pwa.shape[(self.N_xvars+1):])
-        pwoa = pwoa.reshape((Ns,Nps)+pwoa.shape[(self.N_xvars+1):])
-        dark = dark.reshape((Ns,Nps)+dark.shape[(self.N_xvars+1):])
-
-        for shot_idx in range(Ns):
-            ndarray[shot_idx][:Nps] = pwa[shot_idx]
-            ndarray[shot_idx][Nps] = pwoa[shot_idx][0]
-            ndarray[shot_idx][Nps+1] = dark[shot_idx][0]
+        ndarray = np.empty((Ns,Nps+2)+tail, dtype=pwa.dtype)
+        ndarray[:,:Nps] = pwa.reshape((Ns,Nps)+tail)
+        ndarray[:,Nps] = pwoa.reshape((Ns,Nps)+tail)[:,0]
+        ndarray[:,Nps+1] = dark.reshape((Ns,Nps)+tail)[:,0]
 
-        ndarray = ndarray.reshape((N_img,)+sh[(self.N_xvars+1):])
-        return ndarray
+        return ndarray.reshape((N_img,)+tail)
 
     def deal_data_ndarray(self,ndarray):
+        """Splits a shot-ordered image (or image timestamp) array into the
+        atoms, light and dark frames, each of shape
+        (n1,n2,...,nN,N_pwa_per_shot,...).
+
+        No image data is copied. pwa is a view of ndarray. pwoa and dark are
+        read-only broadcast views: each shot's one light (dark) frame is
+        shared by all of that shot's pwa frames (stride 0 along the
+        N_pwa_per_shot axis) rather than repeated for each. They can be passed
+        straight to compute_OD; use np.array(...) for a writeable copy.
+
+        Args:
+            ndarray (np.ndarray): An array of shape (N_img,...) with
+            N_pwa_per_shot + 2 entries per shot, in the order they were taken.
+
+        Returns:
+            tuple: (pwa, pwoa, dark)
+        """
         Ns = self.params.N_shots_with_repeats
         Nps = self.params.N_pwa_per_shot
         ndarray = ndarray.reshape((Ns,Nps+2)+ndarray.shape[1:])
 
         pwa = ndarray[:,0:Nps]
-        pwoa = np.expand_dims(ndarray[:,Nps],axis=1).repeat(Nps,axis=1)
-        dark = np.expand_dims(ndarray[:,Nps+1],axis=1).repeat(Nps,axis=1)
+        pwoa = np.broadcast_to(ndarray[:,Nps:Nps+1],pwa.shape)
+        dark = np.broadcast_to(ndarray[:,Nps+1:Nps+2],pwa.shape)
 
         pwa = self._reshape_data_array_to_nxvar(pwa)
         pwoa = self._reshape_data_array_to_nxvar(pwoa)
@@ -220,6 +231,7 @@ class Dealer():
 
         # only unshuffle if list has been shuffled
         if np.any(self.sort_idx):
+            plan = self._unshuffle_plan()
             protected_keys = ['xvarnames','sort_idx','images',
                               'image_timestamps','sort_N','sort_idx',
                               'xvars','N_repeats','N_shots',
@@ -232,43 +244,36 @@ class Dealer():
                 if only_treat_first_Nvar_axes:
                     exclude_dims = np.ndim(var) - len(self.scan_xvars)
                 else: exclude_dims = 0
-                var = self._unshuffle_ndarray(var,
-                                              exclude_dims=exclude_dims,
-                                              reshuffle=reshuffle)
+                var = plan.apply(var,
+                                 exclude_dims=exclude_dims,
+                                 reshuffle=reshuffle)
                 vars(struct)[k] = var
     
+    def _unshuffle_plan(self):
+        """Returns the UnshufflePlan for the current sort_idx / sort_N. Plans
+        are cached per sort metadata, so the inverse permutations are built
+        once per run."""
+        return get_unshuffle_plan(self.sort_idx, self.sort_N)
+
     def _unshuffle_ndarray(self,var,
                            exclude_dims=0,
                            reshuffle=False):
-        if isinstance(var,list):
-            var = np.array(var)
-        if isinstance(var,np.ndarray):
-            sdims = self._dims_to_sort(var,exclude_dims)
-            for dim in sdims:
-                N = var.shape[dim]
-                if N in self.sort_N:
-                    i = np.where(np.array(self.sort_N) == N)[0][0]
-                    shuf_idx = self.sort_idx[i]
-                    shuf_idx = shuf_idx[shuf_idx >= 0].astype(int) # remove padding [-1]s
-                    if not reshuffle:
-                        unshuf_idx = np.zeros_like(shuf_idx)
-                        unshuf_idx[shuf_idx] = np.arange(N)
-                    else:
-                        unshuf_idx = shuf_idx
-                    var = var.take(unshuf_idx,dim)
-        return var
+        return self._unshuffle_plan().apply(var,
+                                            exclude_dims=exclude_dims,
+                                            reshuffle=reshuffle)
 
     def _unshuffle_scopedata_dict(self,
                                   scope_data,
                                   reshuffle=False):
+            plan = self._unshuffle_plan()
             for k in scope_data.keys():
                 for ch in scope_data[k].keys():
                     for s in ['t','v']:
                         y = vars(scope_data[k][ch])[s]
                         exclude_dims = np.ndim(y) - len(self.scan_xvars)
-                        y = self._unshuffle_ndarray(y,
-                                                    exclude_dims=exclude_dims,
-                                                    reshuffle=reshuffle)
+                        y = plan.apply(y,
+                                       exclude_dims=exclude_dims,
+                                       reshuffle=reshuffle)
                         vars(scope_data[k][ch])[s] = y
 
     def _dims_to_sort(self,var,exclude_dims=0):
@@ -0,0 +1,108 @@
+import weakref
+
+import numpy as np
+
+_VALUE_TYPES = (bool, int, float, complex, str, bytes, type(None), np.generic)
+
+
+class _Ref():
+    """Identity of an object in a stage key. Held by weak reference where the
+    object supports it, so a stale key does not keep large arrays alive."""
+
+    def __init__(self, obj):
+        try:
+            self._ref = weakref.ref(obj)
+        except TypeError:
+            self._ref = lambda obj=obj: obj
+
+    def matches(self, obj):
+        return self._ref() is obj
+
+
+def _token(value):
+    if isinstance(value, _VALUE_TYPES):
+        return ('v', value)
+    if isinstance(value, (tuple, list)):
+        return ('t', tuple(_token(v) for v in value))
+    return ('r', _Ref(value))
+
+
+def _matches(token, value):
+    kind, stored = token
+    if kind == 'v':
+        return isinstance(value, _VALUE_TYPES) and type(value) == type(stored) \
+            and bool(value == stored)
+    if kind == 't':
+        return isinstance(value, (tuple, list)) and len(value) == len(stored) \
+            and all(_matches(t, v) for t, v in zip(stored, value))
+    return stored.matches(value)
+
+
+class AnalysisStages():
+    """
+    Memo of the image analysis chain of an atomdata, downstream of od_raw:
+
+        od_raw -> crop -> sums -> fits -> atom_number
+
+    Each stage is stored with the key it was computed from: the objects it
+    read (compared by identity, so assigning a new array is noticed) and the
+    settings it depends on, such as the ROI or the calibration constants
+    (compared by value; keys list them first, so a changed setting is found
+    before any object is looked at). Each stage also has a version
+    counter, which is bumped when a stage before it is stored (its inputs
+    have been replaced) or when it is invalidated. A stage is fresh while its
+    key matches and its version is the one it was stored at. Contents are not
+    compared, so an array edited in place (e.g. ``ad.od[0] = 0``) must be
+    followed by ``invalidate`` of the first stage that reads it.
+
+    Parameters
+    ----------
+    order: tuple of str
+        The stage names, upstream first.
+    """
+
+    ORDER = ('crop', 'sums', 'fits', 'atom_number')
+
+    def __init__(self, order=ORDER):
+        self.order = tuple(order)
+        self._keys = {}
+        self._versions = dict.fromkeys(self.order, 0)
+
+    def fresh(self, stage, key):
+        """Returns True if stage was stored with this key and not invalidated
+        since."""
+        stored = self._keys.get(stage)
+        if stored is None or stored[0] != self._versions[stage]:
+            return False
+        return _matches(stored[1], key)
+
+    def store(self, stage, key):
+        """Records that stage was computed from key, and invalidates the
+        stages after it."""
+        after = self._after(stage)
+        if after is not None:
+            self.invalidate(after)
+        self._keys[stage] = (self._versions[stage], _token(key))
+
+    def invalidate(self, stage=None):
+        """Invalidates stage and every stage after it. If stage is None,
+        invalidates all stages."""
+        names = self.order if stage is None else self.order[self.order.index(stage):]
+        for name in names:
+            self._versions[name] += 1
+
+    def __contains__(self, stage):
+        stored = self._keys.get(stage)
+        return stored is not None and stored[0] == self._versions[stage]
+
+    def _after(self, stage):
+        idx = self.order.index(stage) + 1
+        return self.order[idx] if idx < len(self.order) else None
+
+    def __getstate__(self):
+        # Weak references cannot be pickled; a copy starts with no memo.
+        return {'order': self.order, '_keys': {},
+                '_versions': dict.fromkeys(self.order, 0)}
+
+    def __deepcopy__(self, memo):
+        return AnalysisStages(self.order)
@@ -0,0 +1,163 @@
+import threading
+
+import numpy as np
+
+# Plans kept by get_unshuffle_plan, keyed by the sort metadata.
+UNSHUFFLE_PLAN_CACHE_SIZE = 8
+
+_plan_cache = {}
+_plan_cache_lock = threading.Lock()
+
+
+class UnshufflePlan():
+    """
+    The permutations that undo (or redo) the xvar shuffle of a run.
+
+    The inverse permutation for each shuffled xvar length is computed once,
+    when the plan is built. Unshuffling an array then takes one gather: the
+    per-axis permutations of all sortable axes are combined with np.ix_ into
+    a single fancy index, rather than one ``take`` per axis.
+
+    An axis is sorted if its length matches one of the shuffled xvar lengths
+    (sort_N), as in Dealer._unshuffle_ndarray.
+
+    Parameters
+    ----------
+    sort_idx: list of ArrayLike, or 2D ArrayLike
+        The shuffle order of each xvar length, possibly padded with -1s (as
+        stored in the data file).
+    sort_N: ArrayLike
+        The xvar length that each entry of sort_idx shuffles.
+    """
+
+    def __init__(self, sort_idx, sort_N):
+        self.sort_N = [int(n) for n in np.ravel(sort_N)] if np.size(sort_N) else []
+        self._shuf = {}
+        self._unshuf = {}
+        self._slots = {}
+        for n, idx in zip(self.sort_N, list(sort_idx)[:len(self.sort_N)]):
+            if n in self._shuf:
+                continue
+            idx = np.asarray(idx)
+            shuf = idx[idx >= 0].astype(int) # remove padding [-1]s
+            unshuf = np.empty_like(shuf)
+            unshuf[shuf] = np.arange(shuf.shape[0])
+            self._shuf[n] = shuf
+            self._unshuf[n] = unshuf
+
+    def __bool__(self):
+        return bool(self._shuf)
+
+    def index(self, N, reshuffle=False):
+        """Returns the permutation for an axis of length N, or None if that
+        axis is not shuffled."""
+        return (self._shuf if reshuffle else self._unshuf).get(int(N))
+
+    def apply(self, var, exclude_dims=0, reshuffle=False):
+        """
+        Unshuffles (or, if reshuffle, reshuffles) every sortable axis of var
+        in one gather.
+
+        Parameters
+        ----------
+        var: ArrayLike
+            Lists are converted to arrays. Anything else that is not an
+            ndarray is returned unchanged.
+        exclude_dims: int
+            The number of trailing axes not to unshuffle (e.g. 2 for the
+            pixel axes of images).
+        reshuffle: bool
+
+        Returns
+        -------
+        np.ndarray: a new array, or var itself if no axis is shuffled.
+        """
+        if isinstance(var, list):
+            var = np.array(var)
+        if not isinstance(var, np.ndarray) or not self._shuf:
+            return var
+        n_sort = min(max(var.ndim - exclude_dims, 0), var.ndim)
+        idx = [self.index(var.shape[dim], reshuffle) for dim in range(n_sort)]
+        dims = [dim for dim in range(n_sort) if idx[dim] is not None]
+        if not dims:
+            return var
+        if len(dims) == 1:
+            return var.take(idx[dims[0]], axis=dims[0])
+        last = dims[-1] + 1
+        ix = np.ix_(*(np.arange(var.shape[d]) if idx[d] is None else idx[d]
+                      for d in range(last)))
+        return var[ix]
+
+    def shot_order(self, xvardims, reshuffle=False):
+        """Returns, for each shot of the unshuffled (xvar-ordered) run, the
+        index of that shot in the order it was taken."""
+        shots = np.arange(int(np.prod(xvardims))).reshape(tuple(xvardims))
+        return self.apply(shots, reshuffle=reshuffle).ravel()
+
+    def shot_slots(self, xvardims):
+        """Returns, for each shot in the order it was taken, the index of its
+        slot in the unshuffled (xvar-ordered) run. The inverse of shot_order,
+        cached per xvardims so that looking up one shot at a time is cheap."""
+        key = tuple(int(n) for n in np.ravel(xvardims))
+        slots = self._slots.get(key)
+        if slots is None:
+            if self._shuf:
+                slots = self.shot_order(key, reshuffle=True)
+            else:
+                slots = np.arange(int(np.prod(key)))
+            self._slots[key] = slots
+        return slots
+
+    def apply_images(self, ndarray, xvardims, N_pwa_per_shot, reshuffle=False):
+        """
+        Unshuffles a shot-ordered image (or image timestamp) array with
+        N_pwa_per_shot + 2 entries per shot, by moving whole shots.
+
+        Parameters
+        ----------
+        ndarray: np.ndarray
+            Array of shape (N_img,...).
+        xvardims: ArrayLike
+            The length of each xvar.
+        N_pwa_per_shot: int
+        reshuffle: bool
+
+        Returns
+        -------
+        np.ndarray: an array of the same shape, in one gather along axis 0.
+        """
+        if not self._shuf:
+            return ndarray
+        n_per_shot = int(N_pwa_per_shot) + 2
+        src_shot = self.shot_order(xvardims, reshuffle=reshuffle)
+        rows = (src_shot[:, None] * n_per_shot + np.arange(n_per_shot)).ravel()
+        return ndarray.take(rows, axis=0)
+
+
+def _plan_key(sort_idx, sort_N):
+    idx = [np.asarray(s) for s in list(sort_idx)]
+    return (tuple(int(n) for n in np.ravel(sort_N)),
+            tuple((s.dtype.str, s.shape, s.tobytes()) for s in idx))
+
+
+def get_unshuffle_plan(sort_idx, sort_N):
+    """
+    Returns the UnshufflePlan for this sort metadata, reusing a cached plan
+    if one was already built for the same metadata.
+
+    Parameters
+    ----------
+    sort_idx: list of ArrayLike, or 2D ArrayLike
+    sort_N: ArrayLike
+    """
+    if not np.size(sort_N):
+        return UnshufflePlan([], [])
+    key = _plan_key(sort_idx, sort_N)
+    with _plan_cache_lock:
+        plan = _plan_cache.get(key)
+        if plan is None:
+            plan = UnshufflePlan(sort_idx, sort_N)
+            if len(_plan_cache) >= UNSHUFFLE_PLAN_CACHE_SIZE:
+                _plan_cache.pop(next(iter(_plan_cache)))
+            _plan_cache[key] = plan
+    return plan
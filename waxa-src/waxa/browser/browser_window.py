@@ -3203,22 +3203,6 @@ class DataBrowserWindow(QMainWindow):
         "imaging_file",
     ]
 
-    @staticmethod
-    def _decode_attr_text(raw) -> str:
-        if raw is None:
-            return ""
-        # numpy.bytes_ subclasses bytes, so this also covers h5py scalar strings.
-        if isinstance(raw, bytes):
-            return raw.decode("utf-8", errors="replace")
-        if isinstance(raw, str):
-            return raw
-        # numpy 0-d array holding a (byte)string.
-        item = getattr(raw, "item", None)
-        if callable(item) and getattr(raw, "shape", None) == ():
-            scalar = raw.item()
-            return scalar.decode("utf-8", errors="replace") if isinstance(scalar, bytes) else str(scalar)
-        return str(raw)
-
     @staticmethod
     def _expt_file_label(attr_key: str) -> str:
         if attr_key.startswith("base_class_"):
@@ -3243,19 +3227,21 @@ class DataBrowserWindow(QMainWindow):
         submenu = menu.addMenu("View Experiment Files")
         try:
             import h5py
+            from waxa.data.source_store import read_source_texts
             with h5py.File(run.filepath, "r") as f:
-                attr_keys = set(f.attrs.keys())
+                # texts stored as attrs (older runs) or by hash in the source store
+                texts = read_source_texts(f, run.filepath)
                 # expt/params/legacy keys first (in preferred order), then every
                 # remaining base-class module alphabetically.
-                ordered_keys = [k for k in self._EXPT_FILE_ATTR_KEYS if k in attr_keys]
+                ordered_keys = [k for k in self._EXPT_FILE_ATTR_KEYS if k in texts]
                 ordered_keys += sorted(
-                    k for k in attr_keys
+                    k for k in texts
                     if k.startswith("base_class_") and k not in ordered_keys
                 )
 
                 found = False
                 for key in ordered_keys:
-                    text = self._decode_attr_text(f.attrs.get(key))
+                    text = texts[key]
                     if not text.strip():
                         continue
                     label = self._expt_file_label(key)
@@ -1,4 +1,5 @@
 from .data_saver import DataSaver
 from .load_atomdata import load_atomdata
 from .run_info import RunInfo
-from .counter import counter
\ No newline at end of file
+from .counter import counter
+from .source_store import SourceStore, read_source_texts
\ No newline at end of file
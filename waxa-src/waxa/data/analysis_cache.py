@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import time
+
+import h5py
+import numpy as np
+
+# Bump to invalidate every analysis cache, e.g. when the meaning of a cached
+# quantity changes without a change to the analysis source files below.
+ANALYSIS_CACHE_VERSION = 1
+
+# Cached analyses kept per data file (e.g. for different ROIs). The oldest
+# entries are dropped beyond this.
+ANALYSIS_CACHE_MAX_ENTRIES = 4
+
+CACHE_SUFFIX = ".waxa_cache.h5"
+
+# Modules whose source determines the cached results.
+_ANALYSIS_MODULES = (
+    'waxa.image_processing.compute_ODs',
+    'waxa.image_processing.compute_gaussian_cloud_params',
+    'waxa.fitting.batch',
+    'waxa.fitting.fit',
+    'waxa.fitting.gaussian',
+    'waxa.fitting.fit_results',
+    'waxa.roi',
+)
+
+_version_hash = None
+
+
+def analysis_version_hash():
+    """A hash of the analysis code: the source of the OD, ROI and Gaussian
+    fit modules, the fit method and ANALYSIS_CACHE_VERSION. Computed once per
+    session."""
+    global _version_hash
+    if _version_hash is None:
+        import importlib
+        from waxa.image_processing import compute_gaussian_cloud_params as cgcp
+        h = hashlib.sha1()
+        h.update(f"{ANALYSIS_CACHE_VERSION}|{cgcp.GAUSSIAN_FIT_METHOD}".encode())
+        for name in _ANALYSIS_MODULES:
+            module = importlib.import_module(name)
+            with open(module.__file__, 'rb') as f:
+                h.update(f.read())
+        _version_hash = h.hexdigest()
+    return _version_hash
+
+
+def analysis_cache_key(**fields):
+    """Returns the cache key for an analysis described by `fields` (run_id,
+    ROI, lite flag, options, ...), which must be JSON-serializable."""
+    fields = dict(fields, analysis_version=analysis_version_hash())
+    text = json.dumps(fields, sort_keys=True, default=_json_default)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class AnalysisCache():
+    """
+    Sidecar HDF5 store of analysis results for one data file.
+
+    Entries are stored under their key (see analysis_cache_key), so a change
+    to the run, ROI, options or analysis code simply misses the cache.
+
+    Parameters
+    ----------
+    data_filepath: str
+        The run's data file.
+    cache_root: str or None
+        Directory to keep the cache file in. If None, the cache file sits next
+        to the data file.
+    """
+
+    def __init__(self, data_filepath, cache_root=None):
+        stem = os.path.splitext(os.path.basename(data_filepath))[0]
+        folder = os.path.dirname(data_filepath) if cache_root is None else cache_root
+        self.path = os.path.join(folder, stem + CACHE_SUFFIX)
+
+    def load(self, key):
+        """Returns a dict of the arrays cached under key, or None."""
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with h5py.File(self.path, 'r') as f:
+                if key not in f:
+                    return None
+                return {k: v[()] for k, v in f[key].items()}
+        except Exception:
+            return None
+
+    def save(self, key, arrays):
+        """Stores a dict of arrays under key. Returns False (and leaves any
+        existing cache intact) if the cache file cannot be written."""
+        try:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with h5py.File(self.path, 'a') as f:
+                if key in f:
+                    del f[key]
+                g = f.create_group(key)
+                for k, v in arrays.items():
+                    g.create_dataset(k, data=np.asarray(v))
+                g.attrs['created'] = time.time()
+                entries = sorted(f.keys(), key=lambda k: f[k].attrs.get('created', 0.))
+                for old_key in entries[:-ANALYSIS_CACHE_MAX_ENTRIES]:
+                    del f[old_key]
+            return True
+        except Exception as e:
+            print(f"Unable to write analysis cache {self.path}: {e}")
+            return False
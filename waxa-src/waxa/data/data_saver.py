@@ -3,6 +3,11 @@ import os
 import h5py
 
 from waxa.data.server_talk import server_talk as st
+from waxa.data import image_layout
+from waxa.data.scope_storage import write_scope_data, write_scope_shot
+from waxa.data.source_store import (SourceCapture, SOURCES_GROUP, get_source_store,
+                                    hash_source_text)
+from waxa.profiling import profiler
 
 # __DEFAULT_KEY = "no_one_will_ever_use_this_key000111"
 
@@ -29,6 +34,12 @@ class DataSaver():
             server_talk = server_talk
         self.server_talk = server_talk
 
+        # storage layout of the images dataset, see waxa.data.image_layout
+        self.image_chunking = image_layout.IMAGE_CHUNKING
+        self.image_compression = image_layout.IMAGE_COMPRESSION
+
+        self._source_capture = SourceCapture()
+
     def save_data(self,expt:DummyExpt,expt_filepath="",data_object=None):
 
         # from wax.base.sub.dealer import Dealer
@@ -110,7 +121,9 @@ class DataSaver():
         f.attrs['camera_ready_ack'] = 0
         
         f.attrs['xvarnames'] = expt.xvarnames
-        data.create_dataset('images',data=expt.images)
+        # each shot takes N_pwa_per_shot atoms images, a light and a dark image
+        self.create_images_dataset(data, data=expt.images,
+                                   frames_per_shot=getattr(expt.params,'N_pwa_per_shot',1)+2)
         data.create_dataset('image_timestamps',data=expt.image_timestamps)
         for key in expt.data.keys:
             this_data = vars(expt.data)[key]._run_data
@@ -138,6 +151,22 @@ class DataSaver():
 
         return fpath
         
+    def create_images_dataset(self, group, data=None, shape=None, dtype=None,
+                              frames_per_shot=1, name='images'):
+        """Create the images dataset in *group* with this saver's layout.
+
+        Either *data* or *shape* and *dtype* must be given. The layout is set
+        by ``self.image_chunking`` and ``self.image_compression``, which
+        default to ``waxa.data.image_layout.IMAGE_CHUNKING`` and
+        ``IMAGE_COMPRESSION``.
+        """
+        return image_layout.create_image_dataset(
+            group, name, data=data, shape=shape, dtype=dtype,
+            chunking=self.image_chunking,
+            compression=self.image_compression,
+            frames_per_shot=frames_per_shot,
+        )
+
     def _save_data_vault(self,
                          h5File:h5py.File,
                          expt:DummyExpt):
@@ -172,17 +201,9 @@ class DataSaver():
                 # Npts = points per scan
                 if expt.sort_idx:
                     data = expt._unshuffle_ndarray(data,exclude_dims=3)
-                data = data.astype(np.float32)
-                this_scope_data = scope_data.create_group(scope.label)
-                # time/voltage axis always -2, take the first one for each capture
-                # only take one time axis for all the channels on a given shot
-                # resulting shape: (n0,...,nN,Npts)
-                t = np.take(np.take(data,0,axis=-2),0,axis=-2)
-                # take the voltage values
-                # resulting shape: (n0,...,nN,Nch,Npts)
-                v = np.take(data,1,-2)
-                this_scope_data.create_dataset('t', data=t, compression='gzip', compression_opts=4)
-                this_scope_data.create_dataset('v', data=v, compression='gzip', compression_opts=4)
+                # stored as ADC codes + gain/offset and an implicit time axis
+                # where possible, see waxa.data.scope_storage
+                write_scope_data(scope_data, scope.label, data)
 
     def _save_expt_files_text(self,
                               h5File:h5py.File,
@@ -190,11 +211,19 @@ class DataSaver():
         
         self._check_for_expt_files()
 
-        f = h5File
-        f.attrs["expt_file"] = self._read_text_file_safe(expt_filepath, "experiment") if expt_filepath else ""
-        f.attrs["params_file"] = self._read_text_file_safe(self._expt_params_path, "params")
-        
-        # Save all .py files from the base class directory
+        hashes, texts = self.capture_sources(expt_filepath)
+        self._save_source_hashes(h5File, hashes, texts)
+
+    def source_filepaths(self, expt_filepath=""):
+        """Return the source files saved with a run, as a dict of attr key
+        (``expt_file``, ``params_file``, ``base_class_<module>``) -> path."""
+        filepaths = {}
+        if expt_filepath:
+            filepaths["expt_file"] = expt_filepath
+        if self._expt_params_path and os.path.isfile(self._expt_params_path):
+            filepaths["params_file"] = self._expt_params_path
+
+        # all .py files from the base class directory
         if self._base_class_dir and os.path.isdir(self._base_class_dir):
             try:
                 filenames = sorted(os.listdir(self._base_class_dir))
@@ -207,7 +236,50 @@ class DataSaver():
                     filepath = os.path.join(self._base_class_dir, filename)
                     if os.path.isfile(filepath):
                         key = f"base_class_{filename[:-3]}"  # remove .py extension
-                        f.attrs[key] = self._read_text_file_safe(filepath, filename)
+                        filepaths[key] = filepath
+        return filepaths
+
+    def capture_sources(self, expt_filepath=""):
+        """Hash the source files of a run (see ``source_filepaths``).
+
+        Files are only re-read if they changed since they were last captured
+        on this machine (``waxa.data.source_store.SourceCapture``), or if the
+        source store of the data root does not hold their text (e.g. a
+        previous run was never saved, or the data root changed).
+
+        Returns
+        -------
+        hashes: dict
+            attr key -> hash.
+        texts: dict
+            hash -> text, for the versions the source store is missing.
+        """
+        filepaths = self.source_filepaths(expt_filepath)
+        hashes, texts = self._source_capture.capture(filepaths, self._read_text_file_safe)
+        store = get_source_store(self._data_dir)
+        for key, source_hash in hashes.items():
+            if source_hash in texts or source_hash in store:
+                continue
+            text = self._read_text_file_safe(filepaths[key], key)
+            # the file may have changed without its mtime/size changing
+            source_hash = hashes[key] = hash_source_text(text)
+            texts[source_hash] = text
+        return hashes, texts
+
+    def _save_source_hashes(self, f: "h5py.File", hashes: dict, texts: dict) -> None:
+        """Store new source texts in the data root's source store and write
+        the hashes to the run file's ``sources`` group."""
+        store = get_source_store(self._data_dir)
+        for source_hash, text in texts.items():
+            try:
+                store.put(text, source_hash)
+            except Exception as exc:
+                print(f"[DataSaver] Failed to store source {source_hash}: {exc}")
+        grp = f.require_group(SOURCES_GROUP)
+        for key, source_hash in hashes.items():
+            if source_hash not in store:
+                print(f"[DataSaver] WARNING: source '{key}' ({source_hash}) is not in the source store at {store.store_dir}.")
+            grp.attrs[key] = source_hash
 
     def _check_for_expt_files(self):
         if not os.path.isfile(self._expt_params_path):
@@ -395,12 +467,13 @@ class DataSaver():
         f.attrs["xvarnames"] = list(payload.get("xvarnames", []))
         f.attrs["run_complete"] = False
 
-        # Images pre-allocation is intentionally deferred to SaveWorker.
+        # Images pre-allocation is intentionally deferred to write_shot_images.
         # Pre-allocating a large dataset here (e.g. 300 × 1024 × 1024 × 2 B ≈ 600 MB on a NAS)
         # was the primary cause of DataHandler's wait_for_data_available timeout: the background
         # thread held the file open for many seconds while DataHandler timed out waiting for the
-        # 'data' group to appear.  SaveWorker now creates the images/image_timestamps datasets
-        # lazily on its first write, after the file is already usable.
+        # 'data' group to appear.  write_shot_images creates the images/image_timestamps
+        # datasets (with the chunked layout of create_images_dataset) on the first shot, after
+        # the file is already usable, and writes each shot into its final (unshuffled) slot.
         # Store shape/dtype as HDF5 attributes so the lazy path can use them if needed.
         if capture_images:
             images_shape = tuple(payload.get("images_shape", (0,)))
@@ -453,6 +526,105 @@ class DataSaver():
         f.close()
         return fpath
 
+    def write_shot_images(self, f: "h5py.File", payload: dict, shot_idx: int,
+                          images, timestamps=None) -> None:
+        """Write the images of one shot straight into their final slot.
+
+        The shot's slot in the unshuffled (xvar-ordered) run is looked up from
+        the sort metadata of the INIT_RUN *payload*, so the images dataset is
+        never written in acquisition order and ``save_data_from_payload`` does
+        not have to read it back and unshuffle it at the end of the run.
+
+        The ``images`` / ``image_timestamps`` datasets are created on the
+        first call, from ``images_shape`` / ``images_dtype`` /
+        ``image_timestamps_shape`` in the payload, and the file is marked with
+        ``f.attrs['images_unshuffled'] = True``.
+
+        Parameters
+        ----------
+        f:
+            The run's HDF5 file, open for writing.
+        payload:
+            The INIT_RUN payload of the run.
+        shot_idx:
+            The index of the shot in the order it was taken (including
+            repeats).
+        images:
+            Array of shape (N_pwa_per_shot + 2, py, px): the atoms images,
+            then the light and dark images of the shot.
+        timestamps:
+            Optional array of the N_pwa_per_shot + 2 image timestamps.
+        """
+        data_grp = f["data"]
+        n_per_shot = int(payload.get("N_pwa_per_shot", 1)) + 2
+        if "images" not in data_grp:
+            self.create_images_dataset(
+                data_grp,
+                shape=tuple(payload["images_shape"]),
+                dtype=np.dtype(payload.get("images_dtype", "uint16")),
+                frames_per_shot=n_per_shot,
+            )
+            ts_shape = tuple(payload.get("image_timestamps_shape", (0,)))
+            if ts_shape == (0,):
+                ts_shape = (int(payload["images_shape"][0]),)
+            data_grp.create_dataset("image_timestamps", shape=ts_shape, dtype=np.float64)
+            f.attrs["images_unshuffled"] = True
+
+        slot = self._shot_slot(payload, shot_idx)
+        rows = slice(slot * n_per_shot, (slot + 1) * n_per_shot)
+        data_grp["images"][rows] = images
+        if timestamps is not None:
+            data_grp["image_timestamps"][rows] = timestamps
+
+    def append_shot_data_from_payload(self, f: "h5py.File", payload: dict,
+                                      shot_payload: dict) -> None:
+        """Write the DataVault values and scope traces of one shot.
+
+        Called for each SHOT_DATA message that an experiment streams while
+        the scan runs (see ``Expt._serialize_shot_payload``), so that every
+        completed shot is on disk even if the run crashes, and END_RUN does
+        not have to carry the run's data. Values are written straight into
+        their unshuffled (xvar-ordered) position, like ``write_shot_images``,
+        and the file is marked with ``f.attrs['shot_data_streamed'] = True``.
+
+        Parameters
+        ----------
+        f:
+            The run's HDF5 file, open for writing.
+        payload:
+            The INIT_RUN payload of the run.
+        shot_payload:
+            ``shot_idx`` (acquisition order), ``xvar_idx`` (the index of each
+            xvar value in its shuffled values array), ``datavault`` (key ->
+            per-shot data) and ``scope_data`` (list of ``{'label', 'data'}``
+            with data of shape (Nch, 2, Npts)).
+        """
+        data_grp = f["data"]
+        xvardims = [int(n) for n in payload.get("xvardims", [])]
+        idx = self._unshuffled_xvar_idx(payload, shot_payload.get("xvar_idx", []))
+
+        for key, shot_data in shot_payload.get("datavault", {}).items():
+            if key not in data_grp:
+                continue
+            try:
+                data_grp[key][idx] = shot_data
+            except Exception as exc:
+                print(f"[DataSaver] Failed to write shot data for '{key}': {exc}")
+
+        scope_list = shot_payload.get("scope_data", [])
+        if scope_list:
+            scope_data_grp = data_grp.require_group("scope_data")
+            for scope_info in scope_list:
+                label = str(scope_info["label"])
+                trace = np.asarray(scope_info["data"])
+                if trace.ndim != 3 or trace.size == 0:
+                    print(f"[DataSaver] WARNING: skipping scope '{label}' — shot trace has unexpected shape {trace.shape}")
+                    continue
+                write_scope_shot(scope_data_grp, label, xvardims, idx, trace)
+
+        f.attrs["shot_data_streamed"] = True
+        f.attrs["shots_streamed"] = int(f.attrs.get("shots_streamed", 0)) + 1
+
     def save_data_from_payload(self, payload: dict, filepath: str, shot_timestamps=None):
         """Write final experiment data to an existing HDF5 file.
 
@@ -475,24 +647,44 @@ class DataSaver():
 
         # filepath is absolute; do not os.chdir (process-global, races with the
         # file-creation background thread).
-        with h5py.File(filepath, "r+") as f:
+        with profiler.span('save_data_from_payload'), h5py.File(filepath, "r+") as f:
             # --- unshuffle images if the run was shuffled ---
-            if capture_images and sort_idx_raw:
+            # Images written by write_shot_images are already in their
+            # unshuffled slots, so there is nothing to read back.
+            images_unshuffled = bool(f.attrs.get("images_unshuffled", False))
+            if capture_images and sort_idx_raw and not images_unshuffled:
                 if "images" in f["data"] and f["data"]["images"].size > 0:
-                    images = f["data"]["images"][()]
-                    timestamps = f["data"]["image_timestamps"][()]
-                    images_ush, timestamps_ush = self._unshuffle_images_from_payload(
-                        images, timestamps, payload
-                    )
-                    f["data"]["images"][...] = images_ush
-                    f["data"]["image_timestamps"][...] = timestamps_ush
+                    with profiler.span('unshuffle_images'):
+                        images = f["data"]["images"][()]
+                        timestamps = f["data"]["image_timestamps"][()]
+                        images_ush, timestamps_ush = self._unshuffle_images_from_payload(
+                            images, timestamps, payload
+                        )
+                        f["data"]["images"][...] = images_ush
+                        f["data"]["image_timestamps"][...] = timestamps_ush
+                        profiler.count('bytes_written', images_ush.nbytes)
 
             # --- DataVault ---
+            # In streamed runs (append_shot_data_from_payload) the per-shot
+            # values are already on disk, unshuffled; only external keys
+            # (written by DataHandler) are still in acquisition order. If a
+            # push was not acknowledged, the payload carries the shots from
+            # that one on ("unstreamed_shots"), which are written the same
+            # way. If no push was, it holds the full data, which replaces
+            # whatever was streamed.
+            shot_data_streamed = bool(payload.get(
+                "shot_data_streamed", f.attrs.get("shot_data_streamed", False)))
+            f.attrs["shot_data_streamed"] = shot_data_streamed
+            if shot_data_streamed:
+                for shot_payload in payload.get("unstreamed_shots", []):
+                    self.append_shot_data_from_payload(f, payload, shot_payload)
             n_xvars = len(payload.get("xvardims", []))
             for key, dc_info in payload.get("datavault", {}).items():
+                is_external = bool(dc_info["external"])
+                if shot_data_streamed and not is_external:
+                    continue
                 this_data = np.asarray(dc_info["data"])
                 data_gotten = bool(dc_info["data_gotten"])
-                is_external = bool(dc_info["external"])
 
                 if is_external:
                     # Data was written directly to HDF5 by DataHandler
@@ -549,10 +741,16 @@ class DataSaver():
                         pass
 
             # --- source file texts ---
-            f.attrs["expt_file"] = payload.get("expt_file_text", "")
-            f.attrs["params_file"] = payload.get("params_file_text", "")
-            for key, text in payload.get("base_class_texts", {}).items():
-                f.attrs[key] = text
+            # Newer clients send hashes, plus the texts of new versions only,
+            # which go to the data root's source store.
+            if "source_hashes" in payload:
+                self._save_source_hashes(f, payload["source_hashes"],
+                                         payload.get("source_texts", {}))
+            else:
+                f.attrs["expt_file"] = payload.get("expt_file_text", "")
+                f.attrs["params_file"] = payload.get("params_file_text", "")
+                for key, text in payload.get("base_class_texts", {}).items():
+                    f.attrs[key] = text
 
             # --- shot timestamps (server-side, one per shot) ---
             if shot_timestamps:
@@ -592,6 +790,35 @@ class DataSaver():
             except Exception:
                 pass
 
+    @staticmethod
+    def _shot_slot(payload: dict, shot_idx: int) -> int:
+        """Return the slot of shot *shot_idx* (in acquisition order) in the
+        unshuffled run, from the sort metadata in *payload*."""
+        sort_idx_raw = payload.get("sort_idx", [])
+        if not sort_idx_raw:
+            return int(shot_idx)
+        from waxa.base.unshuffle import get_unshuffle_plan
+        plan = get_unshuffle_plan(sort_idx_raw, payload.get("sort_N", []))
+        xvardims = list(payload.get("xvardims", [payload["N_shots_with_repeats"]]))
+        return int(plan.shot_slots(xvardims)[int(shot_idx)])
+
+    @staticmethod
+    def _unshuffled_xvar_idx(payload: dict, xvar_idx) -> tuple:
+        """Map the index of a shot along each xvar (into the shuffled values
+        arrays) to its index in the unshuffled run."""
+        xvar_idx = [int(i) for i in xvar_idx]
+        sort_idx_raw = payload.get("sort_idx", [])
+        if not sort_idx_raw:
+            return tuple(xvar_idx)
+        from waxa.base.unshuffle import get_unshuffle_plan
+        plan = get_unshuffle_plan(sort_idx_raw, payload.get("sort_N", []))
+        xvardims = [int(n) for n in payload.get("xvardims", [])]
+        out = []
+        for i, n in zip(xvar_idx, xvardims):
+            perm = plan.index(n, reshuffle=True)
+            out.append(i if perm is None else int(perm[i]))
+        return tuple(out)
+
     @staticmethod
     def _unshuffle_single_array(
         arr: np.ndarray,
@@ -601,26 +828,14 @@ class DataSaver():
     ) -> np.ndarray:
         """Unshuffle a single ndarray using sort metadata lists.
 
-        Replicates the core logic of ``Dealer._unshuffle_ndarray`` as a
-        standalone function so the server does not need a live ``Dealer``
-        instance.
+        Uses the same cached ``UnshufflePlan`` as ``Dealer._unshuffle_ndarray``
+        so the server does not need a live ``Dealer`` instance.
         """
         if not isinstance(arr, np.ndarray) or not sort_idx_raw:
             return arr
-        sort_idx = [np.array(s) for s in sort_idx_raw]
-        sort_N = [int(n) for n in sort_N_raw]
-        ndims = arr.ndim
-        last_dim = max(0, ndims - exclude_dims)
-        for dim in range(last_dim):
-            N = arr.shape[dim]
-            if N in sort_N:
-                i = sort_N.index(N)
-                shuf = sort_idx[i].copy()
-                shuf = shuf[shuf >= 0].astype(int)
-                unshuf = np.zeros_like(shuf)
-                unshuf[shuf] = np.arange(len(shuf))
-                arr = arr.take(unshuf, axis=dim)
-        return arr
+        from waxa.base.unshuffle import get_unshuffle_plan
+        plan = get_unshuffle_plan(sort_idx_raw, sort_N_raw)
+        return plan.apply(arr, exclude_dims=exclude_dims)
 
     @staticmethod
     def _unshuffle_images_from_payload(
@@ -630,79 +845,22 @@ class DataSaver():
     ):
         """Unshuffle images and timestamps acquired in shuffled xvar order.
 
-        Mirrors the logic of ``Dealer.unscramble_images`` /
-        ``_unscramble_timestamps`` using only the metadata in *payload*.
+        Uses the same plan as ``Dealer.unscramble_images`` /
+        ``_unscramble_timestamps``, built from the metadata in *payload*.
         """
         sort_idx_raw = payload.get("sort_idx", [])
         sort_N_raw = payload.get("sort_N", [])
         if not sort_idx_raw:
             return images, image_timestamps
 
-        sort_idx = [np.array(s) for s in sort_idx_raw]
-        sort_N = [int(n) for n in sort_N_raw]
+        from waxa.base.unshuffle import get_unshuffle_plan
+        plan = get_unshuffle_plan(sort_idx_raw, sort_N_raw)
         N_shots = int(payload["N_shots_with_repeats"])
         Nps = int(payload["N_pwa_per_shot"])
         xvardims = list(payload.get("xvardims", [N_shots]))
 
-        def _unshuffle(arr, exclude_dims=0):
-            ndims = arr.ndim
-            last_dim = max(0, ndims - exclude_dims)
-            for dim in range(last_dim):
-                N = arr.shape[dim]
-                if N in sort_N:
-                    i = sort_N.index(N)
-                    shuf = sort_idx[i].copy()
-                    shuf = shuf[shuf >= 0].astype(int)
-                    unshuf = np.zeros_like(shuf)
-                    unshuf[shuf] = np.arange(len(shuf))
-                    arr = arr.take(unshuf, axis=dim)
-            return arr
-
-        img_shape = images.shape[1:]   # (H, W)
-        N_img = images.shape[0]        # = N_shots * (Nps + 2)
-
-        # Split into pwa / pwoa / dark  →  shape (N_shots, Nps+2, H, W)
-        imgs_4d = images.reshape(N_shots, Nps + 2, *img_shape)
-        pwa  = imgs_4d[:, 0:Nps]
-        pwoa = np.expand_dims(imgs_4d[:, Nps],     1).repeat(Nps, axis=1)
-        dark = np.expand_dims(imgs_4d[:, Nps + 1], 1).repeat(Nps, axis=1)
-
-        # Reshape to (*xvardims, Nps, H, W) then unshuffle xvar axes
-        pwa  = _unshuffle(pwa.reshape(*xvardims,  Nps, *img_shape), exclude_dims=3)
-        pwoa = _unshuffle(pwoa.reshape(*xvardims, Nps, *img_shape), exclude_dims=3)
-        dark = _unshuffle(dark.reshape(*xvardims, Nps, *img_shape), exclude_dims=3)
-
-        # Stack back to (N_img, H, W)
-        pwa  = pwa.reshape(N_shots,  Nps, *img_shape)
-        pwoa = pwoa.reshape(N_shots, Nps, *img_shape)
-        dark = dark.reshape(N_shots, Nps, *img_shape)
-        out  = np.empty((N_img,) + img_shape, dtype=images.dtype)
-        for shot_i in range(N_shots):
-            base = shot_i * (Nps + 2)
-            out[base : base + Nps] = pwa[shot_i]
-            out[base + Nps]        = pwoa[shot_i, 0]
-            out[base + Nps + 1]    = dark[shot_i, 0]
-
-        # Timestamps  (shape: N_img → scalars per image)
-        ts_4d  = image_timestamps.reshape(N_shots, Nps + 2)
-        ts_pwa  = _unshuffle(ts_4d[:, 0:Nps].reshape(*xvardims, Nps))
-        ts_pwoa = _unshuffle(
-            np.expand_dims(ts_4d[:, Nps], 1).repeat(Nps, axis=1).reshape(*xvardims, Nps)
-        )
-        ts_dark = _unshuffle(
-            np.expand_dims(ts_4d[:, Nps + 1], 1).repeat(Nps, axis=1).reshape(*xvardims, Nps)
-        )
-
-        ts_pwa  = ts_pwa.reshape(N_shots,  Nps)
-        ts_pwoa = ts_pwoa.reshape(N_shots, Nps)
-        ts_dark = ts_dark.reshape(N_shots, Nps)
-        ts_out  = np.empty(N_img, dtype=image_timestamps.dtype)
-        for shot_i in range(N_shots):
-            base = shot_i * (Nps + 2)
-            ts_out[base : base + Nps] = ts_pwa[shot_i]
-            ts_out[base + Nps]        = ts_pwoa[shot_i, 0]
-            ts_out[base + Nps + 1]    = ts_dark[shot_i, 0]
-
+        out = plan.apply_images(images, xvardims, Nps)
+        ts_out = plan.apply_images(image_timestamps, xvardims, Nps)
         return out, ts_out
 
     def _save_scope_data_from_payload(
@@ -715,20 +873,19 @@ class DataSaver():
         """Save scope data from END_RUN payload into an open HDF5 file."""
         if not payload.get("scope_data_taken", False):
             return
-        scope_data_grp = f["data"].create_group("scope_data")
+        # streamed runs already have their traces (and send none at END_RUN)
+        scope_data_grp = f["data"].require_group("scope_data")
         for scope_info in payload.get("scope_data", []):
             label = str(scope_info["label"])
             data = np.asarray(scope_info["data"])
             if data.ndim < 3 or data.size == 0:
                 print(f"[DataSaver] WARNING: skipping scope '{label}' — data has unexpected shape {data.shape}")
                 continue
+            # the traces of a run whose streaming failed part way
+            if label in scope_data_grp:
+                del scope_data_grp[label]
             if sort_idx_raw:
                 data = self._unshuffle_single_array(
                     data, sort_idx_raw, sort_N_raw, exclude_dims=3
                 )
-            data = data.astype(np.float32)
-            this_scope = scope_data_grp.create_group(label)
-            t = np.take(np.take(data, 0, axis=-2), 0, axis=-2)
-            v = np.take(data, 1, axis=-2)
-            this_scope.create_dataset("t", data=t, compression='gzip', compression_opts=4)
-            this_scope.create_dataset("v", data=v, compression='gzip', compression_opts=4)
\ No newline at end of file
+            write_scope_data(scope_data_grp, label, data)
\ No newline at end of file
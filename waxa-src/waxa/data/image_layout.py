@@ -0,0 +1,103 @@
+import numpy as np
+
+# Storage layout of the data/images dataset in new run files.
+#
+# IMAGE_CHUNKING: 'frame' stores each image as one chunk (1, py, px), 'shot'
+# stores the images of a shot as one chunk (N_pwa_per_shot + 2, py, px), and
+# None writes a contiguous dataset (the layout of older run files).
+#
+# Images are written one frame at a time as they come off the camera, and read
+# whole (atomdata._load_data) or as the same ROI window of every frame
+# (LazyImages.read, the lite-copy builders), so with a frame or shot per chunk
+# neither path touches the pixels of other images.
+IMAGE_CHUNKING = 'frame'
+
+# IMAGE_COMPRESSION: None, 'gzip' (deflate level 1), 'lzf', or
+# 'shuffle_gzip' (byte shuffle + deflate level 1). All are lossless and need a
+# chunked layout. 'shuffle_gzip' roughly halves the size of camera frames, at
+# the cost of ~10x slower writes and full reads (see
+# benchmarks/bench_hdf5_layout.py); 'lzf' is faster but compresses less and is
+# only readable through h5py. Off by default so that loading is not slowed.
+IMAGE_COMPRESSION = None
+
+_COMPRESSION_OPTIONS = {
+    None: {},
+    'gzip': dict(compression='gzip', compression_opts=1),
+    'lzf': dict(compression='lzf'),
+    'shuffle_gzip': dict(compression='gzip', compression_opts=1, shuffle=True),
+}
+
+def image_chunks(shape, chunking=IMAGE_CHUNKING, frames_per_shot=1):
+    """Returns the chunk shape for an images dataset of the given shape.
+
+    Parameters
+    ----------
+    shape: tuple of int
+        The (N_img, py, px) shape of the dataset.
+    chunking: str or None
+        'frame', 'shot', or None (contiguous, returns None).
+    frames_per_shot: int
+        The number of images per shot, used for 'shot' chunking.
+
+    Returns
+    -------
+    tuple of int or None
+    """
+    shape = tuple(int(n) for n in shape)
+    if chunking is None or len(shape) < 3 or 0 in shape:
+        return None
+    if chunking == 'frame':
+        n = 1
+    elif chunking == 'shot':
+        n = max(1, min(int(frames_per_shot), shape[0]))
+    else:
+        raise ValueError(f"Unknown image chunking '{chunking}'. Use 'frame', 'shot' or None.")
+    return (n,) + shape[1:]
+
+def image_dataset_options(shape, chunking=IMAGE_CHUNKING,
+                          compression=IMAGE_COMPRESSION, frames_per_shot=1):
+    """Returns the keyword arguments for ``h5py.Group.create_dataset`` that
+    give an images dataset of the given shape the requested layout.
+
+    Compression requires a chunked dataset, so it is ignored if the layout is
+    contiguous (or the dataset is empty).
+    """
+    if compression not in _COMPRESSION_OPTIONS:
+        raise ValueError(f"Unknown image compression '{compression}'. "
+                         f"Use one of {list(_COMPRESSION_OPTIONS)}.")
+    chunks = image_chunks(shape, chunking, frames_per_shot)
+    if chunks is None:
+        return {}
+    options = dict(chunks=chunks)
+    options.update(_COMPRESSION_OPTIONS[compression])
+    return options
+
+def create_image_dataset(group, name, data=None, shape=None, dtype=None,
+                         chunking=IMAGE_CHUNKING, compression=IMAGE_COMPRESSION,
+                         frames_per_shot=1):
+    """Creates an images dataset in ``group`` with the configured layout.
+
+    Parameters
+    ----------
+    group: h5py.Group
+    name: str
+    data: ArrayLike or None
+        The images to write. If None, ``shape`` and ``dtype`` give an empty
+        (pre-allocated) dataset to be filled later.
+    shape: tuple of int or None
+    dtype: dtype or None
+    chunking, compression: see IMAGE_CHUNKING and IMAGE_COMPRESSION.
+    frames_per_shot: int
+        The number of images per shot, used for 'shot' chunking.
+
+    Returns
+    -------
+    h5py.Dataset
+    """
+    if data is not None:
+        data = np.asarray(data)
+        shape = data.shape
+    options = image_dataset_options(shape, chunking, compression, frames_per_shot)
+    if data is not None:
+        return group.create_dataset(name, data=data, **options)
+    return group.create_dataset(name, shape=tuple(shape), dtype=dtype, **options)
@@ -0,0 +1,82 @@
+import numpy as np
+import h5py
+
+
+class LazyImages():
+    '''
+    Read-on-demand stand-in for the ``data/images`` dataset of a run file.
+
+    Holds only the file path and the dataset shape/dtype. Pixels are read
+    from disk when indexed, and ``read`` restricts the read to a window of
+    rows and columns and, optionally, to a subset of images, so that only the
+    pixels that are analyzed ever leave the disk.
+
+    Anything that needs a real array can still call ``np.asarray`` on this
+    object, which reads the full dataset.
+    '''
+
+    def __init__(self, filepath, group_key='data', dataset_key='images'):
+        self.filepath = filepath
+        self.group_key = group_key
+        self.dataset_key = dataset_key
+        with h5py.File(filepath, 'r') as f:
+            dataset = f[group_key][dataset_key]
+            self.shape = tuple(dataset.shape)
+            self.dtype = dataset.dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"LazyImages(shape={self.shape}, dtype={self.dtype}, file='{self.filepath}')"
+
+    def __getitem__(self, key):
+        with h5py.File(self.filepath, 'r') as f:
+            return f[self.group_key][self.dataset_key][key]
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.read()
+        if dtype is not None:
+            arr = arr.astype(dtype, copy=False)
+        return arr
+
+    def read(self, rows=None, cols=None, idx=None):
+        '''
+        Reads a block of images from disk.
+
+        Parameters
+        ----------
+        rows: None or (int, int)
+            The [start, stop) row range to read. If None, reads all rows.
+        cols: None or (int, int)
+            The [start, stop) column range to read. If None, reads all columns.
+        idx: None or array of int
+            The indices (along the image axis) of the images to read, in the
+            order they should be returned. If None, reads all images.
+
+        Returns
+        -------
+        np.ndarray: array of shape (len(idx), n_rows, n_cols).
+        '''
+        row_slice = slice(None) if rows is None else slice(int(rows[0]), int(rows[1]))
+        col_slice = slice(None) if cols is None else slice(int(cols[0]), int(cols[1]))
+
+        with h5py.File(self.filepath, 'r') as f:
+            dataset = f[self.group_key][self.dataset_key]
+            if idx is None:
+                return dataset[:, row_slice, col_slice]
+
+            # h5py point selections must be strictly increasing: read each
+            # requested image once, in sorted order, then restore the order.
+            idx = np.asarray(idx, dtype=np.int64).ravel()
+            unique_idx, inverse = np.unique(idx, return_inverse=True)
+            block = dataset[unique_idx.tolist(), row_slice, col_slice]
+            return block[inverse]
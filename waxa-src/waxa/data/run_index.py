@@ -0,0 +1,348 @@
+import bisect
+import json
+import os
+import re
+import threading
+
+import h5py
+import numpy as np
+
+DATE_DIR_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _decode_str_list(raw):
+    if raw is None:
+        return []
+    if isinstance(raw, np.ndarray):
+        values = raw.tolist()
+    elif isinstance(raw, (list, tuple)):
+        values = list(raw)
+    else:
+        values = [raw]
+    return [str(v.decode('utf-8', errors='replace') if isinstance(v, (bytes, np.bytes_)) else v)
+            for v in values]
+
+
+def read_run_status(filepath):
+    """Open an HDF5 run file and report whether it is complete.
+
+    Parameters
+    ----------
+    filepath: str
+
+    Returns
+    -------
+    bool: True if the run finished writing.
+    list of str: the xvarnames of the run.
+    list of int: the length of each xvar (empty if not yet written).
+    """
+    try:
+        with h5py.File(filepath, 'r') as f:
+            xvarnames = [n for n in _decode_str_list(f.attrs.get('xvarnames')) if n.strip()]
+            xvardims = []
+            if 'params' in f:
+                for name in xvarnames:
+                    if name in f['params']:
+                        shape = f['params'][name].shape
+                        if len(shape):
+                            xvardims.append(int(shape[0]))
+
+            # Fast path: explicit completion marker (present in new files).
+            # True  → fully written; False → still being written by server.
+            # None  → old file without the attr; fall through to xvar check.
+            # h5py returns the attr as np.bool_, so compare by type, not identity.
+            rc = f.attrs.get('run_complete', None)
+            if isinstance(rc, (bool, np.bool_)):
+                return bool(rc), xvarnames, xvardims
+
+            if not xvarnames:
+                return True, xvarnames, xvardims
+            if 'params' not in f:
+                return False, xvarnames, xvardims
+            for name in xvarnames:
+                if name not in f['params']:
+                    return False, xvarnames, xvardims
+                if np.asarray(f['params'][name][()]).ndim == 0:
+                    return False, xvarnames, xvardims
+            return True, xvarnames, xvardims
+    except Exception:
+        return False, [], []
+
+
+class RunIndex:
+    """
+    Persistent run_id -> data file index for one data root (regular or lite).
+
+    The index is stored as JSON at the top of the data root. Each date folder
+    is recorded with its directory mtime, so a refresh only rescans folders
+    that gained or lost files since the last refresh. Completion status is
+    cached per file once a run is seen complete; incomplete runs are
+    re-checked only when the file's mtime or size changes.
+
+    Lookups by run_id are a bisect on a sorted run_id list.
+    """
+    VERSION = 1
+    FILENAME = ".waxa_run_index.json"
+
+    def __init__(self, data_root):
+        self.data_root = data_root
+        self.index_path = os.path.join(data_root, self.FILENAME) if data_root else ""
+        self._dirs = {}
+        self._run_ids = []
+        self._entries = []
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load()
+        self._rebuild()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except Exception:
+            return
+        if payload.get("version") != self.VERSION:
+            return
+        dirs = payload.get("dirs", {})
+        if isinstance(dirs, dict):
+            self._dirs = dirs
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or not self.index_path:
+                return
+            payload = {
+                "version": self.VERSION,
+                "dirs": self._dirs,
+            }
+            # Write to a temporary file and swap it in so that concurrent
+            # readers never see a partially written index. The temporary name
+            # is unique per thread, as each loader thread may hold its own
+            # RunIndex of the same data root.
+            tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    json.dump(payload, handle)
+                os.replace(tmp_path, self.index_path)
+            except Exception as e:
+                print(f"Unable to save the run index at {self.index_path}: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            self._dirty = False
+
+    # ------------------------------------------------------------------
+    # refresh
+    # ------------------------------------------------------------------
+
+    def refresh(self, force=False):
+        """Bring the index up to date with the data root.
+
+        Lists the data root once and compares each date folder's mtime to the
+        stored value. Only changed or new folders are rescanned.
+
+        Parameters
+        ----------
+        force: bool
+            If True, rescan every date folder regardless of mtime.
+        """
+        if not self.data_root or not os.path.isdir(self.data_root):
+            return
+        with self._lock:
+            seen = set()
+            changed = False
+            try:
+                dir_entries = list(os.scandir(self.data_root))
+            except OSError:
+                return
+            for dir_entry in dir_entries:
+                if not DATE_DIR_PATTERN.match(dir_entry.name):
+                    continue
+                try:
+                    if not dir_entry.is_dir():
+                        continue
+                    mtime_ns = dir_entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(dir_entry.name)
+                old = self._dirs.get(dir_entry.name)
+                if not force and old is not None and old.get("mtime_ns") == mtime_ns:
+                    continue
+                self._dirs[dir_entry.name] = {
+                    "mtime_ns": mtime_ns,
+                    "files": self._scan_date_dir(dir_entry.path, old),
+                }
+                changed = True
+            for date_str in list(self._dirs.keys()):
+                if date_str not in seen:
+                    del self._dirs[date_str]
+                    changed = True
+            if changed:
+                self._dirty = True
+                self._rebuild()
+            self.save()
+
+    def _scan_date_dir(self, date_dir_path, old=None):
+        old_files = old.get("files", {}) if old else {}
+        files = {}
+        try:
+            for file_entry in os.scandir(date_dir_path):
+                if not file_entry.is_file() or not file_entry.name.lower().endswith('.hdf5'):
+                    continue
+                try:
+                    run_id = int(file_entry.name.split('_')[0])
+                except Exception:
+                    continue
+                prev = old_files.get(file_entry.name)
+                if prev is not None and prev.get("mtime_ns") is not None:
+                    # Reuse the cached status only if the file is unchanged.
+                    try:
+                        st = file_entry.stat()
+                    except OSError:
+                        continue
+                    if prev.get("mtime_ns") != st.st_mtime_ns or prev.get("size") != st.st_size:
+                        prev = None
+                if prev is not None:
+                    files[file_entry.name] = prev
+                else:
+                    files[file_entry.name] = {"run_id": run_id, "complete": None}
+        except OSError:
+            pass
+        return files
+
+    def _rebuild(self):
+        entries = []
+        for date_str, dir_info in self._dirs.items():
+            for name, info in dir_info.get("files", {}).items():
+                entries.append((int(info["run_id"]), date_str, name, info))
+        # Newest date first within a run_id so that collisions resolve the
+        # same way as the folder walk (most recent folder wins).
+        entries.sort(key=lambda e: (e[0], _neg_date_key(e[1]), e[2]))
+        self._entries = entries
+        self._run_ids = [e[0] for e in entries]
+
+    # ------------------------------------------------------------------
+    # lookups
+    # ------------------------------------------------------------------
+
+    def _path(self, entry):
+        return os.path.join(self.data_root, entry[1], entry[2])
+
+    def find(self, run_id):
+        """Return the file path(s) for run_id, newest date folder first."""
+        run_id = int(run_id)
+        with self._lock:
+            lo = bisect.bisect_left(self._run_ids, run_id)
+            hi = bisect.bisect_right(self._run_ids, run_id)
+            return [self._path(e) for e in self._entries[lo:hi]]
+
+    def date_of(self, run_id):
+        run_id = int(run_id)
+        with self._lock:
+            i = bisect.bisect_left(self._run_ids, run_id)
+            if i < len(self._run_ids) and self._run_ids[i] == run_id:
+                return self._entries[i][1]
+        return None
+
+    def nearest(self, run_id):
+        """Return (run_id, date_str) of the indexed run closest to run_id.
+        Ties go to the lower run_id."""
+        run_id = int(run_id)
+        with self._lock:
+            if not self._run_ids:
+                return None, None
+            i = bisect.bisect_left(self._run_ids, run_id)
+            candidates = []
+            if i < len(self._run_ids):
+                candidates.append(i)
+            if i > 0:
+                candidates.append(i - 1)
+            best = min(candidates, key=lambda j: (abs(self._run_ids[j] - run_id), self._run_ids[j]))
+            return self._run_ids[best], self._entries[best][1]
+
+    def latest_run_id(self):
+        with self._lock:
+            return self._run_ids[-1] if self._run_ids else None
+
+    def status(self, run_id):
+        """Return the cached status dict ({complete, xvarnames, xvardims}) for
+        run_id, checking the file if needed. None if not indexed."""
+        run_id = int(run_id)
+        with self._lock:
+            i = bisect.bisect_left(self._run_ids, run_id)
+            if i < len(self._run_ids) and self._run_ids[i] == run_id:
+                entry = self._entries[i]
+                self._is_complete(entry)
+                return dict(entry[3])
+        return None
+
+    def _is_complete(self, entry):
+        info = entry[3]
+        if info.get("complete") is True:
+            return True
+        path = self._path(entry)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if (info.get("complete") is False
+                and info.get("mtime_ns") == st.st_mtime_ns
+                and info.get("size") == st.st_size):
+            return False
+        complete, xvarnames, xvardims = read_run_status(path)
+        info["complete"] = complete
+        info["xvarnames"] = xvarnames
+        info["xvardims"] = xvardims
+        info["mtime_ns"] = st.st_mtime_ns
+        info["size"] = st.st_size
+        self._dirty = True
+        return complete
+
+    def iter_completed_desc(self, trust_window=0):
+        """Yield paths of completed runs, highest run_id first.
+
+        Parameters
+        ----------
+        trust_window: int
+            The newest `trust_window` files are yielded without a completion
+            check (see server_talk.RECENT_COMPLETED_TRUST_WINDOW).
+        """
+        with self._lock:
+            entries = list(self._entries)
+        yielded = 0
+        try:
+            for entry in reversed(entries):
+                if yielded < trust_window:
+                    complete = True
+                else:
+                    # _is_complete updates the shared status dicts, which
+                    # save() serializes under the lock.
+                    with self._lock:
+                        complete = self._is_complete(entry)
+                if complete:
+                    yielded += 1
+                    yield self._path(entry)
+        finally:
+            self.save()
+
+
+def _neg_date_key(date_str):
+    # Sort key that orders YYYY-MM-DD strings newest first.
+    return tuple(-int(p) for p in date_str.split('-'))
@@ -0,0 +1,295 @@
+import numpy as np
+
+# Storage of scope traces in run files.
+#
+# 'codes' stores each scope as integer ADC codes with a per-shot, per-channel
+# gain and offset (v = codes * gain + offset), and an implicit time axis with a
+# per-shot t0 and dt (t = t0 + dt * arange(Npts)), chunked per shot:
+#
+#   scope_data/<label>/codes   (*xvardims, Nch, Npts)  uint8 or uint16
+#   scope_data/<label>/gain    (*xvardims, Nch)         float64
+#   scope_data/<label>/offset  (*xvardims, Nch)         float64
+#   scope_data/<label>/t0      (*xvardims,)             float64
+#   scope_data/<label>/dt      (*xvardims,)             float64
+#
+# The scopes hand over traces already converted to volts, so the codes are
+# recovered from the voltage grid of each trace. Scopes whose traces are not
+# on a uniform grid of at most 2**16 levels (or whose time axis is not
+# uniform) are stored as float32 't' (*xvardims, Npts) and 'v'
+# (*xvardims, Nch, Npts) datasets instead, the layout of older run files.
+# 'float' always uses that layout.
+SCOPE_STORAGE = 'codes'
+
+_CODE_DTYPES = (np.uint8, np.uint16)
+_COMPRESSION = dict(compression='gzip', compression_opts=4)
+
+# ----------------------------------------------------------------------------
+# encoding
+
+def encode_trace(v):
+    """Returns (codes, gain, offset) with v ~ codes * gain + offset, or None if
+    v is not on a uniform grid of at most 2**16 levels.
+
+    The reconstruction is accepted if it is within 1% of a grid step of v (or
+    the rounding of v's float type), i.e. the codes are those the scope
+    measured.
+    """
+    v = np.asarray(v)
+    eps = np.finfo(v.dtype if v.dtype.kind == 'f' else np.float64).eps
+    v = v.astype(np.float64)
+    if not np.all(np.isfinite(v)):
+        return None
+    levels = np.unique(v)
+    offset = levels[0]
+    if len(levels) == 1:
+        return np.zeros(v.shape, dtype=np.int64), 1., offset
+    step = np.diff(levels).min()
+    # coarse bound only, the step is refined below
+    max_code = np.iinfo(np.uint16).max
+    if (levels[-1] - offset) / step > 2 * max_code:
+        return None
+    # float rounding makes the closest two levels a slightly wrong step, so
+    # refine it on ever more levels, only taking those whose code the current
+    # step cannot get wrong
+    rounding = 4 * eps * np.abs(levels).max()
+    if step <= 4 * rounding:
+        return None
+    delta = levels - offset
+    gain = step
+    n_reliable = 1
+    for _ in range(32):
+        reliable = delta <= 0.25 * gain**2 * n_reliable / rounding
+        level_codes = np.rint(delta[reliable] / gain)
+        # too few levels to refine on: keep the step, the check below decides
+        if np.count_nonzero(reliable) < 2 or not level_codes.any():
+            break
+        gain = np.dot(level_codes, delta[reliable]) / np.dot(level_codes, level_codes)
+        if reliable.all():
+            break
+        n_reliable = level_codes.max()
+    if not np.isfinite(gain) or gain <= 0:
+        return None
+    level_codes = np.rint(delta / gain)
+    if level_codes[-1] > max_code:
+        return None
+    tol = max(0.01 * gain, rounding)
+    if np.abs(level_codes * gain + offset - levels).max() > tol:
+        return None
+    codes = np.rint((v - offset) / gain).astype(np.int64)
+    return codes, gain, offset
+
+def encode_time(t):
+    """Returns (t0, dt) with t ~ t0 + dt * arange(len(t)), or None if t is not
+    uniform (to within 1% of dt or the float32 rounding of t)."""
+    t = np.asarray(t, dtype=np.float64)
+    if t.size < 2 or not np.all(np.isfinite(t)):
+        return None
+    t0 = t[0]
+    dt = (t[-1] - t0) / (t.size - 1)
+    tol = max(0.01 * abs(dt), 4 * np.finfo(np.float32).eps * np.abs(t).max())
+    if np.abs(t0 + dt * np.arange(t.size) - t).max() > tol:
+        return None
+    return t0, dt
+
+def _code_dtype(max_code):
+    for dtype in _CODE_DTYPES:
+        if max_code <= np.iinfo(dtype).max:
+            return dtype
+    return None
+
+def _encode_shot(trace):
+    """Encodes one shot (Nch, 2, Npts). Returns (codes, gain, offset, t0, dt)
+    or None."""
+    time = encode_time(trace[0, 0])
+    if time is None:
+        return None
+    n_ch = trace.shape[0]
+    codes = np.empty((n_ch, trace.shape[-1]), dtype=np.int64)
+    gain = np.empty(n_ch)
+    offset = np.empty(n_ch)
+    for ch in range(n_ch):
+        enc = encode_trace(trace[ch, 1])
+        if enc is None:
+            return None
+        codes[ch], gain[ch], offset[ch] = enc
+    return codes, gain, offset, time[0], time[1]
+
+# ----------------------------------------------------------------------------
+# writing
+
+def _create_codes_layout(grp, xvardims, n_ch, n_pts, code_dtype):
+    shot_chunk = (1,) * len(xvardims)
+    grp.create_dataset('codes', shape=tuple(xvardims) + (n_ch, n_pts), dtype=code_dtype,
+                       chunks=shot_chunk + (n_ch, n_pts), shuffle=True, **_COMPRESSION)
+    for key in ('gain', 'offset'):
+        grp.create_dataset(key, shape=tuple(xvardims) + (n_ch,), dtype=np.float64)
+    for key in ('t0', 'dt'):
+        grp.create_dataset(key, shape=tuple(xvardims), dtype=np.float64)
+
+def _create_float_layout(grp, xvardims, n_ch, n_pts):
+    shot_chunk = (1,) * len(xvardims)
+    grp.create_dataset('t', shape=tuple(xvardims) + (n_pts,), dtype=np.float32,
+                       chunks=shot_chunk + (n_pts,), **_COMPRESSION)
+    grp.create_dataset('v', shape=tuple(xvardims) + (n_ch, n_pts), dtype=np.float32,
+                       chunks=shot_chunk + (n_ch, n_pts), **_COMPRESSION)
+
+def _to_float_layout(grp):
+    """Rewrites a scope group in the codes layout as float t/v datasets."""
+    t, v = read_scope_data(grp)
+    for key in ('codes', 'gain', 'offset', 't0', 'dt'):
+        del grp[key]
+    _create_float_layout(grp, t.shape[:-1], v.shape[-2], v.shape[-1])
+    grp['t'][...] = t
+    grp['v'][...] = v
+
+def write_scope_data(parent, label, data, storage=None):
+    """
+    Writes the traces of one scope for a whole run.
+
+    Parameters
+    ----------
+    parent: h5py.Group
+        The scope_data group.
+    label: str
+    data: ArrayLike
+        Array of shape (*xvardims, Nch, 2, Npts), where the axis of length 2
+        picks the time or the voltage axis.
+    storage: str or None
+        'codes' or 'float'. Defaults to SCOPE_STORAGE.
+    """
+    storage = SCOPE_STORAGE if storage is None else storage
+    data = np.asarray(data)
+    xvardims = data.shape[:-3]
+    n_ch, _, n_pts = data.shape[-3:]
+    grp = parent.create_group(label)
+
+    if storage == 'codes':
+        shots = data.reshape((-1,) + data.shape[-3:])
+        encoded = []
+        for trace in shots:
+            enc = _encode_shot(trace)
+            if enc is None:
+                break
+            encoded.append(enc)
+        else:
+            max_code = max((int(enc[0].max()) for enc in encoded), default=0)
+            code_dtype = _code_dtype(max_code)
+            if code_dtype is not None:
+                _create_codes_layout(grp, xvardims, n_ch, n_pts, code_dtype)
+                codes, gain, offset, t0, dt = (np.array(x) for x in zip(*encoded))
+                grp['codes'][...] = codes.reshape(xvardims + (n_ch, n_pts))
+                grp['gain'][...] = gain.reshape(xvardims + (n_ch,))
+                grp['offset'][...] = offset.reshape(xvardims + (n_ch,))
+                grp['t0'][...] = t0.reshape(xvardims)
+                grp['dt'][...] = dt.reshape(xvardims)
+                return grp
+
+    # time axis taken from the first channel, as the scopes share it
+    _create_float_layout(grp, xvardims, n_ch, n_pts)
+    grp['t'][...] = data[..., 0, 0, :]
+    grp['v'][...] = data[..., 1, :]
+    return grp
+
+def write_scope_shot(parent, label, xvardims, idx, trace, storage=None):
+    """
+    Writes the trace of one scope for one shot, creating the scope's
+    datasets on the first shot.
+
+    If a shot cannot be stored as codes in the layout the first shot chose,
+    the scope is rewritten as float t/v datasets.
+
+    Parameters
+    ----------
+    parent: h5py.Group
+        The scope_data group.
+    label: str
+    xvardims: tuple of int
+    idx: tuple of int
+        The (unshuffled) index of the shot along each xvar.
+    trace: ArrayLike
+        Array of shape (Nch, 2, Npts).
+    storage: str or None
+        'codes' or 'float'. Defaults to SCOPE_STORAGE.
+    """
+    storage = SCOPE_STORAGE if storage is None else storage
+    trace = np.asarray(trace)
+    n_ch, _, n_pts = trace.shape
+    enc = _encode_shot(trace) if storage == 'codes' else None
+
+    if label not in parent:
+        grp = parent.create_group(label)
+        code_dtype = _code_dtype(int(enc[0].max())) if enc is not None else None
+        if code_dtype is not None:
+            _create_codes_layout(grp, xvardims, n_ch, n_pts, code_dtype)
+        else:
+            _create_float_layout(grp, xvardims, n_ch, n_pts)
+    grp = parent[label]
+
+    if 'codes' in grp:
+        if enc is not None and enc[0].max() <= np.iinfo(grp['codes'].dtype).max:
+            codes, gain, offset, t0, dt = enc
+            grp['codes'][idx] = codes
+            grp['gain'][idx] = gain
+            grp['offset'][idx] = offset
+            grp['t0'][idx] = t0
+            grp['dt'][idx] = dt
+            return
+        _to_float_layout(grp)
+    grp['t'][idx] = trace[0, 0]
+    grp['v'][idx] = trace[:, 1]
+
+# ----------------------------------------------------------------------------
+# reading
+
+def read_scope_data(grp, channel=None):
+    """
+    Reads the traces of one scope, in either layout.
+
+    Parameters
+    ----------
+    grp: h5py.Group
+        The group of the scope (scope_data/<label>).
+    channel: int or None
+        If given, only reads (and converts) this channel.
+
+    Returns
+    -------
+    t: np.ndarray
+        float32 array of shape (*xvardims, Npts).
+    v: np.ndarray
+        float32 array of shape (*xvardims, Nch, Npts), or (*xvardims, Npts)
+        if channel is given.
+    """
+    if 'codes' not in grp:
+        v = grp['v'][()] if channel is None else grp['v'][..., channel, :]
+        return grp['t'][()], v
+
+    codes_dset = grp['codes']
+    n_pts = codes_dset.shape[-1]
+    t = (grp['t0'][()][..., None]
+         + grp['dt'][()][..., None] * np.arange(n_pts)).astype(np.float32)
+    if channel is None:
+        codes = codes_dset[()]
+        gain = grp['gain'][()][..., None]
+        offset = grp['offset'][()][..., None]
+    else:
+        codes = codes_dset[..., channel, :]
+        gain = grp['gain'][..., channel][..., None]
+        offset = grp['offset'][..., channel][..., None]
+    v = (codes * gain + offset).astype(np.float32)
+    return t, v
+
+def copy_scope_group(src_grp, dst_parent, label):
+    """Copies a scope group into another file's scope_data group (e.g. for a
+    lite copy). The codes layout (and the single dataset of the oldest runs)
+    is copied as is, float64 traces of the float layout are downcast to
+    float32 and compressed."""
+    if not hasattr(src_grp, 'keys') or 'codes' in src_grp:
+        src_grp.file.copy(src_grp, dst_parent, label)
+        return
+    this_scope = dst_parent.create_group(label)
+    for ch_key in src_grp.keys():
+        arr = src_grp[ch_key][()]
+        if arr.dtype == np.float64:
+            arr = arr.astype(np.float32)
+        this_scope.create_dataset(ch_key, data=arr, **_COMPRESSION)
@@ -6,11 +6,15 @@ import time
 from datetime import datetime, timedelta
 import glob
 import numpy as np
-import h5py
+
+from waxa.data.run_index import RunIndex, read_run_status
+from waxa.data.scope_storage import copy_scope_group
+from waxa.data.source_store import SOURCES_GROUP, embed_source_texts
+from waxa.profiling import profiler
 
 MAP_BAT_PATH = "\"G:\\Shared drives\\Weld Lab Shared Drive\\Infrastructure\\map_network_drives_PeterRecommended.bat\""
 RECENT_COMPLETED_TRUST_WINDOW = 0
-SERVER_TALK_TIMING_ENABLED = False
+RUN_INDEX_ENABLED = True
 
 class server_talk():
     def __init__(self,
@@ -18,7 +22,8 @@ class server_talk():
                  run_id_relpath="run_id.py",
                  roi_spreadsheet_replath="roi.xlsx",
                  first_data_folder_date="",
-                 on_data_dir_disconnected_bat_path=""):
+                 on_data_dir_disconnected_bat_path="",
+                 use_run_index=RUN_INDEX_ENABLED):
         
         self.data_dir = data_dir
         self.run_id_path = os.path.join(data_dir, run_id_relpath) if data_dir is not None else None
@@ -34,19 +39,24 @@ class server_talk():
 
         self._lite = False
         self._recent_completed_trust_window = RECENT_COMPLETED_TRUST_WINDOW
-        self._timing_enabled = SERVER_TALK_TIMING_ENABLED
         self._run_id_lock = threading.Lock()  # serialises get_run_id / update_run_id
+        self._use_run_index = use_run_index
+        self._run_indices = {}  # data root -> RunIndex
 
         self.set_data_dir()
 
     def __getstate__(self):
         state = self.__dict__.copy()
         del state['_run_id_lock']
+        # The index is reloaded from disk on demand; no need to ship it.
+        state['_run_indices'] = {}
         return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
         self._run_id_lock = threading.Lock()
+        self.__dict__.setdefault('_use_run_index', RUN_INDEX_ENABLED)
+        self.__dict__.setdefault('_run_indices', {})
 
     def set_data_dir(self, lite=False):
         if self._lite == lite:
@@ -121,13 +131,11 @@ class server_talk():
                 raise ValueError("The provided path is not a hdf5 file.")
             
         rid = self.run_id_from_filepath(file,lite)
-        self._log_timing(f"get_data_file(idx={idx}, lite={lite})", t0)
+        self._log_timing("server_talk.get_data_file", t0)
         return file, rid
 
-    def _log_timing(self, label, start_time):
-        if self._timing_enabled:
-            dt_ms = (time.perf_counter() - start_time) * 1e3
-            print(f"[server_talk timing] {label}: {dt_ms:.2f} ms")
+    def _log_timing(self, stage, start_time):
+        profiler.record(stage, time.perf_counter() - start_time)
 
     def check_for_mapped_data_dir(self):
         self.set_data_dir()
@@ -209,9 +217,34 @@ class server_talk():
         for _, path in files:
             yield path
 
+    def _get_run_index(self, lite=False, refresh=True):
+        '''
+        Returns the RunIndex for the regular (or lite) data root, refreshing it
+        against the date folder mtimes if refresh is True. Returns None if the
+        index is disabled or the data root is not available.
+        '''
+        if not self._use_run_index:
+            return None
+        self.set_data_dir(lite)
+        root = self.data_dir
+        if not root or not os.path.isdir(root):
+            return None
+        index = self._run_indices.get(root)
+        if index is None:
+            index = RunIndex(root)
+            self._run_indices[root] = index
+            refresh = True
+        if refresh:
+            index.refresh()
+        return index
+
     def _iter_completed_data_files_desc_fresh(self, lite=False, skip_check=False):
         if not skip_check:
             self.check_for_mapped_data_dir()
+        index = self._get_run_index(lite=lite)
+        if index is not None:
+            yield from index.iter_completed_desc(trust_window=self._recent_completed_trust_window)
+            return
         yielded = 0
         for date_dir in self._iter_date_dirs_desc(lite=lite):
             for path in self._iter_hdf5_files_desc(date_dir):
@@ -221,44 +254,7 @@ class server_talk():
                     yield path
 
     def _is_completed_run(self, filepath):
-        try:
-            with h5py.File(filepath, 'r') as f:
-                # Fast path: explicit completion marker (present in new files).
-                # True  → fully written; False → still being written by server.
-                # None  → old file without the attr; fall through to xvar check.
-                rc = f.attrs.get('run_complete', None)
-                if rc is True:
-                    return True
-                if rc is False:
-                    return False
-
-                raw_xvarnames = f.attrs.get('xvarnames')
-                if raw_xvarnames is None:
-                    return True
-
-                if isinstance(raw_xvarnames, np.ndarray):
-                    xvarnames = [str(value.decode('utf-8', errors='replace') if isinstance(value, (bytes, np.bytes_)) else value) for value in raw_xvarnames.tolist()]
-                elif isinstance(raw_xvarnames, (list, tuple)):
-                    xvarnames = [str(value.decode('utf-8', errors='replace') if isinstance(value, (bytes, np.bytes_)) else value) for value in raw_xvarnames]
-                else:
-                    xvarnames = [str(raw_xvarnames.decode('utf-8', errors='replace') if isinstance(raw_xvarnames, (bytes, np.bytes_)) else raw_xvarnames)]
-
-                xvarnames = [name for name in xvarnames if str(name).strip()]
-                if not xvarnames:
-                    return True
-
-                if 'params' not in f:
-                    return False
-
-                for name in xvarnames:
-                    if name not in f['params']:
-                        return False
-                    values = np.asarray(f['params'][name][()])
-                    if values.ndim == 0:
-                        return False
-                return True
-        except Exception:
-            return False
+        return read_run_status(filepath)[0]
 
     def _iter_completed_data_files_desc(self, lite=False, skip_check=False):
         yield from self._iter_completed_data_files_desc_fresh(lite=lite, skip_check=skip_check)
@@ -268,15 +264,9 @@ class server_talk():
         iterator = self._iter_completed_data_files_desc_fresh(lite=lite, skip_check=skip_check) if use_fresh_scan else self._iter_completed_data_files_desc(lite=lite, skip_check=skip_check)
         for idx, path in enumerate(iterator):
             if idx == int(relative_idx):
-                self._log_timing(
-                    f"get_completed_data_file_by_relative_index(relative_idx={relative_idx}, lite={lite}, fresh={use_fresh_scan})",
-                    t0,
-                )
+                self._log_timing("server_talk.get_completed_data_file_by_relative_index", t0)
                 return path
-        self._log_timing(
-            f"get_completed_data_file_by_relative_index(relative_idx={relative_idx}, lite={lite}, fresh={use_fresh_scan})",
-            t0,
-        )
+        self._log_timing("server_talk.get_completed_data_file_by_relative_index", t0)
         return None
 
     def get_completed_run_id_by_relative_index(self, relative_idx=0, lite=False, use_fresh_scan=True, skip_check=False):
@@ -352,9 +342,30 @@ class server_talk():
 
         return None
 
+    def _find_data_file_by_run_id_indexed(self, run_id, lite=False, skip_check=False):
+        if not skip_check:
+            self.check_for_mapped_data_dir()
+        index = self._get_run_index(lite=lite, refresh=False)
+        if index is None:
+            return None
+        matches = [p for p in index.find(run_id) if os.path.isfile(p)]
+        if not matches:
+            # Not indexed yet (or the index is stale): pick up new folders.
+            index.refresh()
+            matches = [p for p in index.find(run_id) if os.path.isfile(p)]
+        if len(matches) > 1:
+            print(
+                f"[server_talk] WARNING: run ID {run_id} maps to "
+                f"{len(matches)} data files: {matches}. Loading "
+                f"{matches[0]}. This indicates a run_id collision."
+            )
+        return matches[0] if matches else None
+
     def find_data_file_by_run_id(self, run_id, lite=False, raise_on_missing=True, refresh=False, skip_check=False):
         t0 = time.perf_counter()
-        path = self._find_data_file_by_run_id_fresh(run_id, lite=lite, skip_check=skip_check)
+        path = self._find_data_file_by_run_id_indexed(run_id, lite=lite, skip_check=skip_check)
+        if path is None:
+            path = self._find_data_file_by_run_id_fresh(run_id, lite=lite, skip_check=skip_check)
         
         # If not found on first pass, retry once
         if path is None and not refresh:
@@ -362,12 +373,19 @@ class server_talk():
         
         if path is None and raise_on_missing:
             raise ValueError(f"Data file with run ID {run_id:1.0f} was not found.")
-        self._log_timing(f"find_data_file_by_run_id(run_id={run_id}, lite={lite}, refresh={refresh})", t0)
+        self._log_timing("server_talk.find_data_file_by_run_id", t0)
         return path
 
     def find_nearest_run_date_and_id(self, requested_run_id, lite=False, refresh=False):
         self.check_for_mapped_data_dir()
         requested_run_id = int(requested_run_id)
+        index = self._get_run_index(lite=lite)
+        if index is not None:
+            run_id, date_str = index.nearest(requested_run_id)
+            if run_id is None:
+                return None, None
+            return run_id, datetime.strptime(date_str, '%Y-%m-%d').date()
+
         nearest_run_id = None
         nearest_run_date = None
         nearest_key = None
@@ -400,6 +418,23 @@ class server_talk():
             return None, None
         return nearest_run_id, nearest_run_date
 
+    def get_run_summary(self, run_id, lite=False):
+        '''
+        Returns the indexed summary of a run as a dict with keys 'complete',
+        'xvarnames' and 'xvardims', or None if the run is not found (or the
+        run index is disabled).
+        '''
+        index = self._get_run_index(lite=lite, refresh=False)
+        if index is None:
+            return None
+        summary = index.status(run_id)
+        if summary is None:
+            index.refresh()
+            summary = index.status(run_id)
+        if summary is None:
+            return None
+        return {key: summary.get(key) for key in ('complete', 'xvarnames', 'xvardims')}
+
     def run_id_from_filepath(self,filepath,lite=False):
         self.set_data_dir(lite)
         run_id = int(os.path.normpath(filepath).split(os.path.sep)[-1].split("_")[0])
@@ -438,13 +473,18 @@ class server_talk():
         when no data files exist.
         """
         self.check_for_mapped_data_dir()
+        index = self._get_run_index()
+        latest = index.latest_run_id() if index is not None else None
+        # The index can miss the newest files (directory mtimes are coarse on
+        # some filesystems), so the newest date folder is always listed too.
         for date_dir in self._iter_date_dirs_desc():
             for path in self._iter_hdf5_files_desc(date_dir):
                 # _iter_hdf5_files_desc yields the highest run_id first and
                 # date dirs are newest-first, so the first hit is the global
-                # maximum.
-                return self.run_id_from_filepath(path)
-        return None
+                # maximum of the folders.
+                run_id = self.run_id_from_filepath(path)
+                return run_id if latest is None else max(latest, run_id)
+        return latest
 
     def set_run_id(self, value):
         """Overwrite the run_id counter file with ``value`` (the next run_id to
@@ -474,10 +514,11 @@ class server_talk():
 
         with h5py.File(lite_data_path,'w') as f_lite:
             with h5py.File(original_data_filepath,'r') as f_src:
-                # copy over other datasets (not data)
+                # copy over other datasets (not data, nor the source hashes:
+                # the texts are embedded below)
                 keys = f_src.keys()
                 for key in keys:
-                    if key != 'data':
+                    if key not in ('data', SOURCES_GROUP):
                         f_src.copy(f_src[key],f_lite,key)
 
                 # copy over non-image data
@@ -490,14 +531,7 @@ class server_talk():
                         # Downcast float64 → float32 and apply compression.
                         scope_grp = f_lite['data'].create_group('scope_data')
                         for scope_label, scope_item in f_src['data']['scope_data'].items():
-                            this_scope = scope_grp.create_group(scope_label)
-                            for ch_key in scope_item.keys():
-                                arr = scope_item[ch_key][()]
-                                if arr.dtype == np.float64:
-                                    arr = arr.astype(np.float32)
-                                this_scope.create_dataset(
-                                    ch_key, data=arr, compression='gzip', compression_opts=4
-                                )
+                            copy_scope_group(scope_item, scope_grp, scope_label)
                     else:
                         f_src.copy(f_src['data'][key],f_lite['data'],key)
 
@@ -505,6 +539,7 @@ class server_talk():
                 akeys = f_src.attrs.keys()
                 for key in akeys:
                     f_lite.attrs[key] = f_src.attrs[key]
+                embed_source_texts(f_src, f_lite, original_data_filepath)
 
                 roi = ROI(rid,roi_id=roi_id,use_saved_roi=use_saved_roi,server_talk=self)
                 
@@ -520,5 +555,5 @@ class server_talk():
 
                 for idx in range(N_img):
                     images[idx] = roi.crop(f_src['data']['images'][idx])
-                f_lite['data']['images'] = images
+                ds.create_images_dataset(f_lite['data'], data=images)
         print(f'Lite version of run {rid} saved at {lite_data_path}.')
\ No newline at end of file
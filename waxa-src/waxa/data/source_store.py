@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Content-addressed archive of experiment source texts. Each unique text is
+# stored once, as <data root>/_sources/<hash[:2]>/<hash>.py, and run files
+# only hold the hashes, as attrs of their 'sources' group (attr key ->
+# hash, with the same keys as the legacy text attrs: expt_file, params_file,
+# base_class_<module>).
+SOURCE_STORE_DIRNAME = "_sources"
+SOURCES_GROUP = "sources"
+
+# Where the experiment side remembers the hash of each source file it has
+# captured (keyed by path, mtime and size), so that unchanged files are
+# neither read nor hashed nor sent again on later runs.
+SOURCE_HASH_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".waxa", "source_hashes.json")
+
+
+def hash_source_text(text):
+    """Returns the sha256 hex digest of a source text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _decode(raw):
+    if raw is None:
+        return ""
+    if isinstance(raw, bytes):
+        return raw.decode("utf-8", errors="replace")
+    if isinstance(raw, np.ndarray) and raw.shape == ():
+        return _decode(raw.item())
+    return str(raw)
+
+
+class SourceStore():
+    '''
+    The archive of source texts under a data root.
+
+    Parameters
+    ----------
+    data_dir: str
+        The data root (the directory that holds the date folders).
+    '''
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.store_dir = os.path.join(data_dir, SOURCE_STORE_DIRNAME)
+        self._texts = {}
+
+    def path(self, source_hash):
+        return os.path.join(self.store_dir, source_hash[:2], source_hash + ".py")
+
+    def __contains__(self, source_hash):
+        return source_hash in self._texts or os.path.isfile(self.path(source_hash))
+
+    def put(self, text, source_hash=None):
+        """Stores a text, if not already stored, and returns its hash."""
+        if source_hash is None:
+            source_hash = hash_source_text(text)
+        if source_hash not in self:
+            path = self.path(source_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write then rename, so that a reader never sees a partial blob
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        self._texts[source_hash] = text
+        return source_hash
+
+    def get(self, source_hash, default=""):
+        """Returns the text with the given hash, or default if it is not in
+        the store."""
+        text = self._texts.get(source_hash)
+        if text is None:
+            try:
+                with open(self.path(source_hash), "r", encoding="utf-8",
+                          errors="replace", newline="") as f:
+                    text = f.read()
+            except OSError:
+                print(f"Source {source_hash} not found in {self.store_dir}.")
+                return default
+            self._texts[source_hash] = text
+        return text
+
+
+_stores = {}
+
+def get_source_store(data_dir):
+    """Returns the (cached) SourceStore for a data root."""
+    data_dir = os.path.abspath(data_dir)
+    store = _stores.get(data_dir)
+    if store is None:
+        store = _stores[data_dir] = SourceStore(data_dir)
+    return store
+
+def data_root_of(filepath):
+    """Returns the data root of a run file: <root>/<date>/<file> or
+    <root>/_lite/<date>/<file>."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(filepath)))
+    if os.path.basename(root) == "_lite":
+        root = os.path.dirname(root)
+    return root
+
+def read_source_texts(h5file, filepath=None):
+    """
+    Returns the source texts saved with a run, as a dict of attr key (e.g.
+    'expt_file', 'params_file', 'base_class_<module>') -> text.
+
+    Texts saved as hashes (in the 'sources' group) are resolved from the
+    source store of the run's data root. Texts saved directly as file attrs
+    (older runs) are returned as they are.
+
+    Parameters
+    ----------
+    h5file: h5py.File
+        The open run file.
+    filepath: str or None
+        The path of the run file, used to find the data root. Defaults to
+        h5file.filename.
+    """
+    texts = {}
+    for key in h5file.attrs.keys():
+        if key.endswith("_file") or key.startswith("base_class_"):
+            texts[key] = _decode(h5file.attrs[key])
+    if SOURCES_GROUP in h5file:
+        store = get_source_store(data_root_of(filepath or h5file.filename))
+        for key, source_hash in h5file[SOURCES_GROUP].attrs.items():
+            texts[key] = store.get(_decode(source_hash))
+    return texts
+
+def embed_source_texts(src_file, dst_file, filepath=None):
+    """Writes the source texts of a run (see read_source_texts) into another
+    file as plain file attrs, e.g. so that a lite copy does not depend on the
+    source store of the data root it was made from."""
+    for key, text in read_source_texts(src_file, filepath).items():
+        dst_file.attrs[key] = text
+
+
+class SourceCapture():
+    '''
+    Captures source files on the experiment side for saving by hash.
+
+    A file is only read and hashed again if its mtime or size changed since
+    it was last captured (on this machine: the hashes are kept in
+    SOURCE_HASH_CACHE_PATH), and its text is only sent along if it is a new
+    version.
+    '''
+
+    def __init__(self, cache_path=None):
+        self.cache_path = SOURCE_HASH_CACHE_PATH if cache_path is None else cache_path
+        self._cache = None
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path, "r") as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._cache, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"Unable to save source hash cache at {self.cache_path}: {e}")
+
+    def capture(self, filepaths, read_text):
+        """
+        Hashes the given source files.
+
+        Parameters
+        ----------
+        filepaths: dict
+            attr key -> path of the source file.
+        read_text: callable
+            read_text(filepath, label) -> str, used to read changed files.
+
+        Returns
+        -------
+        hashes: dict
+            attr key -> hash.
+        texts: dict
+            hash -> text, for the files that changed since they were last
+            captured.
+        """
+        cache = self._load_cache()
+        hashes, texts = {}, {}
+        changed = False
+        for key, filepath in filepaths.items():
+            if not filepath:
+                continue
+            filepath = os.path.abspath(filepath)
+            try:
+                st = os.stat(filepath)
+                stamp = [st.st_mtime_ns, st.st_size]
+            except OSError:
+                stamp = None
+            entry = cache.get(filepath)
+            if stamp is not None and entry is not None and entry[:2] == stamp:
+                hashes[key] = entry[2]
+                continue
+            text = read_text(filepath, key)
+            source_hash = hash_source_text(text)
+            hashes[key] = source_hash
+            texts[source_hash] = text
+            if stamp is not None:
+                cache[filepath] = stamp + [source_hash]
+                changed = True
+        if changed:
+            self._save_cache()
+        return hashes, texts
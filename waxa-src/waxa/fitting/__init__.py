@@ -1,7 +1,14 @@
+from .batch_models import (fit_batch, BatchFitResults, BatchModel, SineModel,
+                           DampedCosineModel, LorentzianModel, ExponentialDecayModel,
+                           SineEnvelopeModel, PolynomialModel, LinearModel,
+                           QuadraticModel, KinematicModel, oscillation_guesses)
 from .fit import Fit
 from .gaussian import GaussianFit, GaussianTemperatureFit, MultiGaussianFit
 from .lorentzian import LorentzianFit
 from .fringes import SineEnvelope
 from .sine import Sine
 from .linear import LinearFit
-from .parabolic import *
\ No newline at end of file
+from .parabolic import *
+from .batch import fit_gaussian_batch, gaussian_moments, levenberg_marquardt_batch
+from .fit_results import GaussianFitResults
+from .pool import FitPool, get_fit_pool, shutdown_fit_pool
@@ -0,0 +1,366 @@
+import numpy as np
+from scipy.ndimage import uniform_filter1d
+
+# Default stopping criteria for the batched Levenberg-Marquardt solver.
+LM_MAX_ITER = 100
+LM_FTOL = 1e-10
+LM_XTOL = 1e-8
+
+# Above this damping the step is numerically zero: the fit sits at a minimum.
+_LM_LAMBDA_MAX = 1e10
+
+# Fit window for the batched Gaussian fit, in units of the guessed sigma.
+GAUSSIAN_FIT_WINDOW_SIGMAS = 6.
+
+# gaussian_moments: fraction of the profile at each end used as the baseline,
+# and the half-width (in sigmas) of the window the second pass is taken over.
+MOMENTS_EDGE_FRACTION = 0.1
+MOMENTS_WINDOW_SIGMAS = 3.
+
+
+def levenberg_marquardt_batch(model, x, Y, p0,
+                              weights=None,
+                              lower=None,
+                              upper=None,
+                              max_iter=LM_MAX_ITER,
+                              ftol=LM_FTOL,
+                              xtol=LM_XTOL):
+    '''
+    Fits the same model to many datasets at once with Levenberg-Marquardt.
+
+    Every iteration evaluates the model and its Jacobian for all unconverged
+    datasets in one array operation and solves the damped normal equations
+    with a batched np.linalg.solve. Each dataset has its own damping, and
+    datasets drop out of the active set as they converge.
+
+    Parameters
+    ----------
+    model: callable
+        model(x, P) -> (F, J), where P is an (n, k) array of parameters, F the
+        (n, m) model values and J the (n, m, k) Jacobian with respect to P.
+    x: ArrayLike
+        The (m,) independent variable, shared by all datasets.
+    Y: ArrayLike
+        The (N, m) dependent variables.
+    p0: ArrayLike
+        The (N, k) initial parameters.
+    weights: ArrayLike or None
+        (N, m) weights on the residuals. Zero-weight points are ignored. If
+        None, all points are weighted equally.
+    lower, upper: ArrayLike or None
+        (k,) bounds on the parameters. Steps are clipped to the bounds.
+    max_iter: int
+    ftol: float
+        Converged when the relative decrease of the cost is below ftol.
+    xtol: float
+        Converged when the relative step size is below xtol.
+
+    Returns
+    -------
+    popt: np.ndarray
+        (N, k) best-fit parameters.
+    pcov: np.ndarray
+        (N, k, k) parameter covariance, scaled by the reduced chi-square as
+        in scipy.optimize.curve_fit.
+    success: np.ndarray
+        (N,) bool, True where the fit converged to finite parameters.
+    '''
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    P = np.array(p0, dtype=float, copy=True)
+    N, k = P.shape
+    W = np.ones_like(Y) if weights is None else np.asarray(weights, dtype=float)
+    lower = np.full(k, -np.inf) if lower is None else np.asarray(lower, dtype=float)
+    upper = np.full(k, np.inf) if upper is None else np.asarray(upper, dtype=float)
+    P = np.clip(P, lower, upper)
+
+    def cost_of(F, idx):
+        r = (Y[idx] - F) * W[idx]
+        return np.einsum('nm,nm->n', r, r)
+
+    F, J = model(x, P)
+    cost = cost_of(F, slice(None))
+    lam = np.full(N, 1e-3)
+    done = ~np.isfinite(cost)
+    success = np.zeros(N, dtype=bool)
+    eye = np.eye(k)
+
+    for _ in range(max_iter):
+        act = np.flatnonzero(~done)
+        if act.size == 0:
+            break
+        Pa = P[act]
+        F, J = model(x, Pa)
+        Wa = W[act]
+        r = (Y[act] - F) * Wa
+        Jw = J * Wa[..., None]
+        JTJ = np.einsum('nmi,nmj->nij', Jw, Jw)
+        g = np.einsum('nmi,nm->ni', Jw, r)
+
+        # Parameters held at a bound by the gradient are left out of the
+        # step, so that they do not distort the step of the others.
+        pinned = ((Pa <= lower) & (g < 0)) | ((Pa >= upper) & (g > 0))
+        free = ~pinned
+        JTJ = JTJ * free[:, :, None] * free[:, None, :]
+        g = g * free
+
+        diag = np.einsum('nii->ni', JTJ)
+        damping = lam[act][:, None] * np.maximum(diag, 1e-12)
+        A = JTJ + damping[:, :, None] * eye + pinned[:, :, None] * eye
+        finite = np.all(np.isfinite(A), axis=(1, 2)) & np.all(np.isfinite(g), axis=1)
+        A[~finite] = eye
+        g[~finite] = 0.
+        try:
+            delta = np.linalg.solve(A, g[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            delta = np.einsum('nij,nj->ni', np.linalg.pinv(A), g)
+
+        P_new = np.clip(Pa + delta, lower, upper)
+        F_new, _ = model(x, P_new)
+        cost_new = cost_of(F_new, act)
+        cost_old = cost[act]
+
+        improved = np.isfinite(cost_new) & (cost_new <= cost_old)
+        step = np.abs(P_new - Pa)
+        small_step = np.all(step <= xtol * (np.abs(Pa) + xtol), axis=1)
+        small_df = (cost_old - cost_new) <= ftol * cost_old
+
+        P[act[improved]] = P_new[improved]
+        cost[act[improved]] = cost_new[improved]
+        lam[act[improved]] /= 10.
+        lam[act[~improved]] *= 10.
+
+        converged = (improved & (small_df | small_step)) | (lam[act] > _LM_LAMBDA_MAX)
+        converged &= finite
+        success[act[converged]] = True
+        done[act[converged]] = True
+        done[act[~finite]] = True
+
+    # Covariance at the solution, as curve_fit with absolute_sigma=False.
+    F, J = model(x, P)
+    Jw = J * W[..., None]
+    JTJ = np.einsum('nmi,nmj->nij', Jw, Jw)
+    pcov = np.full((N, k, k), np.nan)
+    ok = np.all(np.isfinite(JTJ), axis=(1, 2))
+    if np.any(ok):
+        pcov[ok] = np.linalg.pinv(JTJ[ok])
+    dof = np.count_nonzero(W, axis=1) - k
+    s_sq = np.where(dof > 0, cost / np.maximum(dof, 1), np.inf)
+    pcov *= s_sq[:, None, None]
+
+    success &= np.all(np.isfinite(P), axis=1)
+    return P, pcov, success
+
+
+def _gaussian_model(u, P):
+    amplitude, sigma, center, offset = (P[:, i:i+1] for i in range(4))
+    d = u[None, :] - center
+    g = np.exp(-d**2 / (2 * sigma**2))
+    F = offset + amplitude * g
+    J = np.empty(F.shape + (4,))
+    J[..., 0] = g
+    J[..., 1] = amplitude * g * d**2 / sigma**3
+    J[..., 2] = amplitude * g * d / sigma**2
+    J[..., 3] = 1.
+    return F, J
+
+
+def gaussian_moment_guesses(x, Y, px_boxcar_smoothing=3):
+    '''
+    Moment-based initial guesses for Gaussian fits to many profiles.
+
+    Parameters
+    ----------
+    x: ArrayLike
+        The (m,) shared x axis.
+    Y: ArrayLike
+        The (N, m) profiles.
+    px_boxcar_smoothing: int
+        Width of the boxcar used to smooth the profiles before estimating the
+        peak height and baseline.
+
+    Returns
+    -------
+    np.ndarray: (N, 4) guesses of (amplitude, sigma, x_center, y_offset).
+    '''
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    w = max(int(px_boxcar_smoothing), 1)
+    Ysm = uniform_filter1d(Y, w, axis=1, mode='nearest') if w > 1 else Y
+
+    offset = np.min(Ysm, axis=1)
+    amplitude = np.max(Ysm, axis=1) - offset
+
+    # Center from the first moment of the part of the profile above 20% of
+    # the peak, which keeps the baseline noise out of the moment.
+    above = np.clip(Ysm - offset[:, None] - 0.2 * amplitude[:, None], 0., None)
+    norm = np.sum(above, axis=1)
+    norm = np.where(norm > 0, norm, 1.)
+    center = np.sum(above * x[None, :], axis=1) / norm
+
+    # Sigma from the area under the profile: area = amplitude*sqrt(2 pi) sigma.
+    dx = np.abs(x[-1] - x[0]) / max(len(x) - 1, 1) if len(x) > 1 else 1.
+    area = np.sum(np.clip(Ysm - offset[:, None], 0., None), axis=1) * dx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = area / (amplitude * np.sqrt(2 * np.pi))
+    sigma = np.where(np.isfinite(sigma) & (sigma > 0), sigma, dx)
+    return np.stack([amplitude, sigma, center, offset], axis=1)
+
+
+def gaussian_moments(x, Y, edge_fraction=MOMENTS_EDGE_FRACTION,
+                     window_sigmas=MOMENTS_WINDOW_SIGMAS,
+                     px_boxcar_smoothing=3):
+    '''
+    Gaussian parameters of many profiles estimated from their moments,
+    without fitting.
+
+    The baseline is the mean of the outer edge_fraction of the profile at
+    whichever end is lower. The center and sigma are the first and second
+    moments of the baseline-subtracted profile: first of its positive part
+    over the whole profile, then of the profile itself within +/-
+    window_sigmas sigmas of that center, which keeps the noise in the wings
+    out of the second moment. The amplitude is the peak of the
+    (boxcar-smoothed) baseline-subtracted profile.
+
+    Parameters
+    ----------
+    x: ArrayLike
+        The (m,) shared x axis.
+    Y: ArrayLike
+        The (N, m) profiles.
+    edge_fraction: float
+    window_sigmas: float or None
+        None to take the moments over the whole profile only.
+    px_boxcar_smoothing: int
+        Width of the boxcar used to smooth the profiles before taking the
+        peak height.
+
+    Returns
+    -------
+    popt: np.ndarray
+        (N, 4) estimates of (amplitude, sigma, x_center, y_offset).
+    area: np.ndarray
+        (N,) integrated area of the baseline-subtracted profiles.
+    success: np.ndarray
+        (N,) bool mask of the profiles with a positive peak and finite
+        moments. Estimates of the others are NaN.
+    '''
+    x = np.asarray(x, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    N, m = Y.shape
+    if m == 0:
+        return np.full((N, 4), np.nan), np.full(N, np.nan), np.zeros(N, dtype=bool)
+
+    n_edge = min(max(int(round(edge_fraction * m)), 1), m)
+    # The lower of the two ends, as an off-center cloud raises the other.
+    offset = np.minimum(np.mean(Y[:, :n_edge], axis=1), np.mean(Y[:, -n_edge:], axis=1))
+    Yb = Y - offset[:, None]
+
+    dx = np.abs(x[-1] - x[0]) / (m - 1) if m > 1 else 1.
+    area = np.sum(Yb, axis=1) * dx
+
+    w = max(int(px_boxcar_smoothing), 1)
+    amplitude = np.max(uniform_filter1d(Yb, w, axis=1, mode='nearest') if w > 1 else Yb, axis=1)
+
+    W = np.clip(Yb, 0., None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center, sigma, norm = _weighted_moments(x, W)
+        if window_sigmas is not None:
+            in_window = np.abs(x[None, :] - center[:, None]) <= window_sigmas * sigma[:, None]
+            center, sigma, norm = _weighted_moments(x, Yb * in_window)
+
+    popt = np.stack([amplitude, sigma, center, offset], axis=1)
+    success = (np.all(np.isfinite(popt), axis=1) & (amplitude > 0)
+               & (norm > 0) & (sigma > 0))
+    popt[~success] = np.nan
+    area = np.where(success, area, np.nan)
+    return popt, area, success
+
+
+def _weighted_moments(x, W):
+    norm = np.sum(W, axis=1)
+    center = np.sum(W * x[None, :], axis=1) / norm
+    var = np.sum(W * (x[None, :] - center[:, None])**2, axis=1) / norm
+    return center, np.sqrt(var), norm
+
+
+def fit_gaussian_batch(x, Y, p0=None,
+                       fit_window_sigmas=GAUSSIAN_FIT_WINDOW_SIGMAS,
+                       max_iter=LM_MAX_ITER):
+    '''
+    Fits y_offset + amplitude * exp(-(x-x_center)**2 / (2 sigma**2)) to every
+    row of Y in one vectorized Levenberg-Marquardt solve.
+
+    Each profile is fit within +/- fit_window_sigmas guessed sigmas of its
+    guessed center, as GaussianFit fits only near the peak. Amplitude and
+    sigma are bounded below by zero.
+
+    Parameters
+    ----------
+    x: ArrayLike
+        The (m,) shared x axis.
+    Y: ArrayLike
+        The (N, m) profiles.
+    p0: ArrayLike or None
+        (N, 4) initial guesses of (amplitude, sigma, x_center, y_offset). If
+        None, uses gaussian_moment_guesses.
+    fit_window_sigmas: float
+        Half-width of the fit window in guessed sigmas. None to fit the whole
+        profile.
+    max_iter: int
+
+    Returns
+    -------
+    popt: np.ndarray
+        (N, 4) fit parameters (amplitude, sigma, x_center, y_offset).
+    pcov: np.ndarray
+        (N, 4, 4) covariances.
+    success: np.ndarray
+        (N,) bool mask of the fits that converged to a nonzero amplitude.
+        Parameters of failed fits are NaN.
+    '''
+    x = np.asarray(x, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    N, m = Y.shape
+    if p0 is None:
+        p0 = gaussian_moment_guesses(x, Y)
+    p0 = np.array(p0, dtype=float, copy=True)
+
+    # Work in pixel units and with profiles scaled to order one, so the
+    # damping and tolerances do not depend on the units of x and y.
+    x_min = np.min(x) if m else 0.
+    x_scale = (np.max(x) - x_min) / max(m - 1, 1) if m > 1 else 1.
+    if x_scale == 0:
+        x_scale = 1.
+    u = (x - x_min) / x_scale
+    y_scale = np.max(np.abs(Y), axis=1)
+    y_scale = np.where(np.isfinite(y_scale) & (y_scale > 0), y_scale, 1.)
+    scales = np.stack([y_scale, np.full(N, x_scale), np.full(N, x_scale), y_scale], axis=1)
+
+    P0 = p0 / scales
+    P0[:, 2] = (p0[:, 2] - x_min) / x_scale
+    Yn = Y / y_scale[:, None]
+
+    finite_rows = np.all(np.isfinite(Yn), axis=1) & np.all(np.isfinite(P0), axis=1)
+    Yn = np.where(finite_rows[:, None], Yn, 0.)
+    P0[~finite_rows] = [1., 1., 0., 0.]
+
+    if fit_window_sigmas is None:
+        W = np.ones_like(Yn)
+    else:
+        half_width = np.maximum(fit_window_sigmas * P0[:, 1], 4.)
+        W = (np.abs(u[None, :] - P0[:, 2:3]) <= half_width[:, None]).astype(float)
+
+    lower = np.array([0., 1e-3, -np.inf, -np.inf])
+    P, pcov, success = levenberg_marquardt_batch(_gaussian_model, u, Yn, P0,
+                                                 weights=W,
+                                                 lower=lower,
+                                                 max_iter=max_iter)
+    # A zero-amplitude fit has no meaningful sigma or center.
+    success &= finite_rows & (P[:, 0] > 0)
+
+    popt = P * scales
+    popt[:, 2] = P[:, 2] * x_scale + x_min
+    pcov = pcov * scales[:, :, None] * scales[:, None, :]
+    popt[~success] = np.nan
+    return popt, pcov, success
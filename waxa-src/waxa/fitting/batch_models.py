@@ -0,0 +1,552 @@
+import numpy as np
+from scipy.ndimage import uniform_filter1d
+
+from waxa.fitting.batch import (levenberg_marquardt_batch, gaussian_moment_guesses,
+                                LM_MAX_ITER)
+
+# The oscillation guesses take the FFT of each curve zero-padded to at least
+# this many times its length, to resolve the peak frequency finer than one
+# bin before interpolating.
+OSCILLATION_FFT_PAD_FACTOR = 8
+
+
+class BatchModel():
+    '''
+    A fit model for fitting many curves at once with fit_batch.
+
+    Subclasses define the parameter names, how each parameter scales with the
+    units of x and y, default bounds, the model with its Jacobian, and
+    vectorized initial guesses.
+
+    The fits are done on x / max|x| and y / max|y|, so every parameter must
+    scale as y**a * x**b (its entry (a, b) in units). The model must keep
+    its form under this rescaling, so it cannot depend on the origin of x.
+
+    Parameters named in periodic are phases: they are not bounded during the
+    fit, and are wrapped into [0, 2 pi) after it.
+    '''
+    names = ()
+    units = ()
+    lower = None
+    upper = None
+    periodic = ()
+
+    @property
+    def n_params(self):
+        return len(self.names)
+
+    def evaluate(self, u, P):
+        '''Returns the (n, m) model values F and (n, m, k) Jacobian J at the
+        (n, k) parameters P, on the (m,) axis u.'''
+        raise NotImplementedError
+
+    def guess(self, u, Y, W):
+        '''Returns (N, k) initial guesses for the (N, m) curves Y on the (m,)
+        axis u. W is an (N, m) mask of the valid points.'''
+        raise NotImplementedError
+
+    def _to_output(self, popt, pcov):
+        # Maps the fitted parameters (and covariances) to the reported ones.
+        return popt, pcov
+
+    def __call__(self, x, *params):
+        '''Evaluates the model at x for one set of parameters.'''
+        x = np.asarray(x, dtype=float)
+        F, _ = self.evaluate(x.ravel(), np.asarray(params, dtype=float)[None, :])
+        return F[0].reshape(x.shape)
+
+
+class BatchFitResults():
+    '''
+    The results of fit_batch, stored as arrays shaped like the grid of fitted
+    curves.
+
+    Attributes
+    ----------
+    model: BatchModel
+    xdata: np.ndarray
+        The (m,) shared x axis.
+    ydata: np.ndarray
+        The curves, of shape shape + (m,).
+    popt: np.ndarray
+        Fit parameters, of shape shape + (k,), in the order of model.names.
+        NaN where the fit failed.
+    pcov: np.ndarray
+        Covariances, of shape shape + (k, k).
+    success: np.ndarray
+        Bool array of shape ``shape``.
+
+    Each parameter is also available as an attribute named as in
+    model.names, e.g. ``results.amplitude``.
+    '''
+
+    def __init__(self, model, xdata, ydata, popt, pcov, success):
+        self.model = model
+        self.xdata = xdata
+        self.ydata = ydata
+        self.popt = popt
+        self.pcov = pcov
+        self.success = success
+        for i, name in enumerate(model.names):
+            vars(self)[name] = popt[..., i]
+
+    @property
+    def shape(self):
+        return self.success.shape
+
+    def __repr__(self):
+        return (f"BatchFitResults({type(self.model).__name__}, shape={self.shape}, "
+                f"n_failed={int(np.sum(~self.success))})")
+
+    @property
+    def y_fitdata(self):
+        '''The fit functions evaluated on xdata, of shape shape + (m,).'''
+        P = self.popt.reshape(-1, self.model.n_params)
+        F, _ = self.model.evaluate(np.asarray(self.xdata, dtype=float), P)
+        return F.reshape(self.shape + (len(self.xdata),))
+
+    def get(self, attr):
+        '''Returns the array for the fit attribute attr.'''
+        if attr == 'y_fitdata':
+            return self.y_fitdata
+        return vars(self)[attr]
+
+
+def fit_batch(model, x, Y, p0=None, lower=None, upper=None,
+              max_iter=LM_MAX_ITER):
+    '''
+    Fits model to every curve in Y, all at once.
+
+    Points where Y (or x) is not finite are left out of the fit of that curve.
+    Nonlinear models are fit with one batched Levenberg-Marquardt solve
+    (levenberg_marquardt_batch); polynomial models are solved in closed form.
+
+    Parameters
+    ----------
+    model: BatchModel
+    x: ArrayLike
+        The (m,) shared x axis.
+    Y: ArrayLike
+        The curves, of shape shape + (m,), e.g. (N, m) or one curve per
+        entry of an xvar grid.
+    p0: ArrayLike or None
+        Initial guesses in the units of x and y, of shape (k,) (the same for
+        every curve) or shape + (k,). NaN entries, or all of them if p0 is
+        None, are guessed from the data with model.guess.
+    lower, upper: ArrayLike or None
+        (k,) bounds in the units of x and y. If None, uses the model's.
+    max_iter: int
+
+    Returns
+    -------
+    BatchFitResults
+    '''
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    shape = Y.shape[:-1]
+    m = Y.shape[-1]
+    k = model.n_params
+    Y2 = Y.reshape(-1, m)
+    N = Y2.shape[0]
+
+    W = np.isfinite(Y2) & np.isfinite(x)[None, :]
+    Yz = np.where(W, Y2, 0.)
+    x_scale = np.max(np.abs(x[np.isfinite(x)]), initial=0.)
+    x_scale = x_scale if x_scale > 0 else 1.
+    y_scale = np.max(np.abs(Yz), initial=0.)
+    y_scale = y_scale if y_scale > 0 else 1.
+    u = np.where(np.isfinite(x), x, 0.) / x_scale
+    Yn = Yz / y_scale
+    a, b = np.asarray(model.units, dtype=float).reshape(k, 2).T
+    unit = y_scale**a * x_scale**b
+
+    lower = model.lower if lower is None else lower
+    upper = model.upper if upper is None else upper
+    lower = None if lower is None else np.asarray(lower, dtype=float) / unit
+    upper = None if upper is None else np.asarray(upper, dtype=float) / unit
+
+    enough = np.count_nonzero(W, axis=1) >= k
+    if isinstance(model, PolynomialModel):
+        P, pcov, success = model._solve(u, Yn, W)
+    else:
+        if p0 is None:
+            P0 = model.guess(u, Yn, W)
+        else:
+            P0 = np.broadcast_to(np.asarray(p0, dtype=float), shape + (k,)).reshape(N, k) / unit
+            if np.any(np.isnan(P0)):
+                P0 = np.where(np.isnan(P0), model.guess(u, Yn, W), P0)
+        P0 = np.where(np.isfinite(P0), P0, 1.)
+        if lower is not None or upper is not None:
+            P0 = np.clip(P0, lower if lower is not None else -np.inf,
+                         upper if upper is not None else np.inf)
+        P, pcov, success = levenberg_marquardt_batch(model.evaluate, u, Yn, P0,
+                                                     weights=W.astype(float),
+                                                     lower=lower, upper=upper,
+                                                     max_iter=max_iter)
+    success &= enough
+
+    for name in model.periodic:
+        i = model.names.index(name)
+        P[:, i] = np.mod(P[:, i], 2*np.pi)
+    popt, pcov = model._to_output(P * unit, pcov * unit[:, None] * unit[None, :])
+    popt[~success] = np.nan
+    return BatchFitResults(model, x, Y,
+                           popt.reshape(shape + (k,)),
+                           pcov.reshape(shape + (k, k)),
+                           success.reshape(shape))
+
+
+# ----------------------------------------------------------------------
+# vectorized guess helpers
+# ----------------------------------------------------------------------
+
+def _row_span(u, W):
+    lo = np.min(np.where(W, u[None, :], np.inf), axis=1)
+    hi = np.max(np.where(W, u[None, :], -np.inf), axis=1)
+    span = hi - lo
+    return np.where(np.isfinite(span) & (span > 0), span, 1.)
+
+
+def _crossing_wavenumber(u, R, W, span=None, smoothing=3):
+    '''Estimates the angular wavenumber of the oscillating (N, m) residuals R
+    from how often they cross zero.'''
+    # Carry the last valid point over the masked ones, so that a crossing
+    # across a gap is still counted once.
+    idx = np.maximum.accumulate(np.where(W, np.arange(R.shape[1])[None, :], 0), axis=1)
+    R = np.take_along_axis(np.where(W, R, 0.), idx, axis=1)
+    if smoothing > 1:
+        R = uniform_filter1d(R, smoothing, axis=1, mode='nearest')
+    s = np.sign(R)
+    n_cross = np.sum(s[:, :-1] * s[:, 1:] < 0, axis=1)
+    span = _row_span(u, W) if span is None else span
+    return np.pi * np.maximum(n_cross, 1) / span
+
+
+def _fft_wavenumber(u, R, W, pad_factor=OSCILLATION_FFT_PAD_FACTOR):
+    '''Estimates the angular wavenumber of the oscillating (N, m) residuals R
+    from the peak of their zero-padded spectrum. Falls back on
+    _crossing_wavenumber if u is not evenly spaced.'''
+    m = R.shape[1]
+    du = np.diff(u)
+    if m < 4 or du[0] == 0 or not np.allclose(du, du[0], rtol=1e-3, atol=0.):
+        return _crossing_wavenumber(u, R, W)
+    n_fft = 1 << int(np.ceil(np.log2(pad_factor * m)))
+    Rw = np.where(W, R, 0.)
+    Rw = (Rw - _masked_mean(Rw, W)[:, None] * W) * np.hanning(m)[None, :]
+    S = np.abs(np.fft.rfft(Rw, n=n_fft, axis=1))
+    # The largest bin, excluding DC, refined by a parabola through the log
+    # magnitudes of it and its neighbors.
+    i = np.argmax(S[:, 1:-1], axis=1) + 1
+    rows = np.arange(R.shape[0])
+    tiny = np.finfo(float).tiny
+    lo, mid, hi = (np.log(S[rows, j] + tiny) for j in (i - 1, i, i + 1))
+    denom = lo - 2 * mid + hi
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(denom < 0, 0.5 * (lo - hi) / denom, 0.)
+    shift = np.clip(np.nan_to_num(shift), -0.5, 0.5)
+    return 2 * np.pi * (i + shift) / (n_fft * np.abs(du[0]))
+
+
+def oscillation_guesses(x, R, W=None, x0=0., pad_factor=OSCILLATION_FFT_PAD_FACTOR):
+    '''
+    Guesses the oscillation R ~ amplitude * cos(k * (x - x0) + phase) of each
+    curve.
+
+    k is found from the peak of the Hann-windowed, zero-padded rFFT of each
+    curve, with parabolic interpolation between bins. The amplitude and
+    phase are then the least-squares projection of the curve on that
+    frequency. If x is not evenly spaced, k is estimated from the zero
+    crossings instead.
+
+    Parameters
+    ----------
+    x: ArrayLike
+        The (m,) shared x axis.
+    R: ArrayLike
+        (N, m) curves, offset removed.
+    W: ArrayLike or None
+        (N, m) bool mask of the valid points. If None, all are valid.
+    x0: float or ArrayLike
+        The phase reference, a float or one per curve.
+    pad_factor: int
+
+    Returns
+    -------
+    k, amplitude, phase: np.ndarray
+        (N,) arrays. k >= 0, amplitude >= 0 and phase in [0, 2 pi).
+    '''
+    x = np.asarray(x, dtype=float)
+    R = np.atleast_2d(np.asarray(R, dtype=float))
+    W = np.ones(R.shape, dtype=bool) if W is None else np.asarray(W, dtype=bool)
+    R = np.where(W, R, 0.)
+    k = _fft_wavenumber(x, R, W, pad_factor)
+    theta = k[:, None] * (x[None, :] - np.reshape(x0, (-1, 1)))
+    a, b = _quadrature_amplitudes(theta, R, W)
+    # a sin + b cos = amplitude cos(theta + phase)
+    return k, np.hypot(a, b), np.mod(np.arctan2(-a, b), 2*np.pi)
+
+
+def _quadrature_amplitudes(theta, R, W):
+    '''Least-squares a, b in R ~ a sin(theta) + b cos(theta) for each row.'''
+    S = np.sin(theta) * W
+    C = np.cos(theta) * W
+    ss = np.sum(S * S, axis=1)
+    cc = np.sum(C * C, axis=1)
+    sc = np.sum(S * C, axis=1)
+    rs = np.sum(S * R, axis=1)
+    rc = np.sum(C * R, axis=1)
+    det = ss * cc - sc**2
+    det = np.where(np.abs(det) > 0, det, 1.)
+    a = (rs * cc - rc * sc) / det
+    b = (rc * ss - rs * sc) / det
+    return a, b
+
+
+def _masked_mean(Y, W):
+    n = np.maximum(np.sum(W, axis=1), 1)
+    return np.sum(Y * W, axis=1) / n
+
+
+# ----------------------------------------------------------------------
+# models
+# ----------------------------------------------------------------------
+
+class SineModel(BatchModel):
+    '''y_offset + amplitude * sin(k * x + phase), as Sine.'''
+    names = ('amplitude', 'y_offset', 'k', 'phase')
+    units = ((1, 0), (1, 0), (0, -1), (0, 0))
+    lower = (0., -np.inf, 0., -np.inf)
+    upper = (np.inf, np.inf, np.inf, np.inf)
+    periodic = ('phase',)
+
+    def evaluate(self, u, P):
+        amplitude, y_offset, k, phase = (P[:, i:i+1] for i in range(4))
+        arg = k * u[None, :] + phase
+        s, c = np.sin(arg), np.cos(arg)
+        F = y_offset + amplitude * s
+        J = np.empty(F.shape + (4,))
+        J[..., 0] = s
+        J[..., 1] = 1.
+        J[..., 2] = amplitude * c * u[None, :]
+        J[..., 3] = amplitude * c
+        return F, J
+
+    def guess(self, u, Y, W):
+        y_offset = _masked_mean(Y, W)
+        k, amplitude, phase = oscillation_guesses(u, Y - y_offset[:, None], W)
+        # cos(theta + phase) = sin(theta + phase + pi/2)
+        phase = np.mod(phase + np.pi/2, 2*np.pi)
+        return np.stack([amplitude, y_offset, k, phase], axis=1)
+
+
+class DampedCosineModel(BatchModel):
+    '''B + A * exp(-x / tau) * cos(Omega * x + phi), e.g. a Rabi oscillation.'''
+    names = ('Omega', 'phi', 'B', 'A', 'tau')
+    units = ((0, -1), (0, 0), (1, 0), (1, 0), (0, 1))
+    lower = (0., -np.inf, -np.inf, 0., 0.)
+    upper = (np.inf, np.inf, np.inf, np.inf, np.inf)
+    periodic = ('phi',)
+
+    def evaluate(self, u, P):
+        Omega, phi, B, A, tau = (P[:, i:i+1] for i in range(5))
+        uu = u[None, :]
+        tau = np.where(tau != 0, tau, 1e-12)
+        e = np.exp(-uu / tau)
+        arg = Omega * uu + phi
+        c, s = np.cos(arg), np.sin(arg)
+        F = B + A * e * c
+        J = np.empty(F.shape + (5,))
+        J[..., 0] = -A * e * s * uu
+        J[..., 1] = -A * e * s
+        J[..., 2] = 1.
+        J[..., 3] = e * c
+        J[..., 4] = A * e * c * uu / tau**2
+        return F, J
+
+    def guess(self, u, Y, W):
+        B = _masked_mean(Y, W)
+        Omega, A, phi = oscillation_guesses(u, Y - B[:, None], W)
+        tau = 2 * _row_span(u, W)
+        return np.stack([Omega, phi, B, A, tau], axis=1)
+
+
+class LorentzianModel(BatchModel):
+    '''y_offset + amplitude * gamma / ((x - x_center)**2 + (gamma/2)**2), as
+    LorentzianFit.'''
+    names = ('amplitude', 'gamma', 'x_center', 'y_offset')
+    units = ((1, 1), (0, 1), (0, 1), (1, 0))
+    lower = (0., 0., -np.inf, -np.inf)
+    upper = (np.inf, np.inf, np.inf, np.inf)
+
+    def evaluate(self, u, P):
+        amplitude, gamma, x_center, y_offset = (P[:, i:i+1] for i in range(4))
+        d = u[None, :] - x_center
+        D = d**2 + (gamma / 2)**2
+        D = np.where(D > 0, D, 1e-300)
+        F = y_offset + amplitude * gamma / D
+        J = np.empty(F.shape + (4,))
+        J[..., 0] = gamma / D
+        J[..., 1] = amplitude / D - amplitude * gamma**2 / (2 * D**2)
+        J[..., 2] = 2 * amplitude * gamma * d / D**2
+        J[..., 3] = 1.
+        return F, J
+
+    def guess(self, u, Y, W):
+        y_offset = np.min(np.where(W, Y, np.inf), axis=1)
+        y_offset = np.where(np.isfinite(y_offset), y_offset, 0.)
+        Yb = np.clip(Y - y_offset[:, None], 0., None) * W
+        height = np.max(Yb, axis=1)
+        x_center = u[np.argmax(Yb, axis=1)]
+        # The area under the peak is 2 pi amplitude and its height is
+        # 4 amplitude / gamma.
+        du = np.abs(np.diff(u)).mean() if len(u) > 1 else 1.
+        amplitude = np.sum(Yb, axis=1) * du / (2 * np.pi)
+        gamma = np.where(height > 0, 4 * amplitude / np.where(height > 0, height, 1.),
+                         _row_span(u, W) / 4)
+        return np.stack([amplitude, gamma, x_center, y_offset], axis=1)
+
+
+class ExponentialDecayModel(BatchModel):
+    '''y_offset + coefficient * exp(-x / time_constant), as
+    ExponentialDecayFit.'''
+    names = ('coefficient', 'time_constant', 'y_offset')
+    units = ((1, 0), (0, 1), (1, 0))
+    lower = (0., 0., -np.inf)
+    upper = (np.inf, np.inf, np.inf)
+
+    def evaluate(self, u, P):
+        coefficient, time_constant, y_offset = (P[:, i:i+1] for i in range(3))
+        uu = u[None, :]
+        time_constant = np.where(time_constant != 0, time_constant, 1e-12)
+        e = np.exp(-uu / time_constant)
+        F = y_offset + coefficient * e
+        J = np.empty(F.shape + (3,))
+        J[..., 0] = e
+        J[..., 1] = coefficient * e * uu / time_constant**2
+        J[..., 2] = 1.
+        return F, J
+
+    def guess(self, u, Y, W):
+        y_max = np.max(np.where(W, Y, -np.inf), axis=1)
+        y_min = np.min(np.where(W, Y, np.inf), axis=1)
+        coefficient = np.where(np.isfinite(y_max - y_min), y_max - y_min, 1.)
+        y_offset = np.where(np.isfinite(y_min), y_min, 0.)
+        time_constant = _row_span(u, W) / 5
+        return np.stack([coefficient, time_constant, y_offset], axis=1)
+
+
+class SineEnvelopeModel(BatchModel):
+    '''y_offset + amplitude * exp(-(x-x_center)**2 / (2 sigma**2))
+    * (1 + contrast * cos(k * (x-x_center) + phase)), as SineEnvelope.'''
+    names = ('amplitude', 'sigma', 'x_center', 'y_offset', 'contrast', 'k', 'phase')
+    units = ((1, 0), (0, 1), (0, 1), (1, 0), (0, 0), (0, -1), (0, 0))
+    lower = (-1., 0., -np.inf, 0., 0., 0., -np.inf)
+    upper = (np.inf,) * 7
+    periodic = ('phase',)
+
+    def evaluate(self, u, P):
+        amplitude, sigma, x_center, y_offset, contrast, k, phase = \
+            (P[:, i:i+1] for i in range(7))
+        sigma = np.where(sigma != 0, sigma, 1e-12)
+        d = u[None, :] - x_center
+        g = np.exp(-d**2 / (2 * sigma**2))
+        arg = k * d + phase
+        c, s = np.cos(arg), np.sin(arg)
+        w = 1 + contrast * c
+        F = y_offset + amplitude * g * w
+        J = np.empty(F.shape + (7,))
+        J[..., 0] = g * w
+        J[..., 1] = amplitude * g * w * d**2 / sigma**3
+        J[..., 2] = amplitude * g * (w * d / sigma**2 + contrast * s * k)
+        J[..., 3] = 1.
+        J[..., 4] = amplitude * g * c
+        J[..., 5] = -amplitude * g * contrast * s * d
+        J[..., 6] = -amplitude * g * contrast * s
+        return F, J
+
+    def guess(self, u, Y, W):
+        Yg = np.where(W, Y, _masked_mean(Y, W)[:, None])
+        amplitude, sigma, x_center, y_offset = gaussian_moment_guesses(u, Yg).T
+        d = u[None, :] - x_center[:, None]
+        g = np.exp(-d**2 / (2 * sigma[:, None]**2))
+        # The fringes within two sigmas of the center, relative to the envelope.
+        near = W & (np.abs(d) <= 2 * sigma[:, None])
+        R = (Y - y_offset[:, None] - amplitude[:, None] * g) * near
+        k = _fft_wavenumber(u, R, near)
+        a, b = _quadrature_amplitudes(k[:, None] * d, R, near * g)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            contrast = np.hypot(a, b) / amplitude
+        contrast = np.where(np.isfinite(contrast), np.clip(contrast, 0., 1.), 0.1)
+        phase = np.mod(np.arctan2(-a, b), 2*np.pi)
+        return np.stack([amplitude, sigma, x_center, y_offset, contrast, k, phase], axis=1)
+
+
+class PolynomialModel(BatchModel):
+    '''
+    a0 + a1 * x + ... + a_degree * x**degree, solved in closed form
+    (weighted least squares).
+
+    Parameters
+    ----------
+    degree: int
+    '''
+
+    def __init__(self, degree):
+        self.degree = int(degree)
+        self.names = tuple(f'a{j}' for j in range(self.degree + 1))
+        self.units = tuple((1, -j) for j in range(self.degree + 1))
+        # Maps the coefficients a0...a_degree to the output parameters.
+        self._transform = np.eye(self.degree + 1)
+
+    def _vandermonde(self, u):
+        return u[:, None] ** np.arange(self.degree + 1)[None, :]
+
+    def _solve(self, u, Y, W):
+        V = self._vandermonde(u)
+        Wf = W.astype(float)
+        A = np.einsum('nm,mi,mj->nij', Wf, V, V)
+        rhs = np.einsum('nm,mi,nm->ni', Wf, V, Y)
+        k = V.shape[1]
+        ok = np.linalg.matrix_rank(A) == k
+        A_safe = np.where(ok[:, None, None], A, np.eye(k))
+        P = np.linalg.solve(A_safe, rhs[..., None])[..., 0]
+        r = (Y - P @ V.T) * Wf
+        dof = np.count_nonzero(W, axis=1) - k
+        s_sq = np.where(dof > 0, np.sum(r**2, axis=1) / np.maximum(dof, 1), np.inf)
+        pcov = np.linalg.inv(A_safe) * s_sq[:, None, None]
+        success = ok & np.all(np.isfinite(P), axis=1)
+        return P, pcov, success
+
+    def _to_output(self, popt, pcov):
+        T = self._transform
+        return popt @ T, np.einsum('ji,njk,kl->nil', T, pcov, T)
+
+    def evaluate(self, u, P):
+        coeffs = P @ np.linalg.inv(self._transform)
+        V = self._vandermonde(u)
+        return coeffs @ V.T, np.broadcast_to(V, (P.shape[0],) + V.shape)
+
+
+class LinearModel(PolynomialModel):
+    '''slope * x + offset, as LinearFit.'''
+
+    def __init__(self):
+        super().__init__(1)
+        self.names = ('slope', 'offset')
+        self._transform = np.array([[0., 1.], [1., 0.]])
+
+
+class QuadraticModel(PolynomialModel):
+    '''a0 + a1 * x + a2 * x**2, as QuadraticFit.'''
+
+    def __init__(self):
+        super().__init__(2)
+
+
+class KinematicModel(PolynomialModel):
+    '''x0 + v0 * t + 1/2 * a * t**2, as KinematicFit.'''
+
+    def __init__(self):
+        super().__init__(2)
+        self.names = ('x0', 'v0', 'a')
+        self._transform = np.diag([1., 1., 2.])
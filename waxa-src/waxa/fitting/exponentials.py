@@ -1,8 +1,11 @@
 from waxa.fitting.fit import Fit
+from waxa.fitting.batch_models import ExponentialDecayModel
 import numpy as np
 from scipy.optimize import curve_fit
 
 class ExponentialDecayFit(Fit):
+    batch_model = ExponentialDecayModel()
+
     def __init__(self,xdata,ydata):
         super().__init__(xdata,ydata,savgol_window=20)
         self.popt = self._fit(self.xdata,self.ydata)
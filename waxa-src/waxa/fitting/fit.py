@@ -2,9 +2,17 @@ import numpy as np
 from scipy.signal import savgol_filter
 import matplotlib.pyplot as plt
 import copy
+from functools import cached_property
 from waxa.helper import crop_array_by_index, remove_infnan
+from waxa.fitting.batch_models import fit_batch
 
 class Fit():
+    # The BatchModel used by Fit.batch, set by the subclasses that support it.
+    batch_model = None
+
+    _savgol_window = 5
+    _savgol_degree = 3
+
     def __init__(self,xdata,ydata,
                  include_idx=[0,-1],exclude_idx=[],
                  savgol_window=5,savgol_degree=3):
@@ -27,7 +35,7 @@ class Fit():
         xdata
         ydata
         y_fitdata
-        ydata_smoothed
+        ydata_smoothed: computed on first access.
         '''
         xdata = np.asarray(xdata)
         ydata = np.asarray(ydata)
@@ -41,11 +49,18 @@ class Fit():
 
         self.popt = []
         self.y_fitdata = []
-        
+
+        self._savgol_window = savgol_window
+        self._savgol_degree = savgol_degree
+
+    @cached_property
+    def ydata_smoothed(self):
+        '''ydata smoothed with a Savitzky-Golay filter (for fit guess
+        purposes). Computed on first access.'''
         try:
-            self.ydata_smoothed = savgol_filter(self.ydata,savgol_window,savgol_degree)
+            return savgol_filter(self.ydata,self._savgol_window,self._savgol_degree)
         except:
-            self.ydata_smoothed = copy.deepcopy(self.ydata)
+            return copy.deepcopy(self.ydata)
 
     # def get_plot_fitdata(self):
     #     Nsample = len(self.xdata)*500
@@ -53,6 +68,28 @@ class Fit():
     #     yplot = self._fit_func(xplot,*self.popt)
     #     return (xplot, yplot)
 
+    @classmethod
+    def batch(cls,xdata,Ydata,p0=None,**kwargs):
+        '''
+        Fits this model to many curves at once (see fit_batch).
+
+        Arguments
+        ----------
+        xdata: Array
+            The shared independent variable, of length m.
+        Ydata: Array
+            The curves, of shape (..., m). NaN points are left out.
+        p0: Array or None
+            Initial guesses. If None, they are computed for every curve.
+
+        Returns
+        -------
+        BatchFitResults
+        '''
+        if cls.batch_model is None:
+            raise NotImplementedError(f"{cls.__name__} has no batch model.")
+        return fit_batch(cls.batch_model,xdata,Ydata,p0=p0,**kwargs)
+
     def _fit_func(self,x):
         pass
 
@@ -0,0 +1,186 @@
+import numpy as np
+from waxa.fitting.gaussian import GaussianFit
+
+GAUSSIAN_PARAM_NAMES = ('amplitude', 'sigma', 'x_center', 'y_offset')
+
+
+class GaussianFitResults():
+    '''
+    Columnar storage for many Gaussian fits that share an x axis.
+
+    Each fit parameter (amplitude, sigma, x_center, y_offset, area), the
+    covariance (pcov) and the success flag is stored as one array shaped like
+    the grid of fitted profiles (e.g. the xvar grid), so extracting a
+    parameter, slicing or reordering the fits are array operations rather
+    than loops over fit objects.
+
+    Indexing behaves like the object array of GaussianFit that this replaces:
+    indexing down to a single fit returns a GaussianFit built from the stored
+    parameters, while any other index returns a GaussianFitResults over the
+    selected fits. ``np.take``, ``np.squeeze``, ``np.reshape`` and
+    ``np.transpose`` act on the grid axes.
+
+    Attributes
+    ----------
+    xdata: np.ndarray
+        The (m,) x axis shared by all fits.
+    ydata: np.ndarray
+        The fitted profiles, of shape shape + (m,).
+    amplitude, sigma, x_center, y_offset, area: np.ndarray
+        Fit parameters, each of shape ``shape``. NaN where the fit failed.
+    pcov: np.ndarray
+        Parameter covariances, of shape shape + (4, 4).
+    success: np.ndarray
+        Bool array of shape ``shape``.
+    estimate: bool
+        True if the parameters are estimates from the moments of the profiles
+        (see moments_gaussian_sum_dist) rather than fits.
+    '''
+
+    # Default for results pickled before estimate was stored.
+    estimate = False
+
+    def __init__(self, xdata, ydata, popt, pcov=None, success=None, estimate=False):
+        '''
+        Parameters
+        ----------
+        xdata: ArrayLike
+            The (m,) shared x axis.
+        ydata: ArrayLike
+            The profiles, of shape shape + (m,).
+        popt: ArrayLike
+            Fit parameters (amplitude, sigma, x_center, y_offset), of shape
+            shape + (4,).
+        pcov: ArrayLike or None
+            Covariances, of shape shape + (4, 4). NaN if None.
+        success: ArrayLike or None
+            Bool array of shape ``shape``. If None, a fit is successful when
+            all of its parameters are finite.
+        estimate: bool
+        '''
+        self.xdata = np.asarray(xdata)
+        self.ydata = ydata
+        popt = np.asarray(popt, dtype=float)
+        for i, name in enumerate(GAUSSIAN_PARAM_NAMES):
+            vars(self)[name] = popt[..., i]
+        self.area = self.amplitude * np.sqrt(2 * np.pi * self.sigma**2)
+        if pcov is None:
+            pcov = np.full(popt.shape + (4,), np.nan)
+        self.pcov = np.asarray(pcov, dtype=float)
+        if success is None:
+            success = np.all(np.isfinite(popt), axis=-1)
+        self.success = np.asarray(success, dtype=bool)
+        self.estimate = bool(estimate)
+
+    @classmethod
+    def _from_columns(cls, xdata, ydata, columns, estimate=False):
+        out = cls.__new__(cls)
+        out.xdata = xdata
+        out.ydata = ydata
+        vars(out).update(columns)
+        out.estimate = estimate
+        return out
+
+    def _columns(self):
+        return {name: vars(self)[name]
+                for name in (*GAUSSIAN_PARAM_NAMES, 'area', 'pcov', 'success')}
+
+    def _apply(self, func):
+        # func maps an array with the grid on its leading axes to another.
+        columns = {k: func(v) for k, v in self._columns().items()}
+        return self._from_columns(self.xdata, func(np.asarray(self.ydata)), columns,
+                                  estimate=self.estimate)
+
+    # ------------------------------------------------------------------
+    # array-like interface
+    # ------------------------------------------------------------------
+
+    @property
+    def shape(self):
+        return self.amplitude.shape
+
+    @property
+    def ndim(self):
+        return self.amplitude.ndim
+
+    @property
+    def size(self):
+        return self.amplitude.size
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"GaussianFitResults(shape={self.shape}, n_failed={int(np.sum(~self.success))})"
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, key):
+        if np.ndim(self.amplitude[key]) == 0:
+            return GaussianFit.from_params(self.xdata,
+                                           np.asarray(self.ydata)[key],
+                                           self.popt[key],
+                                           pcov=self.pcov[key])
+        return self._apply(lambda v: v[key])
+
+    @property
+    def popt(self):
+        '''Fit parameters (amplitude, sigma, x_center, y_offset), of shape
+        shape + (4,).'''
+        return np.stack([vars(self)[name] for name in GAUSSIAN_PARAM_NAMES], axis=-1)
+
+    @property
+    def y_fitdata(self):
+        '''The fit functions evaluated on xdata, of shape shape + (m,).'''
+        a, s, x0, y0 = (vars(self)[name][..., None] for name in GAUSSIAN_PARAM_NAMES)
+        return y0 + a * np.exp(-(self.xdata - x0)**2 / (2 * s**2))
+
+    def get(self, attr):
+        '''Returns the array for the fit attribute attr, shaped like the grid
+        of fits.'''
+        if attr == 'popt':
+            return self.popt
+        if attr == 'y_fitdata':
+            return self.y_fitdata
+        if attr in ('xdata', 'ydata'):
+            return np.broadcast_to(np.asarray(vars(self)[attr]), self.shape + (len(self.xdata),))
+        return vars(self)[attr]
+
+    def take(self, indices, axis=None, out=None, mode='raise'):
+        if out is not None:
+            raise ValueError("GaussianFitResults.take does not support out.")
+        if axis is None:
+            return self.reshape(-1).take(indices, axis=0, mode=mode)
+        axis = axis % self.ndim
+        return self._apply(lambda v: np.take(v, indices, axis=axis, mode=mode))
+
+    def squeeze(self, axis=None):
+        if axis is None:
+            axis = tuple(i for i, n in enumerate(self.shape) if n == 1)
+        axis = np.atleast_1d(axis) % self.ndim
+        return self._apply(lambda v: np.squeeze(v, axis=tuple(axis)))
+
+    def reshape(self, *shape, order='C'):
+        if len(shape) == 1 and isinstance(shape[0], (tuple, list)):
+            shape = tuple(shape[0])
+        return self._apply(lambda v: v.reshape(*shape, *v.shape[self.ndim:], order=order))
+
+    def transpose(self, *axes):
+        if len(axes) == 1 and isinstance(axes[0], (tuple, list)):
+            axes = tuple(axes[0])
+        if not axes:
+            axes = tuple(reversed(range(self.ndim)))
+        return self._apply(lambda v: np.transpose(v, (*axes, *range(self.ndim, v.ndim))))
+
+    @classmethod
+    def concatenate(cls, results, axis=0):
+        '''Joins GaussianFitResults that share an x axis along a grid axis.'''
+        results = list(results)
+        axis = axis % results[0].ndim
+        columns = {k: np.concatenate([r._columns()[k] for r in results], axis=axis)
+                   for k in results[0]._columns()}
+        ydata = np.concatenate([np.asarray(r.ydata) for r in results], axis=axis)
+        return cls._from_columns(results[0].xdata, ydata, columns,
+                                 estimate=any(r.estimate for r in results))
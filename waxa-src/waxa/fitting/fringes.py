@@ -1,15 +1,25 @@
 from waxa.fitting.fit import Fit
-from waxa.fitting import GaussianFit
+from waxa.fitting.batch_models import SineEnvelopeModel
 
-from scipy.signal import find_peaks
 from scipy.optimize import curve_fit
 
 import numpy as np
 
 class SineEnvelope(Fit):
+    batch_model = SineEnvelopeModel()
+
     def __init__(self,xdata,ydata,
                 include_idx=[0,-1],exclude_idx=[],
-                override_center=None):
+                override_center=None,
+                p0=None):
+        '''
+        Arguments
+        ----------
+        p0: Array or None
+            Initial guesses (amplitude, sigma, x_center, y_offset, contrast, k,
+            phase), e.g. from a batch fit. If given, the spectral guess
+            routine is skipped.
+        '''
         super().__init__(xdata,ydata,
                         include_idx=include_idx,exclude_idx=exclude_idx,
                         savgol_window=20)
@@ -17,14 +27,9 @@ class SineEnvelope(Fit):
         # self.xdata, self.ydata = self.remove_infnan(self.xdata,self.ydata)
 
         self.override_center = override_center
+        self._p0 = p0
 
         try:
-            gfit = GaussianFit(xdata,ydata)
-            self.gfit = gfit
-            self.xdata = gfit.xdata
-            # self.ydata = gfit.ydata - gfit.y_fitdata
-
-            self.ydata = self.gfit.ydata
             self.popt, self.pcov = self._fit(self.xdata,self.ydata)
         except Exception as e:
             print(e)
@@ -69,31 +74,22 @@ class SineEnvelope(Fit):
         x0: float
         offset: float
         '''
-        guesses = self._guesses(x,y)
+        if self._p0 is None:
+            guesses = self._guesses(x,y)
+        else:
+            guesses = self._p0
         popt, pcov = curve_fit(self._fit_func, x, y,
                                 p0=guesses,
                                 bounds=((-1.,0,-np.inf,0,0,0,0.),(np.inf,np.inf,np.inf,np.inf,np.inf,np.inf,np.inf)))
         return popt, pcov
         
     def _guesses(self,x,y):
-        amplitude_guess = self.gfit.amplitude
-        x_center_guess = self.gfit.x_center
-        sigma_guess = self.gfit.sigma
-        fringes_nogauss = self.ydata - self.gfit.y_fitdata
-        self._fringe_data = fringes_nogauss
-
-        fringe_rms = np.sqrt(np.mean(fringes_nogauss**2))
-        self.frms = fringe_rms
-    
-        contrast_guess = fringe_rms 
-
-        prom = fringe_rms
-        idx, _ = find_peaks(y, prominence=prom, distance = 4)
-        self._x_peaks = x[idx]
-        lambda_guess = np.mean(np.diff(x[idx]))
-        k_guess = 2*np.pi/lambda_guess 
-        phase_guess = k_guess * x[self._find_idx(x_center_guess,x[idx])] + np.pi/4
-        y_offset_guess = (np.max(y) - np.min(y))
+        # The envelope from the moments of the data, which unlike a Gaussian
+        # fit does not lock on to a single bright fringe, and the fringes from
+        # the spectrum of what is left (see SineEnvelopeModel.guess).
+        guesses = self.batch_model.guess(x, y[None,:], np.ones((1,len(y)),dtype=bool))[0]
+        amplitude_guess, sigma_guess, x_center_guess, y_offset_guess, contrast_guess, k_guess, phase_guess = guesses
+        y_offset_guess = max(y_offset_guess, 0.)
         return amplitude_guess, sigma_guess, x_center_guess, y_offset_guess, contrast_guess, k_guess, phase_guess
     
     def _find_idx(self,x0,x):
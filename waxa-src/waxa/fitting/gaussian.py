@@ -3,9 +3,16 @@ from scipy.optimize import curve_fit
 from scipy.signal import find_peaks
 import matplotlib.pyplot as plt
 import kamo.constants as c
+from functools import cached_property
 from waxa.fitting.fit import Fit
+from waxa.fitting.batch import GAUSSIAN_FIT_WINDOW_SIGMAS
 
 class GaussianFit(Fit):
+    # Settings of the smoothing and peak search for the fit guesses.
+    _px_boxcar_smoothing = 3
+    _fractional_peak_prominence = 0.01
+    _peak_distance_px = None
+
     def __init__(self,xdata,ydata,debug_plotting=False,
                  which_peak=0,
                  px_boxcar_smoothing=3,
@@ -14,26 +21,65 @@ class GaussianFit(Fit):
                  use_peak_bases_for_amplitude=False,
                  include_idx = [0,-1],
                  exclude_idx = [],
-                 print_errors = True):
+                 print_errors = True,
+                 p0 = None):
+        '''
+        Arguments
+        ----------
+        p0: Array or None
+            Initial guesses (amplitude, sigma, x_center, y_offset), e.g. from
+            a batch fit. If given, the guess routine (smoothing and peak
+            search) is skipped, and the fit is restricted to
+            GAUSSIAN_FIT_WINDOW_SIGMAS sigmas about x_center.
+        '''
         super().__init__(xdata,ydata,
                          include_idx=include_idx,exclude_idx=exclude_idx,
                          savgol_window=20)
 
         self._debug_plotting = debug_plotting
+        self._px_boxcar_smoothing = px_boxcar_smoothing
+        self._fractional_peak_prominence = fractional_peak_prominence
+        self.pcov = np.full((4, 4), np.nan)
 
         try:
             popt = self._fit(self.xdata,self.ydata,
                              which_peak,
-                             px_boxcar_smoothing,
                              fractional_peak_height_at_width,
                              use_peak_bases_for_amplitude,
-                             fractional_peak_prominence)
+                             p0)
         except Exception as e:
             if print_errors:
                 print(e)
             popt = [np.nan] * 4
             self.y_fitdata = np.zeros(self.ydata.shape); self.y_fitdata.fill(np.nan)
 
+        self._set_params(popt)
+
+    @classmethod
+    def from_params(cls, xdata, ydata, popt, y_fitdata=None, pcov=None):
+        '''
+        Builds a GaussianFit from already-fitted parameters without refitting,
+        e.g. from the results of waxa.fitting.batch.fit_gaussian_batch.
+
+        Parameters
+        ----------
+        xdata, ydata: ArrayLike
+        popt: ArrayLike
+            (amplitude, sigma, x_center, y_offset)
+        y_fitdata: ArrayLike or None
+            The fit function evaluated on xdata, if already computed.
+        pcov: ArrayLike or None
+            The (4, 4) covariance of popt. NaN if None.
+        '''
+        fit = cls.__new__(cls)
+        fit.xdata = np.asarray(xdata)
+        fit.ydata = np.asarray(ydata)
+        fit._debug_plotting = False
+        fit.pcov = np.full((4, 4), np.nan) if pcov is None else np.asarray(pcov)
+        fit._set_params(popt, y_fitdata)
+        return fit
+
+    def _set_params(self, popt, y_fitdata=None):
         amplitude, sigma, x_center, y_offset = popt
         self.popt = popt
         self.amplitude = amplitude
@@ -41,7 +87,9 @@ class GaussianFit(Fit):
         self.x_center = x_center
         self.y_offset = y_offset
 
-        self.y_fitdata = self._fit_func(self.xdata,*popt)
+        if y_fitdata is None:
+            y_fitdata = self._fit_func(self.xdata,*popt)
+        self.y_fitdata = y_fitdata
 
         self.area = self.amplitude * np.sqrt( 2 * np.pi * self.sigma**2 )
 
@@ -50,10 +98,9 @@ class GaussianFit(Fit):
 
     def _fit(self, x, y,
              which_peak,
-             px_boxcar_smoothing,
              fractional_peak_height_at_width,
              use_peak_bases_for_amplitude,
-             fractional_peak_prominence):
+             p0=None):
         """Returns the gaussian fit parameters for y(x).
 
         Fit equation: offset + amplitude * np.exp( -(x-x0)**2 / (2 * sigma**2) )
@@ -63,19 +110,23 @@ class GaussianFit(Fit):
             y (np.array):
             which_peak (int, optional): Which peak (in order of prominence) to
             fit. Defaults to 0.
+            p0 (optional): Initial guesses. If None, they are computed by
+            _gaussian_guesses.
 
         Returns:
             popt: _description_
         """
 
-        out = self._gaussian_guesses(x,y,
-                                     which_peak,
-                                     px_boxcar_smoothing,
-                                     fractional_peak_height_at_width,
-                                     use_peak_bases_for_amplitude,
-                                     fractional_peak_prominence)
-        fit_mask = out[0]
-        guesses = out[1:]
+        if p0 is None:
+            out = self._gaussian_guesses(x,y,
+                                         which_peak,
+                                         fractional_peak_height_at_width,
+                                         use_peak_bases_for_amplitude)
+            fit_mask = out[0]
+            guesses = out[1:]
+        else:
+            guesses = p0
+            fit_mask = self._fit_window(x, guesses)
 
         popt, pcov = curve_fit(self._fit_func, x[fit_mask], y[fit_mask],
                         p0=[*guesses],
@@ -84,29 +135,54 @@ class GaussianFit(Fit):
                         ftol=1e-6,
                         xtol=1e-6,
                         gtol=1e-5)
+        self.pcov = pcov
         return popt
-    
-    def _gaussian_guesses(self,x,y,
-                          which_peak,
-                          px_boxcar_smoothing_width=10,
-                          fractional_peak_height_at_width=0.4,
-                          use_peak_bases=False,
-                          fractional_peak_prominence=0.01):
-        
-        # smooth the data
-        convwidth = px_boxcar_smoothing_width
-        ysm = np.convolve(y,[1/convwidth]*convwidth,mode='same')
-        # shift and normalize between 0 and 1
+
+    def _fit_window(self, x, guesses):
+        # The points within GAUSSIAN_FIT_WINDOW_SIGMAS sigmas of the guessed
+        # center, or all of them if that leaves too few to fit.
+        _, sigma, x_center, _ = guesses
+        fit_mask = np.flatnonzero(np.abs(x - x_center) <= GAUSSIAN_FIT_WINDOW_SIGMAS * sigma)
+        if len(fit_mask) < 4:
+            fit_mask = np.arange(len(x))
+        return fit_mask
+
+    @cached_property
+    def ydata_boxcar_smoothed(self):
+        '''ydata smoothed with a boxcar of _px_boxcar_smoothing points, then
+        shifted and normalized between 0 and 1 (for fit guess purposes).
+        Computed on first access.'''
+        convwidth = self._px_boxcar_smoothing
+        ysm = np.convolve(self.ydata,[1/convwidth]*convwidth,mode='same')
         ynorm = ysm-np.min(ysm)
         try:
             ynorm = ynorm/(np.max(ynorm) - np.min(ynorm))
         except:
             print(ynorm)
+        return ynorm
+
+    @cached_property
+    def peaks(self):
+        '''(peak_idx, properties) of the peaks of ydata_boxcar_smoothed, as
+        returned by scipy.signal.find_peaks. Computed on first access.'''
+        convwidth = self._px_boxcar_smoothing
+        peak_idx, prop = find_peaks(self.ydata_boxcar_smoothed[convwidth:],
+                                    prominence=self._fractional_peak_prominence,
+                                    distance=self._peak_distance_px)
+        return peak_idx + convwidth, prop
+
+    def _gaussian_guesses(self,x,y,
+                          which_peak,
+                          fractional_peak_height_at_width=0.4,
+                          use_peak_bases=False):
+
+        # smoothed data, shifted and normalized between 0 and 1
+        convwidth = self._px_boxcar_smoothing
+        ynorm = self.ydata_boxcar_smoothed
 
-        peak_idx, prop = find_peaks(ynorm[convwidth:],prominence=fractional_peak_prominence)
+        peak_idx, prop = self.peaks
         if len(peak_idx) == 0:
             raise RuntimeError("No peaks detected for Gaussian guess.")
-        peak_idx += convwidth
         # get the most prominent peak if > 1
         prom = prop['prominences']
         which_peak = int(max(0, min(which_peak, len(prom) - 1)))
@@ -224,18 +300,20 @@ class MultiGaussianFit(GaussianFit,Fit):
                  peak_distance_px=3,
                  include_idx = [0,-1],
                  exclude_idx = []):
-        super().__init__(xdata,ydata,
-                         include_idx=include_idx,exclude_idx=exclude_idx)
+        # Fit.__init__ rather than GaussianFit.__init__, which would also do
+        # a single gaussian fit.
+        Fit.__init__(self,xdata,ydata,
+                     include_idx=include_idx,exclude_idx=exclude_idx)
 
         self._debug_plotting = debug_plots
+        self._px_boxcar_smoothing = px_boxcar_smoothing_width
+        self._fractional_peak_prominence = fractional_peak_prominence
+        self._peak_distance_px = peak_distance_px
         self.N_peaks = N_peaks
         n_params = 4
         self._prepare_fit_result_lists(N_peaks,n_params)
         self.popt = self._fit(self.xdata,self.ydata,0,
-                              fractional_peak_prominence,
-                              fractional_peak_height_at_width,
-                              px_boxcar_smoothing_width,
-                              peak_distance_px)
+                              fractional_peak_height_at_width)
         self._assign_fit_results()
 
     def _prepare_fit_result_lists(self,N_peaks,n_params):
@@ -298,10 +376,7 @@ class MultiGaussianFit(GaussianFit,Fit):
 
     def _fit(self, x, y,
             which_peak,
-            fractional_peak_prominence,
-            fractional_peak_height_at_width,
-            px_boxcar_smoothing_width,
-            peak_distance_px):
+            fractional_peak_height_at_width):
         '''
         Returns the gaussian fit parameters for y(x).
 
@@ -320,10 +395,7 @@ class MultiGaussianFit(GaussianFit,Fit):
             guesses = []
             for i in range(self.N_peaks):
                 out = self._gaussian_guesses(x,y,which_peak=i,
-                                             fractional_peak_prominence=fractional_peak_prominence,
-                                             fractional_peak_height_at_width=fractional_peak_height_at_width,
-                                             px_boxcar_smoothing_width=px_boxcar_smoothing_width,
-                                             peak_distance_px=peak_distance_px)
+                                             fractional_peak_height_at_width=fractional_peak_height_at_width)
                 offsets.append(out[1])
                 guess = out[2:]
                 for g in guess:
@@ -346,23 +418,13 @@ class MultiGaussianFit(GaussianFit,Fit):
 
     def _gaussian_guesses(self,x,y,
                           which_peak,
-                          fractional_peak_prominence=0.01,
-                          fractional_peak_height_at_width=0.4,
-                          px_boxcar_smoothing_width=3,
-                          peak_distance_px=3):
-        # smooth the data
-        convwidth = px_boxcar_smoothing_width
-        ysm = np.convolve(y,[1/convwidth]*convwidth,mode='same')
-        # shift and normalize between 0 and 1
-        ynorm = ysm-np.min(ysm)
-        try:
-            ynorm = ynorm/(np.max(ynorm) - np.min(ynorm))
-        except:
-            print(ynorm)
+                          fractional_peak_height_at_width=0.4):
+        # smoothed data, shifted and normalized between 0 and 1. The smoothing
+        # and peak search are done once and shared by the guesses of all the
+        # peaks.
+        ynorm = self.ydata_boxcar_smoothed
 
-        peak_idx, prop = find_peaks(ynorm[convwidth:],prominence=fractional_peak_prominence,
-                                    distance=peak_distance_px)
-        peak_idx += convwidth
+        peak_idx, prop = self.peaks
         # get the "which_peak"th most prominent peak
         prom = prop['prominences']
         prom_indices = np.flip(np.argsort(prom))
@@ -1,8 +1,11 @@
 from waxa.fitting import Fit
+from waxa.fitting.batch_models import LinearModel
 from scipy.optimize import curve_fit
 import numpy as np
 
 class LinearFit(Fit):
+    batch_model = LinearModel()
+
     def __init__(self,xdata,ydata,
                  include_idx = [0,-1],
                  exclude_idx = []):
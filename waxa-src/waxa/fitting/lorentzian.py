@@ -2,8 +2,11 @@ import numpy as np
 from scipy.optimize import curve_fit
 import kamo.constants as c
 from waxa.fitting.fit import Fit
+from waxa.fitting.batch_models import LorentzianModel
 
 class LorentzianFit(Fit):
+    batch_model = LorentzianModel()
+
     def __init__(self,xdata,ydata,
                  force_zero_offset=False,
                  include_idx = [0,-1],
@@ -2,8 +2,11 @@ import numpy as np
 from scipy.optimize import curve_fit
 import kamo.constants as c
 from waxa.fitting.fit import Fit
+from waxa.fitting.batch_models import KinematicModel, QuadraticModel
 
 class KinematicFit(Fit):
+    batch_model = KinematicModel()
+
     def __init__(self,xdata,ydata,
                  include_idx = [0,-1],
                  exclude_idx = []):
@@ -57,6 +60,8 @@ class KinematicFit(Fit):
         return popt, pcov
     
 class QuadraticFit(Fit):
+    batch_model = QuadraticModel()
+
     def __init__(self,xdata,ydata,
                  include_idx = [0,-1],
                  exclude_idx = []):
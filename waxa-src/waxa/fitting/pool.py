@@ -0,0 +1,164 @@
+import atexit
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Number of worker processes of the session fit pool. None uses os.cpu_count().
+FIT_POOL_MAX_WORKERS = None
+
+# Profiles handed to a worker per task. Larger chunks amortize the task
+# overhead; smaller ones balance the load across workers.
+FIT_POOL_CHUNK_SIZE = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _attach(name):
+    # Workers only read the block; the parent owns (and unlinks) it, so the
+    # workers do not track it. Before Python 3.13 attaching always registers
+    # the block, with the resource tracker the workers share with the parent.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _fit_rows(fit_row, x, Y, rows, n_params):
+    out = np.full((len(rows), n_params), np.nan)
+    n_failed = 0
+    for j, i in enumerate(rows):
+        params = fit_row(x, np.array(Y[i]))
+        if params is None:
+            n_failed += 1
+        else:
+            out[j] = params
+    return out, n_failed
+
+
+def _fit_rows_worker(fit_row, shm_name, shape, dtype, x, rows, n_params):
+    # Module-level so that it is importable by the loky workers.
+    shm = _attach(shm_name)
+    try:
+        Y = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = _fit_rows(fit_row, x, Y, rows, n_params)
+        del Y
+    finally:
+        shm.close()
+    return result
+
+
+class FitPool():
+    """
+    A long-lived pool of fitting processes, shared by every fit in the session.
+
+    The processes are started on first use and kept alive between calls (they
+    are loky's reusable workers, which also work in Jupyter on Windows). The
+    profiles to fit are copied once into a shared memory block that the
+    workers read from, and each worker returns only the fitted parameters as a
+    float array, so neither the profiles nor fit objects are pickled per fit.
+
+    Use get_fit_pool() to get the session pool.
+
+    Parameters
+    ----------
+    max_workers: int or None
+        Number of worker processes. If None, os.cpu_count(). With one worker
+        the fits run in the calling process.
+    chunk_size: int
+        Number of profiles fitted per task.
+    """
+
+    def __init__(self, max_workers=FIT_POOL_MAX_WORKERS, chunk_size=FIT_POOL_CHUNK_SIZE):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = max(int(chunk_size), 1)
+        self._executor = None
+
+    def _get_executor(self):
+        from joblib.externals.loky import get_reusable_executor
+        # get_reusable_executor hands back the same executor (and processes)
+        # as long as it is alive and called with the same arguments.
+        self._executor = get_reusable_executor(max_workers=self.max_workers,
+                                               reuse=True)
+        return self._executor
+
+    def map_rows(self, fit_row, x, Y, rows, n_params):
+        """
+        Fits rows of Y in the worker processes.
+
+        Parameters
+        ----------
+        fit_row: callable
+            A module-level function fit_row(x, y) that returns the fitted
+            parameters of the profile y as an (n_params,) array, or None if
+            the fit failed.
+        x: ArrayLike
+            The (m,) shared x axis.
+        Y: ArrayLike
+            The (N, m) profiles.
+        rows: ArrayLike of int
+            The rows of Y to fit.
+        n_params: int
+
+        Returns
+        -------
+        params: np.ndarray
+            (len(rows), n_params) fitted parameters, NaN where the fit failed.
+        n_failed: int
+            The number of fits that failed.
+        """
+        rows = np.asarray(rows, dtype=int)
+        params = np.full((len(rows), n_params), np.nan)
+        if len(rows) == 0:
+            return params, 0
+        x = np.asarray(x)
+        if self.max_workers <= 1:
+            return _fit_rows(fit_row, x, Y, rows, n_params)
+        Y = np.ascontiguousarray(Y)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(Y.nbytes, 1))
+        try:
+            np.ndarray(Y.shape, dtype=Y.dtype, buffer=shm.buf)[...] = Y
+            executor = self._get_executor()
+            n_chunks = min(self.max_workers * 4, -(-len(rows) // self.chunk_size))
+            chunks = np.array_split(np.arange(len(rows)), max(n_chunks, 1))
+            futures = [(c, executor.submit(_fit_rows_worker, fit_row, shm.name,
+                                           Y.shape, Y.dtype.str, x, rows[c], n_params))
+                       for c in chunks]
+            n_failed = 0
+            for c, future in futures:
+                params[c], failed = future.result()
+                n_failed += failed
+        finally:
+            shm.close()
+            shm.unlink()
+        return params, n_failed
+
+    def shutdown(self):
+        """Stops the worker processes. They are restarted on the next fit."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def get_fit_pool():
+    """Returns the session FitPool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = FitPool()
+        return _pool
+
+
+def shutdown_fit_pool():
+    """Stops the worker processes of the session FitPool, if started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown_fit_pool)
@@ -1,18 +1,28 @@
 from waxa.fitting import Fit, GaussianFit
-from waxa.helper import normalize
+from waxa.fitting.batch_models import SineModel, oscillation_guesses
 
-from scipy.signal import find_peaks
 from scipy.optimize import curve_fit
 
 import numpy as np
 
 class Sine(Fit):
+    batch_model = SineModel()
+
     def __init__(self,xdata,ydata,
                  include_idx = [0,-1],
-                 exclude_idx = []):
+                 exclude_idx = [],
+                 p0 = None):
+        '''
+        Arguments
+        ----------
+        p0: Array or None
+            Initial guesses (amplitude, y_offset, k, phase), e.g. from a batch
+            fit. If given, the guess routine (peak search) is skipped.
+        '''
         super().__init__(xdata,ydata,
                          include_idx=include_idx,exclude_idx=exclude_idx,
                          savgol_window=20)
+        self._p0 = p0
 
         # self.xdata, self.ydata = self.remove_infnan(self.xdata,self.ydata)
 
@@ -54,36 +64,23 @@ class Sine(Fit):
         k: float
         phase: float
         '''
-        guesses = self._guesses(x,y)
+        if self._p0 is None:
+            guesses = self._guesses(x,y)
+        else:
+            guesses = self._p0
         popt, pcov = curve_fit(self._fit_func, x, y,
                                 p0=guesses,
                                 bounds=((0.,-np.inf,0.,0.),(np.inf,np.inf,np.inf,2*np.pi)) )
         return popt, pcov
         
     def _guesses(self,x,y):
-
-        y_offset_guess = (np.max(y) + np.min(y)) / 2
-        # y_offset_guess = np.mean(y)
-
-        rms = np.sqrt(np.mean((y- np.mean(y))**2))
-        amplitude_guess = rms
-
-        prom = rms/2
-        idx, _ = find_peaks(normalize(y), prominence=prom)
-        if len(idx) > 1:
-            lambda_guess = np.mean(np.diff(x[idx]))
-        else:
-            lambda_guess = abs(x[np.argmax(y)] - x[np.argmin(y)])
-        k_guess = 2*np.pi/lambda_guess
-        
-        if y[0] - y_offset_guess < -amplitude_guess:
-            phase_guess = np.pi
-        elif y[0] - y_offset_guess > amplitude_guess:
-            phase_guess = -np.pi
-        else:
-            phase_guess = 0.
-        
+        y_offset_guess = np.mean(y)
+        k, amplitude, phase = oscillation_guesses(x, (y - y_offset_guess)[None,:])
+        amplitude_guess = amplitude[0]
+        k_guess = k[0]
+        # cos(theta + phase) = sin(theta + phase + pi/2)
+        phase_guess = np.mod(phase[0] + np.pi/2, 2*np.pi)
         return amplitude_guess, y_offset_guess, k_guess, phase_guess
-    
+
     def _find_idx(self,x0,x):
         return np.argmin(np.abs(x-x0))
\ No newline at end of file
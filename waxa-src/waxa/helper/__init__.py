@@ -1,2 +1,3 @@
 from .plotting_helper import *
-from .datasmith import *
\ No newline at end of file
+from .datasmith import *
+from .grouping import GroupReducer
@@ -0,0 +1,138 @@
+import numpy as np
+
+GROUP_STATS = ('mean', 'std', 'sem', 'count', 'min', 'max')
+
+
+class GroupReducer():
+    """
+    Grouped reductions along axis 0 by a fixed set of group keys.
+
+    The keys are sorted once on construction. Each reduction then gathers the
+    array into key order and reduces every contiguous group with ufunc
+    ``reduceat``, so reducing many arrays by the same keys costs one sort plus
+    a few linear passes per array.
+
+    Reductions are NaN-aware: NaN (and inf) entries are ignored per element,
+    as are groups' missing values in NaN-padded arrays.
+
+    Attributes
+    ----------
+    unique: np.ndarray
+        The sorted unique keys, one per group.
+    counts: np.ndarray
+        The number of entries (rows) in each group.
+    inverse: np.ndarray
+        The group index of each entry, such that ``unique[inverse] == keys``.
+    n_groups: int
+    """
+
+    def __init__(self, keys):
+        keys = np.asarray(keys).ravel()
+        n = keys.shape[0]
+        self.n = n
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        if n:
+            new_group = sorted_keys[1:] != sorted_keys[:-1]
+            if np.issubdtype(sorted_keys.dtype, np.floating):
+                # Match np.unique, which puts all NaN keys in one group.
+                new_group &= ~(np.isnan(sorted_keys[1:]) & np.isnan(sorted_keys[:-1]))
+            self.starts = np.concatenate([[0], np.flatnonzero(new_group) + 1])
+        else:
+            self.starts = np.array([], dtype=int)
+        self.unique = sorted_keys[self.starts]
+        self.n_groups = self.starts.shape[0]
+        self.counts = np.diff(np.append(self.starts, n))
+        self._sorted_group = np.repeat(np.arange(self.n_groups), self.counts)
+        self.inverse = np.empty(n, dtype=int)
+        self.inverse[self.order] = self._sorted_group
+
+    def matches(self, keys):
+        """Returns True if this reducer was built from these keys."""
+        keys = np.asarray(keys).ravel()
+        if keys.shape[0] != self.n:
+            return False
+        equal_nan = np.issubdtype(keys.dtype, np.floating)
+        return np.array_equal(keys[self.order], self.unique[self._sorted_group],
+                              equal_nan=equal_nan)
+
+    def _broadcast(self, group_values):
+        # Expand a per-group array back to the sorted entries.
+        return group_values[self._sorted_group]
+
+    def reduce(self, arr, stats=('mean',), ddof=0):
+        """
+        Reduces arr along axis 0 within each group.
+
+        Parameters
+        ----------
+        arr: ArrayLike
+            Array whose axis 0 has one entry per key.
+        stats: str or iterable of str
+            Any of 'mean', 'std', 'sem', 'count', 'min', 'max'.
+        ddof: int
+            Delta degrees of freedom for 'std' and 'sem'. The default of 0
+            gives the population std, as the atomdata repeat statistics do.
+
+        Returns
+        -------
+        dict: stat name -> array of shape (n_groups, *arr.shape[1:]). If stats
+        is a single string, returns that array instead.
+        """
+        single = isinstance(stats, str)
+        stats = (stats,) if single else tuple(stats)
+        for stat in stats:
+            if stat not in GROUP_STATS:
+                raise ValueError(f"Unknown group statistic '{stat}'. Use one of {GROUP_STATS}.")
+
+        arr = np.asarray(arr, dtype=np.float64)
+        if arr.shape[0] != self.n:
+            raise ValueError(f"Array has {arr.shape[0]} entries along axis 0, expected {self.n}.")
+        out_shape = (self.n_groups,) + arr.shape[1:]
+        if self.n_groups == 0:
+            out = {stat: np.zeros(out_shape) for stat in stats}
+            return out[stats[0]] if single else out
+
+        sorted_arr = arr[self.order]
+        finite = np.isfinite(sorted_arr)
+        all_finite = bool(np.all(finite))
+
+        out = {}
+        need_mean = any(s in stats for s in ('mean', 'std', 'sem'))
+        if all_finite:
+            count = np.broadcast_to(
+                self.counts.reshape((-1,) + (1,) * (arr.ndim - 1)).astype(np.float64),
+                out_shape)
+        else:
+            count = np.add.reduceat(finite, self.starts, axis=0).astype(np.float64)
+        if 'count' in stats:
+            out['count'] = np.array(count)
+
+        if need_mean:
+            vals = sorted_arr if all_finite else np.where(finite, sorted_arr, 0.)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.add.reduceat(vals, self.starts, axis=0) / count
+            if 'mean' in stats:
+                out['mean'] = mean
+            if 'std' in stats or 'sem' in stats:
+                dev = vals - self._broadcast(mean)
+                if not all_finite:
+                    dev = np.where(finite, dev, 0.)
+                sqdev = np.add.reduceat(dev * dev, self.starts, axis=0)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    std = np.sqrt(sqdev / (count - ddof))
+                if 'std' in stats:
+                    out['std'] = std
+                if 'sem' in stats:
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        out['sem'] = std / np.sqrt(count)
+
+        if 'min' in stats or 'max' in stats:
+            # fmin/fmax skip NaN; replace inf so that only finite values count.
+            vals = sorted_arr if all_finite else np.where(finite, sorted_arr, np.nan)
+            if 'min' in stats:
+                out['min'] = np.fmin.reduceat(vals, self.starts, axis=0)
+            if 'max' in stats:
+                out['max'] = np.fmax.reduceat(vals, self.starts, axis=0)
+
+        return out[stats[0]] if single else {stat: out[stat] for stat in stats}
@@ -1,2 +1,2 @@
-from .compute_gaussian_cloud_params import fit_gaussian_sum_dist
-from .compute_ODs import compute_OD, process_ODs
\ No newline at end of file
+from .compute_gaussian_cloud_params import fit_gaussian_sum_dist, moments_gaussian_sum_dist
+from .compute_ODs import compute_OD, process_ODs, process_ODs_blocked
\ No newline at end of file
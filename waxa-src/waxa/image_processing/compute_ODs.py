@@ -31,12 +31,28 @@ def process_ODs(raw_ODs,roi):
 
     return ODs, sum_od_x, sum_od_y
 
-def compute_OD(atoms,light,dark,imaging_type=img.ABSORPTION):
+# Number of shots processed per block by compute_OD. Peak temporary memory is
+# about 2 * OD_BLOCK_SIZE * px * py * itemsize of the output dtype, independent
+# of the number of shots.
+OD_BLOCK_SIZE = 64
+
+def _check_od_dtype(dtype):
+    dtype = np.dtype(dtype)
+    if dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise ValueError(f"OD dtype must be float32 or float64, not {dtype}.")
+    return dtype
+
+def compute_OD(atoms,light,dark,imaging_type=img.ABSORPTION,
+               dtype=np.float64,block_size=OD_BLOCK_SIZE,out=None):
     '''
     From a list of images (length 3*n, where n is the number of runs), computes
     OD. Crops to a preset ROI based on in what stage of cooling the images were
     taken.
 
+    The dark subtraction, clipping, division and log are fused and done in
+    place in fixed-size blocks of shots along the first axis, so temporaries
+    are bounded by `block_size` rather than the dataset size.
+
     Parameters
     ----------
     img_atoms: list 
@@ -48,36 +64,124 @@ def compute_OD(atoms,light,dark,imaging_type=img.ABSORPTION):
     img_dark: list 
         An n x px x py list of images of n images, px x py pixels. Images with no light, no atoms.
 
+    dtype: np.float32 or np.float64
+        The dtype of the output. float32 is exact for the dark subtraction of
+        up to 16-bit images and halves the memory traffic.
+
+    block_size: int
+        The number of shots processed at once.
+
+    out: ndarray or None
+        A preallocated output array with the broadcast shape of the inputs.
+
     Returns
     -------
     ODsraw: ArrayLike
         The uncropped ODs
     '''
-    
-    dtype = atoms.dtype
-    if dtype == np.dtype('uint8'):
-        new_dtype = np.int16
-    elif dtype == np.dtype('uint16'):
-        new_dtype = np.int32
-    else:
-        new_dtype = np.int32
+    dtype = _check_od_dtype(dtype)
+    atoms, light, dark = np.broadcast_arrays(np.asarray(atoms),
+                                             np.asarray(light),
+                                             np.asarray(dark))
+    if out is None:
+        out = np.empty(atoms.shape, dtype=dtype)
+    elif out.shape != atoms.shape or out.dtype != dtype:
+        raise ValueError(f"out must have shape {atoms.shape} and dtype {dtype}.")
 
-    atoms_only = atoms.astype(new_dtype) - dark.astype(new_dtype)
-    light_only = light.astype(new_dtype) - dark.astype(new_dtype)
+    if atoms.ndim < 3:
+        # A single image: no shot axis to block over.
+        _compute_OD_block(atoms, light, dark, out, imaging_type)
+        return out
 
-    atoms_only[atoms_only < 0] = 0
-    light_only[light_only < 0] = 0
+    # Block along the first axis, with as many of its entries per block as
+    # fit in block_size shots.
+    shots_per_entry = max(int(np.prod(atoms.shape[1:-2])), 1)
+    step = max(int(block_size) // shots_per_entry, 1)
+    buf_shape = (min(step, atoms.shape[0]),) + atoms.shape[1:]
+    buffers = (np.empty(buf_shape, dtype=dtype),
+               np.empty(buf_shape, dtype=dtype),
+               np.empty(buf_shape, dtype=bool))
+    for i0 in range(0, atoms.shape[0], step):
+        i1 = min(i0 + step, atoms.shape[0])
+        _compute_OD_block(atoms[i0:i1], light[i0:i1], dark[i0:i1],
+                          out[i0:i1], imaging_type,
+                          buffers=[b[:i1-i0] for b in buffers])
+    return out
 
-    It_over_I0 = np.divide(atoms_only, light_only, 
-                out=np.zeros(atoms_only.shape, dtype=float), 
-                where=light_only!=0)
+def _compute_OD_block(atoms,light,dark,out,imaging_type,buffers=None):
+    if buffers is None:
+        buffers = (np.empty(out.shape, dtype=out.dtype),
+                   np.empty(out.shape, dtype=out.dtype),
+                   np.empty(out.shape, dtype=bool))
+    atoms_only, light_only, mask = buffers
+
+    np.subtract(atoms, dark, out=atoms_only, dtype=out.dtype, casting='unsafe')
+    np.maximum(atoms_only, 0, out=atoms_only)
+    np.subtract(light, dark, out=light_only, dtype=out.dtype, casting='unsafe')
+    np.maximum(light_only, 0, out=light_only)
+
+    # It / I0, zero wherever there is no light.
+    np.not_equal(light_only, 0, out=mask)
+    out[...] = 0
+    np.divide(atoms_only, light_only, out=out, where=mask)
 
     if imaging_type == img.ABSORPTION:
-        OD = -np.log(It_over_I0,
-                        out=np.zeros(atoms_only.shape, dtype=float), 
-                        where= It_over_I0!=0)
-        OD[OD<0] = 0
-    else:
-        OD = It_over_I0
-
-    return OD
+        np.not_equal(out, 0, out=mask)
+        np.log(out, out=out, where=mask)
+        np.negative(out, out=out, where=mask)
+        np.maximum(out, 0, out=out)
+    return out
+
+def process_ODs_blocked(atoms,light,dark,roi,imaging_type=img.ABSORPTION,
+                        dtype=np.float64,block_size=OD_BLOCK_SIZE):
+    '''
+    Streaming version of process_ODs that starts from the raw images. The
+    images are cropped to the ROI before the OD is computed, and the ODs and
+    sum_ods are filled block by block along the first axis, so the full-frame
+    OD is never built.
+
+    Parameters
+    ----------
+    atoms, light, dark: ndarray
+        n1 x n2 x ... x nN x px x py arrays of images (or arrays that
+        broadcast to that shape).
+
+    roi: waxa.ROI
+        The ROI object to use for the crop.
+
+    imaging_type, dtype, block_size:
+        As for compute_OD.
+
+    Returns
+    -------
+    ODs: ArrayLike
+        The cropped ODs
+    summedODx: ArrayLike
+    summedODy: ArrayLike
+    '''
+    dtype = _check_od_dtype(dtype)
+    y0, y1 = roi.roiy
+    x0, x1 = roi.roix
+    atoms, light, dark = np.broadcast_arrays(np.asarray(atoms)[...,y0:y1,x0:x1],
+                                             np.asarray(light)[...,y0:y1,x0:x1],
+                                             np.asarray(dark)[...,y0:y1,x0:x1])
+    ODs = np.empty(atoms.shape, dtype=dtype)
+    sum_od_x = np.empty(atoms.shape[:-2] + atoms.shape[-1:], dtype=dtype)
+    sum_od_y = np.empty(atoms.shape[:-1], dtype=dtype)
+
+    if atoms.ndim < 3:
+        compute_OD(atoms, light, dark, imaging_type, dtype=dtype, out=ODs)
+        np.sum(ODs, ODs.ndim-2, out=sum_od_x)
+        np.sum(ODs, ODs.ndim-1, out=sum_od_y)
+        return ODs, sum_od_x, sum_od_y
+
+    shots_per_entry = max(int(np.prod(atoms.shape[1:-2])), 1)
+    step = max(int(block_size) // shots_per_entry, 1)
+    for i0 in range(0, atoms.shape[0], step):
+        i1 = min(i0 + step, atoms.shape[0])
+        od = compute_OD(atoms[i0:i1], light[i0:i1], dark[i0:i1], imaging_type,
+                        dtype=dtype, block_size=block_size, out=ODs[i0:i1])
+        np.sum(od, od.ndim-2, out=sum_od_x[i0:i1])
+        np.sum(od, od.ndim-1, out=sum_od_y[i0:i1])
+
+    return ODs, sum_od_x, sum_od_y
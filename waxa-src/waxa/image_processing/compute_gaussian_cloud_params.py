@@ -1,25 +1,63 @@
 import numpy as np
-import os
-from joblib import Parallel, delayed
 from waxa.fitting import GaussianFit
+from waxa.fitting.batch import fit_gaussian_batch, gaussian_moments
+from waxa.fitting.fit_results import GaussianFitResults
+from waxa.fitting.pool import get_fit_pool
+from waxa.profiling import profiler
 
-# Minimum number of fits to justify spawning a process pool.
-# Below this threshold the pool startup cost exceeds the parallelism gain.
+# Minimum number of fits to justify sending them to the fit pool.
+# Below this threshold the inter-process overhead exceeds the parallelism gain.
 N_PROC_THRESHOLD = 64
 
-# Module-level worker function (must be importable by loky workers).
-def _fit_one_worker(this_sum_dist, xaxis):
+# 'batch' fits every summedOD in one vectorized solve, falling back to
+# GaussianFit for profiles that do not converge. 'curve_fit' always uses
+# GaussianFit (scipy curve_fit per profile).
+GAUSSIAN_FIT_METHOD = 'batch'
+
+# Module-level fit function (must be importable by the fit pool workers).
+# Returns popt followed by the flattened pcov, as the pool passes one flat
+# parameter row per profile.
+def _fit_one_params(xaxis, this_sum_dist):
     try:
         fit = GaussianFit(xaxis, this_sum_dist, print_errors=False)
-        return fit
+        return np.concatenate([np.ravel(fit.popt), np.ravel(fit.pcov)])
     except Exception:
         return None
 
-def fit_gaussian_sum_dist(sum_dist: np.ndarray, camera_params) -> list[GaussianFit]:
+def _fit_profiles(sum_dist_list, xaxis, popt, pcov, indices):
+    """Runs a GaussianFit for each profile in `indices`, storing the fit
+    parameters into `popt` and their covariances into `pcov`. Returns the
+    number of fits that raised."""
+    total = len(indices)
+
+    # Large batches go to the session fit pool, whose worker processes stay
+    # alive between calls and read the profiles from shared memory. For small
+    # batches the inter-process overhead exceeds the gain.
+    if total >= N_PROC_THRESHOLD:
+        params, error_count = get_fit_pool().map_rows(
+            _fit_one_params, xaxis, sum_dist_list, indices, n_params=20)
+        popt[indices] = params[:, :4]
+        pcov[indices] = params[:, 4:].reshape(-1, 4, 4)
+        return error_count
+
+    error_count = 0
+    for i in indices:
+        params = _fit_one_params(xaxis, sum_dist_list[i])
+        if params is None:
+            error_count += 1
+        else:
+            popt[i] = params[:4]
+            pcov[i] = params[4:].reshape(4, 4)
+    return error_count
+
+def fit_gaussian_sum_dist(sum_dist: np.ndarray, camera_params,
+                          method=GAUSSIAN_FIT_METHOD) -> GaussianFitResults:
     '''
     Performs a guassian fit on each summedOD in the input list.
 
-    Returns a GaussianFit object which contains the fit parameters.
+    Returns a GaussianFitResults, which stores the fit parameters of all the
+    summedODs as arrays shaped like sum_dist.shape[:-1]. Indexing it down to
+    a single summedOD gives a GaussianFit.
 
     Length fit parameters are returned in units of meters. Amplitude and offset
     are in raw summedOD units.
@@ -28,46 +66,80 @@ def fit_gaussian_sum_dist(sum_dist: np.ndarray, camera_params) -> list[GaussianF
     ----------
     summedODs: ArrayLike
         A list of summedODs.
+    method: str
+        'batch' fits all summedODs at once with the vectorized
+        Levenberg-Marquardt fitter (waxa.fitting.batch.fit_gaussian_batch),
+        and refits any that do not converge with GaussianFit. 'curve_fit'
+        runs GaussianFit on every summedOD.
 
     Returns
     -------
-    fits: ArrayLike
-        An array of GaussianFit objects.
+    fits: GaussianFitResults
     '''
+    if method not in ('batch', 'curve_fit'):
+        raise ValueError(f"Unknown Gaussian fit method '{method}'. Use 'batch' or 'curve_fit'.")
 
     xaxis = camera_params.pixel_size_m / camera_params.magnification * np.arange(sum_dist.shape[-1])
     
     # reshape to effectively a list of sumODs:
     sum_dist_list = sum_dist.reshape(-1, sum_dist.shape[-1])
-    # prep a fit array of len == # sum ODs
-    fits = np.empty(sum_dist_list.shape[:-1], dtype=GaussianFit)
-
-    error_count = 0
     total = sum_dist_list.shape[0]
+    popt = np.full((total, 4), np.nan)
+    pcov = np.full((total, 4, 4), np.nan)
+    success = np.zeros(total, dtype=bool)
 
-    # For large batches use joblib's loky backend (true parallelism, and unlike
-    # ProcessPoolExecutor it works correctly in Jupyter/IPython on Windows).
-    # For small batches the process-pool startup cost exceeds the gain.
-    if total >= N_PROC_THRESHOLD:
-        n_workers = min(os.cpu_count() or 1, total)
-        results = Parallel(n_jobs=n_workers, backend='loky')(
-            delayed(_fit_one_worker)(arr, xaxis) for arr in sum_dist_list
-        )
-        for i, fit in enumerate(results):
-            if fit is None:
-                error_count += 1
-            fits[i] = fit
+    if method == 'batch' and total > 0:
+        popt, pcov, success = fit_gaussian_batch(xaxis, sum_dist_list)
+        refit_idx = np.flatnonzero(~success)
     else:
-        for i in range(total):
-            fit = _fit_one_worker(sum_dist_list[i], xaxis)
-            if fit is None:
-                error_count += 1
-            fits[i] = fit
+        refit_idx = np.arange(total)
 
-    # reshape back to the n-dim'nal sumOD shape
-    fits = fits.reshape(sum_dist.shape[:-1])
+    popt[refit_idx] = np.nan
+    pcov[refit_idx] = np.nan
+    error_count = _fit_profiles(sum_dist_list, xaxis, popt, pcov, refit_idx)
+    success[refit_idx] = np.all(np.isfinite(popt[refit_idx]), axis=-1)
+
+    profiler.count('fits', total)
+    profiler.count('refits', len(refit_idx))
 
     if error_count > 0:
         print(f"{error_count}/{total} fits failed")
 
-    return fits
\ No newline at end of file
+    # reshape back to the n-dim'nal sumOD shape
+    shape = sum_dist.shape[:-1]
+    return GaussianFitResults(xaxis, sum_dist,
+                              popt.reshape(*shape, 4),
+                              pcov.reshape(*shape, 4, 4),
+                              success.reshape(shape))
+
+def moments_gaussian_sum_dist(sum_dist: np.ndarray, camera_params) -> GaussianFitResults:
+    '''
+    Estimates the Gaussian parameters of each summedOD from its moments,
+    without curve fitting (see waxa.fitting.batch.gaussian_moments).
+
+    Returns a GaussianFitResults like fit_gaussian_sum_dist, whose area is the
+    integrated area of the baseline-subtracted summedOD rather than the area
+    of a fitted Gaussian. pcov is NaN, and the results are marked as
+    estimates (``fits.estimate`` is True).
+
+    Parameters
+    ----------
+    summedODs: ArrayLike
+        A list of summedODs.
+
+    Returns
+    -------
+    fits: GaussianFitResults
+    '''
+    xaxis = camera_params.pixel_size_m / camera_params.magnification * np.arange(sum_dist.shape[-1])
+    sum_dist_list = sum_dist.reshape(-1, sum_dist.shape[-1])
+    popt, area, success = gaussian_moments(xaxis, sum_dist_list)
+    profiler.count('moment_estimates', sum_dist_list.shape[0])
+
+    shape = sum_dist.shape[:-1]
+    fits = GaussianFitResults(xaxis, sum_dist,
+                              popt.reshape(*shape, 4),
+                              success=success.reshape(shape),
+                              estimate=True)
+    fits.area = area.reshape(shape)
+    return fits
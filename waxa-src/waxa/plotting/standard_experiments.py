@@ -4,6 +4,7 @@ from scipy.signal import find_peaks
 import matplotlib.pyplot as plt
 
 from waxa.helper import *
+from waxa.fitting import fit_batch, DampedCosineModel
 
 dv = -1000.
 dv_fit_guess_rabi_frequency = 1.e5
@@ -162,8 +163,7 @@ def rabi_oscillation(ad,
     if populations_array.size:
         populations = populations_array
     else:
-        sm_sum_ods = [sumod_x for sumod_x in ad.sum_od_x]
-        rel_amps = [np.max(sumod_x)-np.min(sumod_x) for sumod_x in sm_sum_ods]
+        rel_amps = np.ptp(np.asarray(ad.sum_od_x),axis=-1)
         populations = rel_amps  # replace with your atom populations
 
     populations = crop_array_by_index(populations,include_idx,exclude_idx)
@@ -340,10 +340,10 @@ def rabi_oscillation_2d(ad,
                         xvar0format='1.2e',xvar0mult=1.,xvar0unit='',
                         subplots_figsize=[],
                         plot_figsize=[],
-                        fit_guess_frequency=dv_fit_guess_rabi_frequency,
-                        fit_guess_phase=np.pi/2,
-                        fit_guess_amp=1.,
-                        fit_guess_offset=1.,
+                        fit_guess_frequency=dv,
+                        fit_guess_phase=dv,
+                        fit_guess_amp=dv,
+                        fit_guess_offset=dv,
                         fit_guess_decay_tau=dv,
                         rabi_freq_threshold=500.):
     """Fits the signal (max-min sumOD) vs. pulse time to extract the rabi
@@ -388,6 +388,9 @@ def rabi_oscillation_2d(ad,
         fit_guess_phase,
         fit_guess_amp,
         fit_guess_offset,
+        fit_guess_decay_tau (float, optional): Initial guesses for the fit
+        parameters, shared by all the fits. Those not specified are guessed
+        from the data of each fit.
         rabi_freq_threshold (float, optional): The threshold below which a fit
         resulting in this rabi frequency will be discarded.
 
@@ -409,7 +412,7 @@ def rabi_oscillation_2d(ad,
     if populations_array.size:
         populations_array = populations_array
     else:
-        rel_amps = np.asarray([[np.max(sumod_x)-np.min(sumod_x) for sumod_x in sumod_for_this_field] for sumod_for_this_field in ad.sum_od_x])
+        rel_amps = np.ptp(np.asarray(ad.sum_od_x),axis=-1)
         populations_array = rel_amps
 
     if detect_dips:
@@ -420,7 +423,7 @@ def rabi_oscillation_2d(ad,
     # Define the Rabi oscillation function
     def _fit_func_rabi_oscillation(t, Omega, phi, B, A, tau):
         # return A * np.exp(-t/tau) * np.abs(np.cos(0.5 * Omega * t + phi))**2
-        return 0.5 * (B + A * np.exp(-t/tau) * np.cos(Omega * t + phi) )
+        return B + A/2 * np.exp(-t/tau) * np.cos(Omega * t + phi)
 
     times0 = ad.xvars[1]
 
@@ -431,19 +434,15 @@ def rabi_oscillation_2d(ad,
         else:
             fig, ax = plt.subplots(1,len(ad.xvars[0]),figsize=(15,3))
 
-    fit_results = []
-
-    for populations in populations_array:
-        times = times0
-
-        populations = populations.flatten()
-        populations = crop_array_by_index(populations,include_idx,exclude_idx)
-        times = crop_array_by_index(times,include_idx,exclude_idx)
-        populations, times = remove_infnan(populations, times)
+    times_fit = np.asarray(crop_array_by_index(times0,include_idx,exclude_idx),dtype=float)
 
-        # mask = rm_outliers(populations,'mean',0.5)
-        # populations = populations[mask]
-        # times = times[mask]
+    # Normalize each row, keeping the rows on the shared time axis so that they
+    # can be fit together. Points that are not finite are NaN and left out.
+    populations_batch = np.full((len(populations_array),len(times_fit)), np.nan)
+    for i, populations in enumerate(populations_array):
+        populations = crop_array_by_index(populations.flatten(),include_idx,exclude_idx)
+        valid = np.isfinite(populations) & np.isfinite(times_fit)
+        populations = populations[valid]
 
         if normalize_maximum_idx != None:
             override_normalize_max = populations[normalize_maximum_idx]
@@ -457,38 +456,43 @@ def rabi_oscillation_2d(ad,
         else:
             override_normalize_min = None
 
-        populations = normalize(populations,
+        populations_batch[i,valid] = normalize(populations,
                                 map_minimum_to_zero=map_minimum_to_zero,
                                 override_normalize_minimum=override_normalize_min,
                                 override_normalize_maximum=override_normalize_max)
 
-        if fit_guess_decay_tau == dv:
-            peak_idx, peak_prop = find_peaks(populations,height=0.5)
-            y = peak_prop['peak_heights']
-            def _fit_func_decay(t, tau):
-                return np.exp(-t/tau)
-            popt_decay, _ = curve_fit(_fit_func_decay,times[peak_idx],y)
-            fit_guess_decay_tau = popt_decay[0]
+    # Fit all rows at once. The batch model is B + A' exp(-t/tau) cos(Omega t
+    # + phi), with A' = A/2.
+    p0 = np.array([fit_guess_frequency, fit_guess_phase,
+                   fit_guess_offset, fit_guess_amp, fit_guess_decay_tau])
+    p0[p0 == dv] = np.nan
+    p0[3] /= 2
+    batch_results = fit_batch(DampedCosineModel(), times_fit, populations_batch, p0=p0,
+                              lower=(0.,-np.inf,0.,0.,0.),
+                              upper=(np.inf,np.inf,1.,0.5,np.inf))
+    popt_batch = batch_results.popt * [1.,1.,1.,2.,1.]
 
-        # Fit the data
-        try:
-            popt, _ = curve_fit(_fit_func_rabi_oscillation, times, populations,
-                            p0=[fit_guess_frequency, fit_guess_phase,
-                                 fit_guess_amp, fit_guess_offset,
-                                   fit_guess_decay_tau],
-                            bounds=((0.,0.,0.,0.,0.),(np.inf,2*np.pi,1.,1.,np.inf)))
+    fit_results = []
+
+    for populations_row, popt_row, success in zip(populations_batch, popt_batch,
+                                                  batch_results.success):
+        valid = np.isfinite(populations_row)
+        populations = populations_row[valid]
+        times = times_fit[valid]
 
+        if success:
+            popt = popt_row
             y_fit = _fit_func_rabi_oscillation(times, *popt)
             f_rabi = popt[0]/(2*np.pi)
             # if f_rabi < rabi_freq_threshold:
             #     raise ValueError(f"Fitted Rabi frequency ({f_rabi/1.e3} kHz) below threshold ({rabi_freq_threshold/1.e3} kHz)")
             rabi_frequencies_hz.append(f_rabi)
-        except Exception as e:
-            print(e)
+        else:
+            print(f"Fit failed at {ad.xvarnames[0]} = {ad.xvars[0][xvar0_idx]}.")
             popt = [None]*5
             y_fit = np.array([None]*len(times))
             rabi_frequencies_hz.append(None)
-            
+
         fit_results.append(popt)
 
         try:
@@ -504,7 +508,7 @@ def rabi_oscillation_2d(ad,
             c = [0.,0.4,1.]
             ax[xvar0_idx].scatter(times*1.e6, populations, label='Data', color=c)
             t_sm = np.linspace(times[0],times[-1],10000)
-            if np.all(popt != None):
+            if success:
                 ax[xvar0_idx].plot(t_sm*1.e6, _fit_func_rabi_oscillation(t_sm,*popt), 'k-', label='Fit')
             if rabi_frequencies_hz[xvar0_idx]:
                 title = f"$f_R = {rabi_frequencies_hz[xvar0_idx]/1.e3:1.2f}$"
@@ -611,8 +615,7 @@ def magnetometry_1d(ad,F0=2.,mF0=0.,F1=1.,mF1=1.,
         sumdist = ad.sum_od_x
     elif axis == 1:
         sumdist = ad.sum_od_y
-    sm_sum_ods = [dist for dist in sumdist]
-    rel_amps = [np.max(dist)-np.min(dist) for dist in sm_sum_ods]
+    rel_amps = np.ptp(np.asarray(sumdist),axis=-1)
 
     if detect_dips:
         rel_amps = - rel_amps
@@ -714,7 +717,7 @@ def magnetometry_2d(ad,F0=2.,mF0=0.,F1=1.,mF1=1.,
     elif axis == 1:
         sumdist = ad.sum_od_y
 
-    rel_amps = np.asarray([[np.max(sumod)-np.min(sumod) for sumod in sumod_for_this_field] for sumod_for_this_field in sumdist])
+    rel_amps = np.ptp(np.asarray(sumdist),axis=-1)
     if detect_dips:
         rel_amps = -rel_amps
 
@@ -0,0 +1,269 @@
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Set the environment variable WAXA_PROFILE=1 to profile from import time.
+PROFILER_ENABLED = os.getenv("WAXA_PROFILE", "").strip().lower() in ("1", "true", "yes")
+
+PATH_SEP = "/"
+
+
+class _NullSpan():
+    # Shared no-op context manager, so disabled spans cost one attribute check.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span():
+    __slots__ = ('_profiler', 'name', 'path', '_t0')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self.name = name
+        self.path = None
+        self._t0 = 0.
+
+    def __enter__(self):
+        stack = self._profiler._stack()
+        self.path = stack[-1] + PATH_SEP + self.name if stack else self.name
+        stack.append(self.path)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self._t0
+        stack = self._profiler._stack()
+        if stack and stack[-1] == self.path:
+            stack.pop()
+        self._profiler._record(self.path, dt)
+        return False
+
+
+class StageProfiler():
+    """
+    Collects wall-clock durations of named, nested stages and per-stage
+    counters (e.g. bytes read, fits performed) across many runs.
+
+    Spans nest per thread: a span opened inside another is recorded under
+    the path "outer/inner". Counters are attributed to the innermost open
+    span. Every call of a span is kept, so the per-stage distribution over
+    runs is available as summary statistics or a histogram.
+
+    The profiler is disabled by default, in which case span() and count()
+    do nothing and print nothing.
+
+    Use the module-level instance ``profiler``:
+
+        from waxa.profiling import profiler
+        profiler.enable()
+        ad = atomdata(run_id)
+        profiler.report()
+        profiler.to_csv('stages.csv')
+    """
+
+    def __init__(self, enabled=PROFILER_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def enable(self, reset=False):
+        """Starts recording. If reset, discards what was recorded so far."""
+        if reset:
+            self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """Stops recording. Recorded stages are kept."""
+        self.enabled = False
+
+    def reset(self):
+        """Discards all recorded durations and counters."""
+        with self._lock:
+            self._durations = {}
+            self._counters = {}
+
+    @contextmanager
+    def enabled_for(self, reset=True):
+        """Context manager that records only within its block."""
+        was_enabled = self.enabled
+        self.enable(reset=reset)
+        try:
+            yield self
+        finally:
+            self.enabled = was_enabled
+
+    # ------------------------------------------------------------------
+    # recording
+    # ------------------------------------------------------------------
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, path, dt):
+        with self._lock:
+            self._durations.setdefault(path, []).append(dt)
+
+    def span(self, name):
+        """
+        Returns a context manager that times its block as stage `name`,
+        nested under any span open in this thread.
+
+        Parameters
+        ----------
+        name: str
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, seconds):
+        """
+        Records a duration measured by the caller as stage `name`, nested
+        under any span open in this thread. For code that cannot wrap the
+        stage in a with-block.
+
+        Parameters
+        ----------
+        name: str
+        seconds: float
+        """
+        if not self.enabled:
+            return
+        stack = self._stack()
+        self._record(stack[-1] + PATH_SEP + name if stack else name, seconds)
+
+    def count(self, name, n=1):
+        """
+        Adds n to the counter `name` of the innermost open span (or of the
+        top level, if no span is open).
+
+        Parameters
+        ----------
+        name: str
+            e.g. 'bytes_read', 'fits'.
+        n: int or float
+        """
+        if not self.enabled:
+            return
+        stack = self._stack()
+        path = stack[-1] if stack else "<top>"
+        with self._lock:
+            counters = self._counters.setdefault(path, {})
+            counters[name] = counters.get(name, 0) + n
+
+    # ------------------------------------------------------------------
+    # results
+    # ------------------------------------------------------------------
+
+    def stages(self):
+        """Returns the recorded stage paths, in the order first seen."""
+        with self._lock:
+            return list(self._durations)
+
+    def durations(self, path):
+        """Returns an array of every recorded duration (s) of stage path."""
+        with self._lock:
+            return np.array(self._durations.get(path, []), dtype=float)
+
+    def counters(self, path=None):
+        """Returns the counters of stage path, or a dict path -> counters of
+        every stage if path is None."""
+        with self._lock:
+            if path is None:
+                return {p: dict(c) for p, c in self._counters.items()}
+            return dict(self._counters.get(path, {}))
+
+    def summary(self):
+        """
+        Returns one dict per stage with its call count, total/mean/min/max
+        and median/95th percentile durations (s), and its counters.
+        """
+        with self._lock:
+            durations = {p: np.asarray(d, dtype=float) for p, d in self._durations.items()}
+            counters = {p: dict(c) for p, c in self._counters.items()}
+        rows = []
+        for path in list(durations) + [p for p in counters if p not in durations]:
+            d = durations.get(path, np.array([]))
+            row = {
+                'stage': path,
+                'calls': int(d.size),
+                'total_s': float(np.sum(d)),
+                'mean_s': float(np.mean(d)) if d.size else np.nan,
+                'min_s': float(np.min(d)) if d.size else np.nan,
+                'p50_s': float(np.median(d)) if d.size else np.nan,
+                'p95_s': float(np.percentile(d, 95)) if d.size else np.nan,
+                'max_s': float(np.max(d)) if d.size else np.nan,
+            }
+            row.update(counters.get(path, {}))
+            rows.append(row)
+        return rows
+
+    def histogram(self, path, bins=10, range=None):
+        """
+        Histogram of the durations of stage path over all recorded calls.
+
+        Returns
+        -------
+        counts, bin_edges: as np.histogram, with edges in seconds.
+        """
+        return np.histogram(self.durations(path), bins=bins, range=range)
+
+    def report(self, min_total_s=0.):
+        """Prints a table of the recorded stages."""
+        rows = [r for r in self.summary() if r['total_s'] >= min_total_s or not r['calls']]
+        if not rows:
+            print("[profiler] nothing recorded")
+            return
+        width = max(len(r['stage']) for r in rows)
+        print(f"{'stage':<{width}}  {'calls':>6}  {'total':>9}  {'mean':>9}  {'p95':>9}  counters")
+        for r in rows:
+            extra = {k: v for k, v in r.items() if not k.endswith('_s') and k not in ('stage', 'calls')}
+            extra = ", ".join(f"{k}={v:g}" for k, v in extra.items())
+            print(f"{r['stage']:<{width}}  {r['calls']:>6}  {r['total_s']:>8.3f}s"
+                  f"  {r['mean_s']:>8.4f}s  {r['p95_s']:>8.4f}s  {extra}")
+
+    def to_json(self, filepath=None, include_durations=False):
+        """
+        Returns the summary as a JSON string, and writes it to filepath if
+        given. If include_durations, every recorded duration is included.
+        """
+        out = {'stages': self.summary()}
+        if include_durations:
+            with self._lock:
+                out['durations'] = {p: list(d) for p, d in self._durations.items()}
+        out['stages'] = [{k: (None if isinstance(v, float) and np.isnan(v) else v)
+                          for k, v in r.items()} for r in out['stages']]
+        text = json.dumps(out, indent=2)
+        if filepath is not None:
+            with open(filepath, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_csv(self, filepath):
+        """Writes the summary to filepath as CSV, one row per stage."""
+        rows = self.summary()
+        fields = ['stage', 'calls', 'total_s', 'mean_s', 'min_s', 'p50_s', 'p95_s', 'max_s']
+        for r in rows:
+            fields += [k for k in r if k not in fields]
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+profiler = StageProfiler()
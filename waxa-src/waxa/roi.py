@@ -73,19 +73,34 @@ class ROI():
                       lite=lite,
                       printouts=printouts)
 
-    def crop(self,OD):
+    def crop(self,OD,origin=(0,0),copy=False):
         """Crops the given ndarray according the ROI.
 
         Args:
             OD (np.ndarray): The ndarray to be cropped.
+            origin (tuple of int): The (row, column) camera pixel of
+            OD[...,0,0]. Use when OD only covers a sub-window of the sensor.
+            Defaults to (0,0), i.e. OD is the full camera frame.
+            copy (bool): If False (default), returns a strided view into OD,
+            so no pixels are copied and the crop shares memory with OD. If
+            True, returns an independent (C-contiguous) copy.
 
         Returns:
             ndarray: The cropped ndarray.
-        """        
+        """
         OD: np.ndarray
-        idx_y = range(self.roiy[0],self.roiy[1])
-        idx_x = range(self.roix[0],self.roix[1])
-        cropOD = OD.take(idx_y,axis=OD.ndim-2).take(idx_x,axis=OD.ndim-1)
+        OD = np.asarray(OD)
+        y0, y1 = int(self.roiy[0]-origin[0]), int(self.roiy[1]-origin[0])
+        x0, x1 = int(self.roix[0]-origin[1]), int(self.roix[1]-origin[1])
+        # Slicing clips silently, where the previous take-based crop raised.
+        # Keep raising for ROIs that do not fit in OD.
+        for lo, hi, n, ax in ((y0, y1, OD.shape[-2], 'y'), (x0, x1, OD.shape[-1], 'x')):
+            if hi > lo and (lo < 0 or hi > n):
+                raise IndexError(f"ROI {ax} range [{lo},{hi}) is out of bounds "
+                                 f"for an array of size {n} along that axis.")
+        cropOD = OD[..., y0:y1, x0:x1]
+        if copy:
+            cropOD = np.ascontiguousarray(cropOD)
         return cropOD
 
     def load_roi(self,roi_id=None,use_saved=True,lite=False,
@@ -1,6 +1,5 @@
 import numpy as np
 from pathlib import Path
-import os
 
 from artiq.experiment import *
 from artiq.experiment import delay, delay_mu
@@ -11,6 +10,7 @@ from waxa.base.dealer import Dealer
 from waxa.base.scribe import Scribe
 from waxa.dummy.camera_params import CameraParams
 from waxa import img_types
+from waxa.profiling import profiler
 
 from artiq.language.core import kernel_from_string, now_mu, TerminationRequested
 
@@ -70,6 +70,13 @@ class Expt(Scanner, Dealer, Scribe):
         # Shot-notification bookkeeping (populated in finish_prepare_wax)
         self._shot_complete_count = 0
         self._N_shots_total = 1
+        # True once a shot's data has been streamed to (and acknowledged by)
+        # the liveOD server; _shot_stream_failed once a push was not. The
+        # shots from the first unacknowledged one on are kept, as
+        # (shot_idx, xvar_idx), in _unstreamed_shots for END_RUN.
+        self._shot_data_streamed = False
+        self._shot_stream_failed = False
+        self._unstreamed_shots = []
 
     def finish_prepare_wax(self,shuffle=True,N_repeats=[]):
         """
@@ -99,6 +106,9 @@ class Expt(Scanner, Dealer, Scribe):
 
         # Reset per-run shot counter
         self._shot_complete_count = 0
+        self._shot_data_streamed = False
+        self._shot_stream_failed = False
+        self._unstreamed_shots = []
         try:
             self._N_shots_total = int(np.prod(self.xvardims)) if self.xvardims else 1
         except Exception:
@@ -154,6 +164,15 @@ class Expt(Scanner, Dealer, Scribe):
             }
         except Exception:
             xvar_values = {}
+        # Stream this shot's DataVault values and scope traces to the server
+        # (if it supports it), so they are on disk before the shot is acked.
+        _push = getattr(_client, 'push_shot_data', None)
+        if _push is not None and self.run_info.save_data:
+            if self._shot_stream_failed:
+                self._unstreamed_shots.append(
+                    (int(self._shot_complete_count), self._shot_xvar_idx()))
+            else:
+                self._push_shot_data(_push)
         reset_requested = _client.shot_complete(
             self._shot_complete_count,
             self._N_shots_total,
@@ -166,6 +185,32 @@ class Expt(Scanner, Dealer, Scribe):
             _client.abort_run()
             raise TerminationRequested
     
+    def _push_shot_data(self, push):
+        """Sends the SHOT_DATA payload of the shot that just completed.
+
+        ``push`` returns a truthy reply once the server has written the shot
+        (a server that does not handle SHOT_DATA does not). The scope traces
+        of an acknowledged shot are dropped. After a failed push, no more
+        shots are streamed: this shot and the ones after it are kept and sent
+        with END_RUN (see ``_serialize_unstreamed_shots``), or if no shot was
+        acknowledged at all, END_RUN carries the full run data.
+        """
+        payload = self._serialize_shot_payload()
+        try:
+            acked = bool(push(payload))
+        except Exception as _e:
+            print(f"[LiveOD] WARNING: SHOT_DATA push raised: {_e}")
+            acked = False
+        if acked:
+            self._shot_data_streamed = True
+            for scope in self.scope_data.scopes:
+                scope.clear_data()
+        else:
+            self._shot_stream_failed = True
+            self._unstreamed_shots.append((payload['shot_idx'], payload['xvar_idx']))
+            print(f"[LiveOD] WARNING: SHOT_DATA not acknowledged by the server — "
+                  f"shots from {payload['shot_idx'] + 1} on will be sent with END_RUN instead.")
+
     def apply_pending_adjust_values(self):
         """Apply any adjust-panel values received from the last SHOT_COMPLETE reply."""
         for key, val in self._pending_adjust_values.items():
@@ -189,14 +234,17 @@ class Expt(Scanner, Dealer, Scribe):
 
         _client = getattr(self, 'live_od_client', None)
         if _client is not None:
-            payload = self._serialize_end_payload(expt_filepath)
+            with profiler.span('serialize_end_payload'):
+                payload = self._serialize_end_payload(expt_filepath)
             # print(payload)
-            _client.end_run(payload)
+            with profiler.span('end_run'):
+                _client.end_run(payload)
         else:
             # Legacy fallback
             if self.setup_camera:
                 if self.run_info.save_data:
-                    self.write_data(expt_filepath)
+                    with profiler.span('write_data'):
+                        self.write_data(expt_filepath)
                 else:
                     self.remove_incomplete_data()
 
@@ -290,11 +338,69 @@ class Expt(Scanner, Dealer, Scribe):
             'adjust_specs': [s.to_dict() for s in self._adjust_specs],
         }
 
+    def _shot_xvar_idx(self) -> list:
+        """The index of the current shot along each xvar."""
+        return [int(xv.counter) for xv in self.scan_xvars]
+
+    def _serialize_shot_payload(self) -> dict:
+        """Build the SHOT_DATA payload for the shot that just completed.
+
+        Holds the shot's DataVault values (as stored in ``_run_data``) and the
+        trace each scope captured this shot. The scopes keep their traces
+        until the server acknowledges the shot (see ``_push_shot_data``).
+        The server writes the payload with
+        ``DataSaver.append_shot_data_from_payload``.
+        """
+        return self._shot_payload(int(self._shot_complete_count),
+                                  self._shot_xvar_idx(), trace_idx=-1)
+
+    def _serialize_unstreamed_shots(self) -> list:
+        """Build SHOT_DATA payloads for the shots whose push was not
+        acknowledged, for END_RUN. The scopes hold one trace per shot from
+        the first of them on."""
+        return [self._shot_payload(shot_idx, xvar_idx, trace_idx=i)
+                for i, (shot_idx, xvar_idx) in enumerate(self._unstreamed_shots)]
+
+    def _shot_payload(self, shot_idx, xvar_idx, trace_idx) -> dict:
+        idx = tuple(xvar_idx)
+
+        dv = {}
+        for key in self.data.keys:
+            dc = vars(self.data)[key]
+            if dc._external_data_bool or not dc._data_gotten:
+                continue
+            try:
+                dv[key] = np.array(dc._run_data[idx])
+            except Exception as _e:
+                print(f"[_serialize_shot_payload] WARNING: could not read shot data for '{key}': {_e}")
+
+        scope_data_list = []
+        for scope in self.scope_data.scopes:
+            if -len(scope._data) <= trace_idx < len(scope._data):
+                scope_data_list.append({
+                    'label': str(scope.label),
+                    'data': np.asarray(scope._data[trace_idx]),
+                })
+
+        return {
+            'shot_idx': int(shot_idx),
+            'xvar_idx': [int(i) for i in xvar_idx],
+            'datavault': dv,
+            'scope_data': scope_data_list,
+        }
+
     def _serialize_end_payload(self, expt_filepath: str) -> dict:
-        """Build the END_RUN payload from the final experiment state."""
+        """Build the END_RUN payload from the final experiment state.
+
+        If shot data was streamed and acknowledged (``_push_shot_data``), the
+        DataVault values and scope traces are already on the server, and only
+        the external DataVault keys are sent, plus the shots from the first
+        unacknowledged one on (``unstreamed_shots``). Otherwise the full run
+        data is sent. ``shot_data_streamed`` tells the server which case it is.
+        """
         # Scope data
         scope_data_list = []
-        if self.scope_data._scope_trace_taken:
+        if self.scope_data._scope_trace_taken and not self._shot_data_streamed:
             for scope in self.scope_data.scopes:
                 try:
                     reshaped = scope.reshape_data()
@@ -313,28 +419,18 @@ class Expt(Scanner, Dealer, Scribe):
         dv = {}
         for key in self.data.keys:
             dc = vars(self.data)[key]
+            if self._shot_data_streamed and not dc._external_data_bool:
+                continue
             dv[key] = {
                 'data': dc._run_data,
                 'data_gotten': bool(dc._data_gotten),
                 'external': bool(dc._external_data_bool),
             }
 
-        # Source file texts (read from client filesystem via ds)
-        expt_text = self.ds._read_text_file_safe(expt_filepath, "experiment") if expt_filepath else ""
-        params_text = self.ds._read_text_file_safe(self.ds._expt_params_path, "params")
-
-        base_class_texts = {}
-        if self.ds._base_class_dir and os.path.isdir(self.ds._base_class_dir):
-            try:
-                filenames = sorted(os.listdir(self.ds._base_class_dir))
-            except Exception:
-                filenames = []
-            for filename in filenames:
-                if filename.endswith('.py') and not filename.startswith('__'):
-                    fp = os.path.join(self.ds._base_class_dir, filename)
-                    if os.path.isfile(fp):
-                        key = f"base_class_{filename[:-3]}"
-                        base_class_texts[key] = self.ds._read_text_file_safe(fp, filename)
+        # Source files, by hash: only the texts the data root's source store
+        # is missing are sent, unchanged files that it holds are not even
+        # re-read (see DataSaver.capture_sources).
+        source_hashes, source_texts = self.ds.capture_sources(expt_filepath)
 
         return {
             'params': {
@@ -351,7 +447,9 @@ class Expt(Scanner, Dealer, Scribe):
             'scope_data_taken': bool(self.scope_data._scope_trace_taken),
             'scope_data': scope_data_list,
             'expt_filepath': str(expt_filepath),
-            'expt_file_text': expt_text,
-            'params_file_text': params_text,
-            'base_class_texts': base_class_texts,
+            'source_hashes': source_hashes,
+            'source_texts': source_texts,
+            'shot_data_streamed': bool(self._shot_data_streamed),
+            'unstreamed_shots': (self._serialize_unstreamed_shots()
+                                 if self._shot_data_streamed else []),
         }
\ No newline at end of file